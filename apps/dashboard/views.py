@@ -3,8 +3,11 @@ from django.views.generic import TemplateView, DetailView
 from django.db.models import Sum, Count, Q
 from django.db.models.functions import TruncMonth
 from apps.products.models import Product
+from apps.products.services import ProductService
+from apps.products.view_counter import ProductViewCounter
 from apps.orders.models import Order, OrderItem
 from datetime import datetime, timedelta
+from django.db import transaction
 from django.shortcuts import redirect
 from django.utils import timezone
 from apps.utilisateur.models import ProducerProfile
@@ -237,6 +240,9 @@ from django.urls import reverse_lazy
 from django.contrib import messages 
 from django.shortcuts import redirect
 from .forms import ProductForm
+from django.core.cache import cache
+from apps.products.recommendations import REFRESH_SCHEDULED_KEY, SIMILAR_REFRESH_DELAY, queue_content_refresh
+from tasks.product_tasks import refresh_similar_products
 from django.views.generic import CreateView, UpdateView, DeleteView
 
 class ProductAccessMixin(LoginRequiredMixin):
@@ -258,10 +264,27 @@ class ProductDetailView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Vous pouvez ajouter des données supplémentaires ici si nécessaire
+        # Vue comptée en écriture différée (Redis), sans UPDATE sur la requête
+        ProductViewCounter.record(self.object.pk)
+        context['similar_products'] = ProductService.get_similar_products(self.object.pk)
         return context
 
 
+def schedule_similar_products_refresh(product_id):
+    """
+    Recalcul incrémental des produits similaires, une fois la sauvegarde validée.
+    Regroupé : une tâche par fenêtre de SIMILAR_REFRESH_DELAY secondes traite
+    tous les produits modifiés entre-temps (sans Redis : tâche immédiate).
+    """
+    def schedule():
+        if not queue_content_refresh(product_id):
+            refresh_similar_products.delay([product_id])
+        elif cache.add(REFRESH_SCHEDULED_KEY, True, timeout=SIMILAR_REFRESH_DELAY * 2):
+            refresh_similar_products.apply_async(countdown=SIMILAR_REFRESH_DELAY)
+
+    transaction.on_commit(schedule)
+
+
 # Ajout d'un produit
 class AddProductView(ProductAccessMixin, CreateView):
     model = Product
@@ -272,7 +295,9 @@ class AddProductView(ProductAccessMixin, CreateView):
     def form_valid(self, form):
         form.instance.producer = self.request.user.producer_profile
         messages.success(self.request, "Produit ajouté avec succès !")
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        schedule_similar_products_refresh(self.object.pk)
+        return response
 
 
 # Modification d'un produit
@@ -288,7 +313,10 @@ class EditProductView(ProductAccessMixin, UpdateView):
 
     def form_valid(self, form):
         messages.success(self.request, "Produit modifié avec succès !")
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        if {'name', 'description', 'category'} & set(form.changed_data):
+            schedule_similar_products_refresh(self.object.pk)
+        return response
 
 
 # Suppression d'un produit
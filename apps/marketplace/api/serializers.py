@@ -27,11 +27,12 @@ class ProductSerializer(serializers.ModelSerializer):
     producer_id = serializers.IntegerField(source='producer.id', read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
     stock_status = serializers.SerializerMethodField()
+    available_stock = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'description', 'price', 'unit', 'stock',
+            'id', 'name', 'description', 'price', 'unit', 'stock', 'available_stock',
             'image', 'is_active', 'is_deleted', 'view_count',
             'producer_name', 'producer_id', 'category_name',
             'stock_status', 'created_at'
@@ -142,16 +143,15 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = ['product', 'product_name', 'product_image', 'product_price', 'quantity']
 
 class CartSerializer(serializers.ModelSerializer):
-    items = CartItemSerializer(many=True, read_only=True)
-    total = serializers.SerializerMethodField()
-    items_count = serializers.IntegerField(source='items.count', read_only=True)
+    # Lignes et totaux lus dans Cart.summary (une requête, en cache)
+    items = CartItemSerializer(source='summary.lines', many=True, read_only=True)
+    total = serializers.DecimalField(source='summary.total_amount', max_digits=12, decimal_places=2, read_only=True)
+    items_count = serializers.IntegerField(source='summary.items_count', read_only=True)
+    total_quantity = serializers.DecimalField(source='summary.total_quantity', max_digits=12, decimal_places=2, read_only=True)
     
     class Meta:
         model = Cart
-        fields = ['items', 'total', 'items_count', 'updated_at']
-    
-    def get_total(self, obj):
-        return sum(item.quantity * item.product.price for item in obj.items.all())
+        fields = ['items', 'total', 'items_count', 'total_quantity', 'updated_at']
 
 # from rest_framework import serializers
 # from apps.products.models  import Product, Category
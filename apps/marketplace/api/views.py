@@ -4,13 +4,53 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
 from apps.products.models import Product
+from apps.products.search import ProductSearch
+from apps.products.services import ProductService
+from apps.products.facets import compute_facets
+from apps.products.view_counter import ProductViewCounter
+from utils.paginators import KeysetPagination
 from apps.orders.models import  Order, OrderItem, Cart, CartItem
+from apps.orders.cart_store import HotCartStore
 from apps.marketplace.api.serializers import ProductSerializer, OrderSerializer, CartSerializer
 
 class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Product.objects.filter(is_active=True).select_related('category', 'producer')
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+        # Même recherche / tri que la liste HTML (?search=, ?category=, ?sort=)
+        return ProductSearch.from_params(self.request.query_params).queryset(queryset)
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        ProductViewCounter.record(response.data['id'])
+        return response
+
+    @action(detail=True, methods=['post'])
+    def views(self, request, pk=None):
+        """Compte une vue (écriture différée, cf. ProductViewCounter)"""
+        product = self.get_object()
+        ProductViewCounter.record(product.pk)
+        return Response({'status': 'view counted'})
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Comptes par facette pour la recherche courante (mêmes paramètres que la liste)"""
+        search = ProductSearch.from_params(request.query_params)
+        return Response(compute_facets(search))
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Produits similaires précalculés (TF-IDF), sans calcul à la requête"""
+        product = self.get_object()
+        similar = ProductService.get_similar_products(product.pk)
+        serializer = self.get_serializer(similar, many=True)
+        return Response(serializer.data)
 
 class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
@@ -24,6 +64,7 @@ class CartViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'])
     def current(self, request):
+        HotCartStore.checkin(request.user.id)
         cart, created = Cart.objects.get_or_create(user=request.user)
         serializer = CartSerializer(cart)
         return Response(serializer.data)
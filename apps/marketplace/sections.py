@@ -0,0 +1,142 @@
+"""
+Cache des sections de la page d'accueil et du fragment "produits populaires".
+
+Chaque section est stockée sous une clé versionnée : les signaux de sauvegarde de
+Product / Category / ProducerProfile incrémentent la version de leur espace
+(cf. apps/marketplace/signals.py), ce qui invalide en O(1) toutes les sections qui
+en dépendent. La tâche `tasks.periodic_tasks.warm_marketplace_sections` les
+reconstruit à l'avance ; si une clé manque malgré tout, un seul processus la
+recalcule (verrou) pendant que les autres servent la dernière valeur connue.
+"""
+import logging
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from apps.products.models import Category, Product
+from apps.utilisateur.models import ProducerProfile
+from utils.cache_versions import get_versions
+
+logger = logging.getLogger(__name__)
+
+SECTION_TIMEOUT = 60 * 30
+POPULAR_TIMEOUT = 60 * 10
+LOCK_TIMEOUT = 30
+
+
+def _build_featured():
+    return list(
+        Product.objects.filter(is_active=True, stock__gt=0)
+        .order_by('-created_at', '-id')
+        .values_list('id', flat=True)[:6]
+    )
+
+
+def _build_categories():
+    return list(Category.objects.filter(is_active=True).values_list('id', flat=True))
+
+
+def _build_producers():
+    return list(
+        ProducerProfile.objects.filter(validated=True)
+        .order_by('id')
+        .values_list('id', flat=True)[:6]
+    )
+
+
+def _render_popular(is_authenticated):
+    products = Product.objects.filter(
+        is_active=True,
+        stock__gt=0
+    ).order_by('-view_count', '-id')[:12]
+    return render_to_string('pages/marketplace/partials/popular_products.html', {
+        'products': products,
+        'is_authenticated': is_authenticated,
+        'next_url': reverse('marketplace:home'),
+    })
+
+
+# nom -> (espaces de versions dont la section dépend, constructeur, durée)
+SECTIONS = {
+    'featured': (('product',), _build_featured, SECTION_TIMEOUT),
+    'categories': (('category',), _build_categories, SECTION_TIMEOUT),
+    'producers': (('producer',), _build_producers, SECTION_TIMEOUT),
+    'popular:anon': (('product',), lambda: _render_popular(False), POPULAR_TIMEOUT),
+    'popular:auth': (('product',), lambda: _render_popular(True), POPULAR_TIMEOUT),
+}
+
+
+class SectionCache:
+    """Lecture / pré-calcul des sections mises en cache"""
+
+    @staticmethod
+    def _key(name):
+        namespaces = SECTIONS[name][0]
+        versions = '.'.join(str(v) for v in get_versions(*namespaces))
+        return f"marketplace:section:{name}:{versions}"
+
+    @staticmethod
+    def _stale_key(name):
+        return f"marketplace:section:{name}:stale"
+
+    @classmethod
+    def build(cls, name):
+        """Recalcule une section et la stocke (utilisé par le pré-chauffage)"""
+        _, builder, timeout = SECTIONS[name]
+        value = builder()
+        cache.set(cls._key(name), value, timeout)
+        cache.set(cls._stale_key(name), value, None)
+        return value
+
+    @classmethod
+    def get(cls, name):
+        key = cls._key(name)
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        # Un seul processus recalcule ; les autres servent la valeur précédente
+        lock_key = f"{key}:lock"
+        if cache.add(lock_key, True, LOCK_TIMEOUT):
+            try:
+                return cls.build(name)
+            finally:
+                cache.delete(lock_key)
+
+        stale = cache.get(cls._stale_key(name))
+        if stale is not None:
+            return stale
+        return SECTIONS[name][1]()
+
+    @classmethod
+    def warm(cls):
+        """Reconstruit les sections absentes du cache (version courante)"""
+        warmed = []
+        for name in SECTIONS:
+            if cache.get(cls._key(name)) is None:
+                cls.build(name)
+                warmed.append(name)
+        return warmed
+
+
+def _ordered(model_queryset, ids):
+    objects = model_queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
+
+
+def featured_products():
+    return _ordered(Product.objects.select_related('producer__user', 'category'),
+                    SectionCache.get('featured'))
+
+
+def home_categories():
+    return _ordered(Category.objects.all(), SectionCache.get('categories'))
+
+
+def home_producers():
+    return _ordered(ProducerProfile.objects.select_related('user'), SectionCache.get('producers'))
+
+
+def popular_products_fragment(is_authenticated):
+    return SectionCache.get('popular:auth' if is_authenticated else 'popular:anon')
@@ -1,21 +1,69 @@
 from decimal import Decimal
+import hashlib
 import stripe
 from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Intention de paiement réutilisée tant que le contenu du panier ne change pas
+CHECKOUT_INTENT_CACHE_TIMEOUT = 60 * 60 * 24
+# Une intention dans ces états peut encore être modifiée puis confirmée
+REUSABLE_INTENT_STATUSES = ('requires_payment_method', 'requires_confirmation', 'requires_action')
+
+
+class StripePaymentClient:
+    """
+    Client de paiement par défaut (API Stripe). Remplaçable via le réglage
+    PAYMENT_CLIENT (chemin pointé) ; STRIPE_API_BASE redirige les appels vers un
+    serveur local (scripts/stub_payment_server.py) pour les mesures de latence.
+    """
+
+    def __init__(self):
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        if getattr(settings, 'STRIPE_API_BASE', ''):
+            stripe.api_base = settings.STRIPE_API_BASE
+
+    def create_intent(self, amount_cents, currency, metadata):
+        return stripe.PaymentIntent.create(
+            amount=amount_cents,
+            currency=currency,
+            automatic_payment_methods={'enabled': True},
+            metadata=metadata,
+        )
+
+    def modify_intent(self, intent_id, **params):
+        return stripe.PaymentIntent.modify(intent_id, **params)
+
+    def retrieve_intent(self, intent_id):
+        return stripe.PaymentIntent.retrieve(intent_id)
+
+
+_payment_client = None
+
+
+def get_payment_client():
+    """Instance unique du client configuré (PAYMENT_CLIENT)"""
+    global _payment_client
+    if _payment_client is None:
+        path = getattr(settings, 'PAYMENT_CLIENT', 'apps.marketplace.services.StripePaymentClient')
+        _payment_client = import_string(path)()
+    return _payment_client
+
+
 class PaymentService:
     @staticmethod
     def create_payment_intent(amount: Decimal, currency='gnf', metadata=None):  # Change 'eur' to 'gnf' if Guinea Franc
-        stripe.api_key = settings.STRIPE_SECRET_KEY
         # cette partie convertit le montant en centimes
         try:
-            intent = stripe.PaymentIntent.create(
-                amount=int(amount * 100),  # En centimes
-                currency=currency,
-                automatic_payment_methods={'enabled': True},
-                metadata=metadata or {},
+            intent = get_payment_client().create_intent(
+                int(amount * 100),  # En centimes
+                currency,
+                metadata or {},
             )
             logger.info(f"PaymentIntent créé : {intent.id}")
             return intent
@@ -25,13 +73,316 @@ class PaymentService:
             # la methode @staticmethod permet de l'appeler sans instancier la classe en elle-même
     @staticmethod
     def retrieve_payment_intent(payment_intent_id):
-        stripe.api_key = settings.STRIPE_SECRET_KEY
         try:
-            return stripe.PaymentIntent.retrieve(payment_intent_id)
+            return get_payment_client().retrieve_intent(payment_intent_id)
         except stripe.error.StripeError as e:
             logger.error(f"Erreur retrieve intent : {e}")
             raise
 
+    @staticmethod
+    def modify_payment_intent(payment_intent_id, **params):
+        try:
+            return get_payment_client().modify_intent(payment_intent_id, **params)
+        except stripe.error.StripeError as e:
+            logger.error(f"Erreur modify intent : {e}")
+            raise
+
+    @staticmethod
+    def checkout_cache_key(user_id):
+        return f"checkout:intent:{user_id}"
+
+    @staticmethod
+    def cart_fingerprint(cart, amount, currency):
+        """Empreinte du contenu du panier et du montant (lue dans Cart.summary)"""
+        lines = sorted((line.product_id, line.quantity) for line in cart.summary.lines)
+        content = ';'.join(f"{product_id}:{quantity}" for product_id, quantity in lines)
+        return hashlib.sha1(f"{cart.pk}|{content}|{amount}|{currency}".encode()).hexdigest()
+
+    @staticmethod
+    def get_checkout_intent(cart, amount: Decimal, currency='gnf'):
+        """
+        Intention de paiement de la session de checkout, sans appel externe tant que
+        (utilisateur, contenu du panier, montant) est inchangé. Si le panier change,
+        l'intention existante est mise à jour (modify) au lieu d'en créer une
+        nouvelle ; une intention déjà payée ou annulée est remplacée.
+        Retourne {'id', 'client_secret'}.
+        """
+        key = PaymentService.checkout_cache_key(cart.user_id)
+        fingerprint = PaymentService.cart_fingerprint(cart, amount, currency)
+        session = cache.get(key)
+
+        if session and session['fingerprint'] == fingerprint:
+            return session
+
+        intent = None
+        if session:
+            try:
+                intent = PaymentService.modify_payment_intent(
+                    session['id'],
+                    amount=int(amount * 100),
+                    currency=currency,
+                    metadata={'user_id': cart.user_id, 'cart_id': cart.pk},
+                )
+                if intent.status not in REUSABLE_INTENT_STATUSES:
+                    intent = None
+                else:
+                    logger.info(f"PaymentIntent mis à jour : {intent.id} ({amount} {currency})")
+            except stripe.error.StripeError:
+                intent = None  # intention confirmée / annulée entre-temps : on en crée une autre
+
+        if intent is None:
+            intent = PaymentService.create_payment_intent(
+                amount=amount,
+                currency=currency,
+                metadata={'user_id': cart.user_id, 'cart_id': cart.pk},
+            )
+
+        session = {'id': intent.id, 'client_secret': intent.client_secret, 'fingerprint': fingerprint}
+        cache.set(key, session, CHECKOUT_INTENT_CACHE_TIMEOUT)
+        return session
+
+    @staticmethod
+    def forget_checkout_intent(user_id, intent_id=None):
+        """
+        Après paiement : la prochaine visite du checkout démarre une nouvelle
+        intention. Avec `intent_id`, seulement si la session en cache est celle-là.
+        """
+        key = PaymentService.checkout_cache_key(user_id)
+        if intent_id is not None:
+            session = cache.get(key)
+            if not session or session['id'] != intent_id:
+                return
+        cache.delete(key)
+
+
+class PaymentConfirmationService:
+    """
+    Confirmation d'un paiement réussi, chemin unique pour la redirection client
+    (payment_success) et le webhook Stripe. Idempotente par ID d'intention : la
+    première confirmation réserve la ligne ProcessedPaymentEvent et crée la commande
+    dans la même transaction ; les suivantes (rafraîchissement, retour navigateur,
+    webhook rejoué) ne font qu'une lecture et renvoient la même commande.
+    """
+
+    @staticmethod
+    def shipping_fields(checkout_data):
+        """Champs de commande à partir des données du formulaire de checkout"""
+        return {
+            'shipping_address': f"{checkout_data['address_line_1']}\n"
+                                f"{checkout_data.get('address_line_2', '')}\n"
+                                f"{checkout_data['postal_code']} {checkout_data['city']}",
+            'notes': checkout_data.get('notes', ''),
+        }
+
+    @staticmethod
+    def metadata(intent):
+        """Metadata de l'intention en dict (StripeObject n'est plus un dict)"""
+        metadata = intent.metadata or {}
+        return metadata.to_dict() if hasattr(metadata, 'to_dict') else dict(metadata)
+
+    @staticmethod
+    def confirm(intent, source, checkout_data=None):
+        """
+        Retourne (commande, créée, ajustements). `checkout_data` vient de la session
+        (redirection) ; à défaut, l'adresse est lue dans la metadata de l'intention.
+        """
+        from apps.orders.models import Cart, Order, ProcessedPaymentEvent
+        from apps.orders.services import OrderBuilder
+
+        metadata = PaymentConfirmationService.metadata(intent)
+        with transaction.atomic():
+            # L'INSERT unique sérialise redirection et webhook concurrents : le second
+            # attend le commit du premier puis relit la ligne existante
+            event, created = ProcessedPaymentEvent.objects.get_or_create(
+                payment_intent_id=intent.id, defaults={'source': source}
+            )
+            if not created:
+                logger.info(f"🔁 Paiement {intent.id} déjà traité ({event.source}), rien à refaire")
+                return event.order, False, []
+
+            # Commande créée avant la table d'événements : on la rattache
+            order = Order.objects.filter(payment_intent_id=intent.id).order_by('created_at').first()
+            adjustments = []
+            if order is None:
+                if checkout_data:
+                    fields = PaymentConfirmationService.shipping_fields(checkout_data)
+                else:
+                    fields = {
+                        'shipping_address': metadata.get('shipping_address', ''),
+                        'notes': metadata.get('notes', ''),
+                    }
+                cart = Cart.objects.select_related('user').get(
+                    pk=metadata.get('cart_id'), user_id=metadata.get('user_id')
+                )
+                builder = OrderBuilder.from_cart(
+                    cart,
+                    status=Order.Status.CONFIRMED,
+                    payment_intent_id=intent.id,
+                    payment_status='paid',
+                    **fields,
+                )
+                if not builder.quantities:
+                    raise ValueError(f"Panier {cart.pk} vide pour le paiement {intent.id}")
+                order = builder.build(adjust_to_stock=True)
+                adjustments = builder.adjustments
+
+            event.order = order
+            event.save(update_fields=['order'])
+
+            # Webhook sans retour du client sur payment_success : l'intention payée
+            # ne doit pas être resservie au prochain checkout du même panier
+            if metadata.get('user_id'):
+                transaction.on_commit(
+                    lambda: PaymentService.forget_checkout_intent(metadata['user_id'], intent.id)
+                )
+
+        logger.info(f"💳 Paiement {intent.id} confirmé via {source} → commande {order.order_number}")
+        return order, True, adjustments
+
+
+class PaymentInboxService:
+    """
+    Ingestion asynchrone des webhooks de paiement.
+
+    `ingest` ne fait qu'un INSERT (l'unicité de event_id écarte les relivraisons
+    du même événement) pour répondre au fournisseur immédiatement.
+    `drain` traite la boîte par lots : seul l'événement en attente le plus ancien de
+    chaque intention est sélectionné (FOR UPDATE SKIP LOCKED), donc les événements
+    d'une même intention sont traités dans l'ordre de réception, même avec
+    plusieurs workers, sans que ceux-ci se bloquent.
+    """
+    METRICS_CACHE_KEY = 'payments:webhook_inbox:metrics'
+    MAX_ATTEMPTS = 5
+
+    @staticmethod
+    def ingest(event):
+        """Persiste un événement vérifié ; retourne False si déjà reçu"""
+        from apps.orders.models import PaymentWebhookEvent
+
+        payload = event.to_dict() if hasattr(event, 'to_dict') else dict(event)
+        data_object = payload.get('data', {}).get('object', {})
+        # Clé d'ordonnancement : l'intention elle-même, ou celle d'un remboursement / litige
+        if data_object.get('object') == 'payment_intent':
+            intent_id = data_object.get('id', '')
+        else:
+            intent_id = data_object.get('payment_intent') or ''
+        try:
+            with transaction.atomic():
+                PaymentWebhookEvent.objects.create(
+                    event_id=payload['id'],
+                    event_type=payload.get('type', ''),
+                    payment_intent_id=intent_id,
+                    payload=payload,
+                )
+        except IntegrityError:
+            return False  # relivraison d'un événement déjà reçu
+        return True
+
+    @staticmethod
+    def handle(webhook_event):
+        """Applique un événement de la boîte (appelé sous savepoint par `drain`)"""
+        from apps.orders.models import ProcessedPaymentEvent
+
+        event = stripe.Event.construct_from(webhook_event.payload, settings.STRIPE_SECRET_KEY)
+        if event.type == 'payment_intent.succeeded':
+            PaymentConfirmationService.confirm(event.data.object, ProcessedPaymentEvent.Source.WEBHOOK)
+        # Les autres types sont archivés sans traitement
+
+    @staticmethod
+    def _next_batch(batch_size, skip_ids):
+        from django.db.models import Exists, OuterRef
+        from apps.orders.models import PaymentWebhookEvent
+
+        pending = PaymentWebhookEvent.objects.filter(status=PaymentWebhookEvent.Status.PENDING)
+        earlier = pending.filter(
+            payment_intent_id=OuterRef('payment_intent_id'), id__lt=OuterRef('id')
+        ).exclude(payment_intent_id='')
+        return list(
+            pending.exclude(Exists(earlier))
+            .exclude(pk__in=skip_ids)
+            .order_by('id')
+            .select_for_update(skip_locked=True)[:batch_size]
+        )
+
+    @staticmethod
+    def drain(batch_size=100, max_batches=50):
+        """
+        Traite les événements en attente par lots. Un échec laisse l'événement en
+        tête de son intention (réessayé au prochain passage, les suivants attendent)
+        jusqu'à MAX_ATTEMPTS, puis il passe en FAILED. Retourne les métriques du passage.
+        """
+        from apps.orders.models import PaymentWebhookEvent
+
+        processed = failed = retried = 0
+        lags = []
+        retry_ids = []
+        for _ in range(max_batches):
+            with transaction.atomic():
+                batch = PaymentInboxService._next_batch(batch_size, retry_ids)
+                for webhook_event in batch:
+                    webhook_event.attempts += 1
+                    try:
+                        with transaction.atomic():
+                            PaymentInboxService.handle(webhook_event)
+                    except Exception as e:
+                        webhook_event.last_error = str(e)[:2000]
+                        if webhook_event.attempts >= PaymentInboxService.MAX_ATTEMPTS:
+                            webhook_event.status = PaymentWebhookEvent.Status.FAILED
+                            webhook_event.processed_at = timezone.now()
+                            failed += 1
+                            logger.error(f"❌ Webhook {webhook_event.event_id} abandonné après {webhook_event.attempts} tentatives : {e}")
+                        else:
+                            retry_ids.append(webhook_event.pk)
+                            retried += 1
+                            logger.warning(f"⚠️ Webhook {webhook_event.event_id} en échec (tentative {webhook_event.attempts}) : {e}")
+                        continue
+                    webhook_event.status = PaymentWebhookEvent.Status.PROCESSED
+                    webhook_event.processed_at = timezone.now()
+                    lags.append((webhook_event.processed_at - webhook_event.received_at).total_seconds())
+                    processed += 1
+                PaymentWebhookEvent.objects.bulk_update(
+                    batch, ['status', 'attempts', 'last_error', 'processed_at']
+                )
+            # Traiter une tête d'intention libère l'événement suivant de cette
+            # intention : on continue jusqu'à un lot vide
+            if not batch:
+                break
+
+        metrics = PaymentInboxService.metrics(processed, failed, retried, lags)
+        if processed or failed or retried:
+            logger.info(
+                f"📥 Webhooks : {processed} traité(s), {failed} en échec, {retried} à réessayer, "
+                f"lag max {metrics['lag_max_seconds']}s, {metrics['pending']} en attente"
+            )
+        return metrics
+
+    @staticmethod
+    def metrics(processed=0, failed=0, retried=0, lags=()):
+        """Retard d'ingestion (réception → traitement) et profondeur de la file, mis en cache"""
+        from django.core.cache import cache
+        from django.db.models import Count, Min
+        from apps.orders.models import PaymentWebhookEvent
+
+        backlog = PaymentWebhookEvent.objects.filter(
+            status=PaymentWebhookEvent.Status.PENDING
+        ).aggregate(pending=Count('id'), oldest=Min('received_at'))
+        lags = sorted(lags)
+        metrics = {
+            'processed': processed,
+            'failed': failed,
+            'retried': retried,
+            'lag_avg_seconds': round(sum(lags) / len(lags), 3) if lags else None,
+            'lag_p95_seconds': round(lags[int(0.95 * (len(lags) - 1))], 3) if lags else None,
+            'lag_max_seconds': round(lags[-1], 3) if lags else None,
+            'pending': backlog['pending'],
+            'oldest_pending_age_seconds': round(
+                (timezone.now() - backlog['oldest']).total_seconds(), 3
+            ) if backlog['oldest'] else 0,
+            'timestamp': timezone.now().isoformat(),
+        }
+        cache.set(PaymentInboxService.METRICS_CACHE_KEY, metrics, None)
+        return metrics
+
 
 # from decimal import Decimal
 # import stripe
@@ -0,0 +1,28 @@
+"""
+Invalidation des caches du catalogue (sections d'accueil, facettes, catégories)
+par incrément de version à chaque modification.
+"""
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.products.facets import CATEGORIES_CACHE_KEY
+from apps.products.models import Category, Product
+from apps.utilisateur.models import ProducerProfile
+from utils.cache_versions import bump_version
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_sections(sender, **kwargs):
+    bump_version('product')
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_sections(sender, **kwargs):
+    bump_version('category')
+    cache.delete(CATEGORIES_CACHE_KEY)
+
+
+@receiver([post_save, post_delete], sender=ProducerProfile)
+def invalidate_producer_sections(sender, **kwargs):
+    bump_version('producer')
@@ -23,6 +23,8 @@ urlpatterns = [
     path('payment/success/', views.payment_success, name='payment_success'),
     path('payment/store_checkout_data/', views.store_checkout_data, name='store_checkout_data'),
     path('stripe/webhook/', views.stripe_webhook, name='stripe_webhook'),
+    # Suivi des commandes en SSE (ASGI)
+    path('orders/status/stream/', views.order_status_stream, name='order_status_stream'),
     # path('orders/', views.OrderHistoryView.as_view(), name='order_history'),
     # path('orders/<int:pk>/', views.OrderDetailView.as_view(), name='order_detail'),
 
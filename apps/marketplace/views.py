@@ -6,10 +6,13 @@ from apps.utilisateur.models import ProducerProfile
 from apps.orders.models import Cart
 from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
 from apps.orders.models import CartItem, Order, OrderItem
+from apps.orders.cart_store import HotCartStore
+from apps.orders.tracking import order_status_hub, stream_order_status
+from apps.orders.services import CartService
 from django.db import models
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseBadRequest
@@ -17,6 +20,11 @@ from .forms import CheckoutForm
 from django.http import Http404
 from django.utils.http import urlencode
 from django.db.models import Q
+from apps.products.search import ProductSearch
+from django.utils.functional import SimpleLazyObject
+from .sections import featured_products, home_categories, home_producers, popular_products_fragment
+from apps.products.facets import compute_facets, get_active_categories
+from utils.paginators import KeysetPaginator, InvalidCursor
 
 class MarketplaceHomeView(TemplateView):
     """Page d'accueil du marché"""
@@ -24,28 +32,16 @@ class MarketplaceHomeView(TemplateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['featured_products'] = Product.objects.filter(
-            is_active=True, 
-            stock__gt=0
-        )[:6]
-        context['categories'] = Category.objects.filter(is_active=True)
-        context['producers'] = ProducerProfile.objects.filter(
-            validated=True
-        )[:6]
+        # Sections servies depuis le cache versionné (évaluées seulement si affichées)
+        context['featured_products'] = SimpleLazyObject(featured_products)
+        context['categories'] = SimpleLazyObject(home_categories)
+        context['producers'] = SimpleLazyObject(home_producers)
         return context
     
 def popular_products_htmx(request):
     """Vue HTMX pour afficher les produits populaires (sans pagination)"""
-    
-    products = Product.objects.filter(
-        is_active=True,
-        stock__gt=0
-    ).order_by('-view_count')[:12] 
-    cxt = {
-            'products': products, 
-        }
-    
-    return render(request, 'pages/marketplace/partials/popular_products.html', cxt)
+    # Fragment pré-rendu en cache (une variante connecté / anonyme)
+    return HttpResponse(popular_products_fragment(request.user.is_authenticated))
 
 class ProductListView(ListView):
     """Liste des produits avec recherche, filtre catégorie et tri"""
@@ -53,65 +49,51 @@ class ProductListView(ListView):
     template_name = 'pages/marketplace/product_list.html'
     context_object_name = 'products'
     paginate_by = 20  # Vous pouvez ajuster (12, 24, etc.)
-    ordering = ['-created_at']  # Par défaut : plus récents en premier
 
     def get_queryset(self):
-        queryset = Product.objects.filter(
-            is_active=True,
-            stock__gt=0
-        ).select_related('producer__user', 'category').prefetch_related('producer')
-
-        # === RECHERCHE ===
-        search_query = self.request.GET.get('search', '').strip()
-        if search_query:
-            queryset = queryset.filter(
-                Q(name__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(producer__user__username__icontains=search_query)
-            )
-
-        # === FILTRE CATÉGORIE ===
-        category_id = self.request.GET.get('category')
-        if category_id and category_id.isdigit():
-            queryset = queryset.filter(category_id=category_id)
-
-        # === TRI ===
-        sort = self.request.GET.get('sort')
-        valid_sorts = {
-            'name': 'name',
-            '-name': '-name',
-            'price': 'price',
-            '-price': '-price',
-            'newest': '-created_at',
-            'popularity': '-view_count',  # Si vous avez un compteur de vues
-        }
-        if sort in valid_sorts:
-            queryset = queryset.order_by(valid_sorts[sort])
-        else:
-            queryset = queryset.order_by('-created_at')  # Défaut sécurisé
-
-        return queryset.distinct()  # Évite doublons en cas de recherche complexe
+        # Recherche plein texte + filtres + tri partagés avec l'API
+        self.search = ProductSearch.from_params(self.request.GET, in_stock=True)
+        queryset = self.search.base_queryset().select_related('producer__user', 'category')
+        return self.search.queryset(queryset)
+
+    def paginate_queryset(self, queryset, page_size):
+        """Pagination keyset (?cursor=) : coût constant quelle que soit la page"""
+        paginator = KeysetPaginator(
+            queryset,
+            ordering=self.search.ordering,
+            per_page=page_size,
+            count_mode='approx',
+        )
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            # Curseur périmé (tri modifié, lien tronqué) : retour à la première page
+            page = paginator.page()
+        return paginator, page, page.object_list, page.has_other_pages()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Catégories pour le filtre
-        context['categories'] = Category.objects.filter(is_active=True)
+        # Catégories (cache) et facettes calculées en une seule agrégation
+        context['categories'] = get_active_categories()
+        context['facets'] = compute_facets(self.search)
 
         # Paramètres actuels pour conserver dans les liens de pagination/filtres
         context['current_query'] = self.request.GET.copy()
 
         # Pour garder les filtres actifs dans les liens de pagination
-        if 'page' in context['current_query']:
-            del context['current_query']['page']
+        for key in ('page', 'cursor'):
+            context['current_query'].pop(key, None)
 
         # Valeurs actuelles pour affichage (facultatif dans template)
         context['current_search'] = self.request.GET.get('search', '')
-        context['current_category'] = self.request.GET.get('category', '')
-        context['current_sort'] = self.request.GET.get('sort', 'newest')
+        context['current_category'] = self.search.category or ''
+        context['current_sort'] = self.search.sort
 
-        # Nombre total de produits (pour affichage "X produits trouvés")
-        context['total_products'] = self.get_queryset().count()
+        # Nombre total (estimé au-delà du seuil, sans second COUNT)
+        paginator = context['paginator']
+        context['total_products'] = paginator.count
+        context['total_is_exact'] = paginator.count_is_exact
 
         return context
 
@@ -149,6 +131,8 @@ class CartView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.request.user.is_authenticated:
+            # Le panier chaud (Redis) est d'abord écrit en base
+            HotCartStore.checkin(self.request.user.id)
             try:
                 context['cart'] = self.request.user.cart
             except Cart.DoesNotExist:
@@ -173,22 +157,25 @@ def add_to_cart(request, product_id):
         stock__gt=0
     )
 
-    cart, _ = Cart.objects.get_or_create(user=request.user)
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart,
-        product=product,
-        defaults={'quantity': 1}
-    )
-
-    if not created:
-        cart_item.quantity += 1
-        cart_item.save()
-
-    messages.success(request, f"{product.name} ajouté au panier !")
+    # Panier chaud (Redis) : un HINCRBY, aucune écriture en base sur ce chemin
+    if HotCartStore.add(request.user.id, product.id, 1):
+        messages.success(request, f"{product.name} ajouté au panier !")
+    else:
+        # Upsert plafonné au stock : un double clic ne perd pas d'incrément
+        cart, _ = Cart.objects.get_or_create(user=request.user)
+        line = CartService.add(cart.pk, product.id, 1)
+        if line is None or not line.quantity:
+            messages.error(request, f"{product.name} n'est plus disponible.")
+        elif line.clamped:
+            messages.warning(request, f"Stock insuffisant : {line.quantity} × {product.name} dans votre panier (maximum).")
+        else:
+            messages.success(request, f"{product.name} ajouté au panier !")
 
     if request.htmx:
         if request.path == reverse('marketplace:cart'):
             # Sur la page panier → on renvoie le partial + messages en OOB
+            HotCartStore.checkin(request.user.id)
+            cart, _ = Cart.objects.get_or_create(user=request.user)
             context = {'cart': cart}
             main_content = render_to_string('pages/marketplace/partials/cart_items.html', context, request=request)
             messages_content = render_to_string('pages/marketplace/partials/messages.html', request=request)
@@ -208,26 +195,26 @@ def add_to_cart(request, product_id):
 @login_required
 @require_http_methods(["POST"])
 def update_cart_quantity(request, item_id):
-    cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
-
+    HotCartStore.checkin(request.user.id)
     try:
         quantity_change = int(request.POST.get('quantity_change', 0))
     except (TypeError, ValueError):
         return HttpResponseBadRequest("Changement de quantité invalide")
 
-    new_quantity = cart_item.quantity + quantity_change
+    cart_id, product_id = get_object_or_404(
+        CartItem.objects.values_list('cart_id', 'product_id'), id=item_id, cart__user=request.user
+    )
+
+    # Une instruction : quantité + changement, bornée au stock vendable (réservation
+    # de ce panier comprise) ; la ligne tombée à 0 est supprimée
+    line = CartService.change(cart_id, product_id, quantity_change)
 
-    if new_quantity <= 0:
-        cart_item.delete()
+    if line is None or line.removed:
         messages.info(request, "Article supprimé du panier.")
     else:
-        if new_quantity > cart_item.product.stock:
-            messages.error(request, f"Stock insuffisant : seulement {cart_item.product.stock} disponible(s).")
-            new_quantity = cart_item.product.stock
-
-        cart_item.quantity = new_quantity
-        cart_item.save()
-        messages.success(request, f"Quantité mise à jour : {new_quantity} × {cart_item.product.name}")
+        if line.clamped:
+            messages.error(request, f"Stock insuffisant : seulement {line.available} disponible(s).")
+        messages.success(request, f"Quantité mise à jour : {line.quantity} × {line.name}")
 
     cart = request.user.cart
 
@@ -249,14 +236,17 @@ def update_cart_quantity(request, item_id):
 @login_required
 @require_http_methods(["DELETE"])
 def remove_from_cart(request, item_id):
-    cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
+    HotCartStore.checkin(request.user.id)
+    cart_id, product_id, product_name = get_object_or_404(
+        CartItem.objects.values_list('cart_id', 'product_id', 'product__name'), id=item_id, cart__user=request.user
+    )
 
-    product_name = cart_item.product.name
-    cart_item.delete()
+    CartService.remove(cart_id, product_id)
 
     messages.success(request, f"{product_name} supprimé du panier.")
 
-    cart, _ = Cart.objects.get_or_create(user=request.user)
+    # Résumé déjà mis à jour en cache par CartService : pas de relecture des lignes
+    cart = request.user.cart
 
     # Rendu du contenu principal
     main_content = render_to_string('pages/marketplace/partials/cart_items.html', {'cart': cart}, request=request)
@@ -284,7 +274,11 @@ import stripe
 from django.views.generic.edit import FormView
 from django.urls import reverse_lazy
 from django.contrib import messages
-from .services import PaymentService
+from .services import PaymentService, PaymentConfirmationService, PaymentInboxService
+from tasks.payment_tasks import drain_payment_webhooks
+from apps.orders.models import ProcessedPaymentEvent
+from apps.orders.reservations import ReservationService
+from apps.products.stock import InsufficientStock
 
 import environ
 env = environ.Env()
@@ -300,23 +294,38 @@ class CheckoutView(LoginRequiredMixin, FormView):
     form_class = CheckoutForm
     success_url = reverse_lazy('marketplace:payment_success')
 
+    def get(self, request, *args, **kwargs):
+        # Flush synchrone du panier chaud : le paiement part du panier en base
+        HotCartStore.checkin(request.user.id)
+        # Le stock du panier est retenu pendant le paiement (réservation avec TTL)
+        try:
+            self.reservation_expires_at = ReservationService.reserve(request.user.cart)
+        except InsufficientStock as e:
+            for shortfall in e.shortfalls:
+                messages.error(
+                    request,
+                    f"Stock insuffisant : seulement {shortfall['available']} disponible(s) "
+                    f"pour un article de votre panier."
+                )
+            return redirect('marketplace:cart')
+        return super().get(request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         cart = self.request.user.cart
         total = cart.get_total_amount()
         context['cart'] = cart
+        context['reservation_expires_at'] = getattr(
+            self, 'reservation_expires_at', None
+        ) or ReservationService.expires_at(cart)
         context['stripe_public_key'] = env('STRIPE_PUBLISHABLE_KEY')
         context['total_amount'] = total
 
-        # Créer intent ici (sur GET)
+        # Intention réutilisée tant que le panier ne change pas (mise à jour sinon)
         try:
-            intent = PaymentService.create_payment_intent(  # Assume ton service
-                amount=total,
-                currency='gnf',
-                metadata={'user_id': self.request.user.id, 'cart_id': cart.id}
-            )
-            self.request.session['payment_intent_id'] = intent.id
-            context['client_secret'] = intent.client_secret  # Ajout clé !
+            intent = PaymentService.get_checkout_intent(cart, total, currency='gnf')
+            self.request.session['payment_intent_id'] = intent['id']
+            context['client_secret'] = intent['client_secret']  # Ajout clé !
         except Exception as e:
             messages.error(self.request, "Erreur création paiement.")
             context['client_secret'] = None
@@ -342,7 +351,7 @@ import json
 @require_POST
 def stripe_webhook(request):
     payload = request.body
-    sig_header = request.META['HTTP_STRIPE_SIGNATURE']
+    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE', '')
     event = None
 
     try:
@@ -354,13 +363,21 @@ def stripe_webhook(request):
     except stripe.error.SignatureVerificationError:
         return HttpResponse(status=400)
 
-    if event['type'] == 'payment_intent.succeeded':
-        intent = event['data']['object']
-        # Mettre à jour l'ordre en base : status = 'PAID'
-        order = Order.objects.get(payment_intent_id=intent.id)
-        order.status = 'PAID'
-        order.save()
-        # Envoyer email confirmation
+    # Réponse immédiate : l'événement brut va dans la boîte de réception, le
+    # traitement (confirmation de commande...) se fait sur la file 'payments'
+    try:
+        is_new = PaymentInboxService.ingest(event)
+    except Exception as e:
+        # 500 : Stripe relivrera l'événement plus tard
+        logger.error(f"Erreur enregistrement webhook {event.id}: {e}")
+        return HttpResponse(status=500)
+
+    if is_new:
+        try:
+            drain_payment_webhooks.delay()
+        except Exception as e:
+            # Broker indisponible : le passage périodique (Celery Beat) prendra le relais
+            logger.warning(f"Déclenchement du traitement des webhooks impossible: {e}")
 
     return HttpResponse(status=200)
 
@@ -377,12 +394,13 @@ def store_checkout_data(request):
         # Stocker en session
         request.session['checkout_data'] = form.cleaned_data
 
-        # Optionnel : update intent metadata avec notes ou adresse JSON
+        # Adresse et notes aussi dans la metadata de l'intention : le webhook peut
+        # créer la commande même si le client ne revient jamais sur payment_success
         intent_id = request.session.get('payment_intent_id')
         if intent_id:
-            stripe.PaymentIntent.modify(
+            PaymentService.modify_payment_intent(
                 intent_id,
-                metadata={'notes': form.cleaned_data.get('notes', '')}  # Ou JSON adresse si besoin
+                metadata=PaymentConfirmationService.shipping_fields(form.cleaned_data),
             )
 
         return JsonResponse({'status': 'ok'})
@@ -396,7 +414,6 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-
 @login_required
 def payment_success(request):
     payment_intent_id = request.GET.get('payment_intent')
@@ -404,91 +421,63 @@ def payment_success(request):
         messages.error(request, "Aucun paiement détecté.")
         return redirect('marketplace:cart')
 
-    stripe.api_key = env('STRIPE_SECRET_KEY')
-
     try:
         # Récupère et vérifie le PaymentIntent auprès de Stripe
-        intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+        intent = PaymentService.retrieve_payment_intent(payment_intent_id)
 
         if intent.status != 'succeeded':
             messages.error(request, "Le paiement n'a pas abouti.")
             return redirect('marketplace:cart')
 
         # Sécurité : vérifie metadata (user_id et cart_id)
-        if intent.metadata.get('user_id') != str(request.user.id):
+        if PaymentConfirmationService.metadata(intent).get('user_id') != str(request.user.id):
             messages.error(request, "Paiement non autorisé.")
             return redirect('marketplace:cart')
 
-        cart = get_object_or_404(Cart, user=request.user, id=intent.metadata.get('cart_id', 0))
-
-        # Récupère les données de livraison de la session
+        # Déjà confirmé (webhook ou rafraîchissement) : la commande existe, pas besoin
+        # des données de session ; sinon l'adresse de livraison est requise
         order_data = request.session.get('checkout_data')
-        if not order_data:
+        if not order_data and not ProcessedPaymentEvent.objects.filter(payment_intent_id=intent.id).exists():
             messages.error(request, "Informations de livraison manquantes.")
             return redirect('marketplace:cart')
 
-        # Création de l'ordre
-        order = Order(
-            client=request.user,
-            status=Order.Status.CONFIRMED,
-            shipping_address=f"{order_data['address_line_1']}\n"
-                            f"{order_data.get('address_line_2', '')}\n"
-                            f"{order_data['postal_code']} {order_data['city']}",
-            notes=order_data.get('notes', ''),
-            total_amount=cart.get_total_amount(),
-            payment_intent_id=payment_intent_id,
-            payment_status='paid',
+        # Commande, lignes, stock et vidage du panier en une passe, une seule fois par paiement
+        order, created, adjustments = PaymentConfirmationService.confirm(
+            intent, ProcessedPaymentEvent.Source.REDIRECT, checkout_data=order_data
         )
-        order.save()  # Sauvegarde d'abord pour obtenir le PK
-
-        # Génération du numéro de commande (basé sur PK)
-        order.order_number = order.generate_order_number()
-        order.save(update_fields=['order_number'])
-
-        # Création des OrderItem + mise à jour stock
-        for cart_item in cart.items.all():
-            product = cart_item.product
-            if product.stock < cart_item.quantity:
-                messages.warning(request, f"Stock insuffisant pour {product.name}. Commande partielle.")
-                cart_item.quantity = product.stock  # Ajuste quantité max
-
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=cart_item.quantity,
-                unit_price=product.price,
-                subtotal=cart_item.get_subtotal()
-            )
-
-            # Mise à jour stock produit
-            product.stock -= cart_item.quantity
-            product.save()
-
-        # Vidage du panier
-        cart.items.all().delete()
+        if order is None or order.client_id != request.user.id:
+            raise Http404
 
         # Nettoyage session
         request.session.pop('checkout_data', None)
         request.session.pop('payment_intent_id', None)
         request.session.pop('client_secret', None)
+        PaymentService.forget_checkout_intent(request.user.id)
 
-        # Envoi email confirmation (optionnel)
-        try:
-            send_mail(
-                subject=f"Confirmation de commande #{order.order_number}",
-                message=f"Merci pour votre commande de {order.total_amount} GNF !\nDétails : {order.shipping_address}",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[request.user.email],
-            )
-            logger.info(f"Email confirmation envoyé pour commande {order.order_number}")
-        except Exception as e:
-            logger.error(f"Erreur envoi email commande {order.order_number}: {e}")
-            messages.warning(request, "Commande confirmée, mais email non envoyé. Vérifiez votre spam.")
+        if created:
+            for product, requested, granted in adjustments:
+                messages.warning(request, f"Stock insuffisant pour {product.name}. Quantité ajustée à {granted}.")
+
+            # Envoi email confirmation (optionnel)
+            try:
+                send_mail(
+                    subject=f"Confirmation de commande #{order.order_number}",
+                    message=f"Merci pour votre commande de {order.total_amount} GNF !\nDétails : {order.shipping_address}",
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    recipient_list=[request.user.email],
+                )
+                logger.info(f"Email confirmation envoyé pour commande {order.order_number}")
+            except Exception as e:
+                logger.error(f"Erreur envoi email commande {order.order_number}: {e}")
+                messages.warning(request, "Commande confirmée, mais email non envoyé. Vérifiez votre spam.")
+
+            messages.success(request, f"Votre commande {order.order_number} a été confirmée avec succès !")
 
-        messages.success(request, f"Votre commande {order.order_number} a été confirmée avec succès !")
         context = {'order': order}
         return render(request, 'pages/marketplace/payment_success.html', context)
 
+    except Http404:
+        raise
     except stripe.error.StripeError as e:
         logger.error(f"Erreur Stripe paiement success: {e}")
         messages.error(request, "Erreur lors de la vérification du paiement.")
@@ -497,99 +486,31 @@ def payment_success(request):
         logger.error(f"Erreur générale paiement success: {e}")
         messages.error(request, "Une erreur inattendue est survenue.")
         return redirect('marketplace:cart')
-    
-from django.db import transaction
 
-@login_required
-@transaction.atomic  # Tout ou rien : synchronisation parfaite
-def payment_success(request):
-    payment_intent_id = request.GET.get('payment_intent')
-    if not payment_intent_id:
-        messages.error(request, "Aucun paiement détecté.")
-        return redirect('marketplace:cart')
 
-    stripe.api_key = env('STRIPE_SECRET_KEY')
+async def order_status_stream(request):
+    """
+    Suivi des commandes du client en Server-Sent Events (application ASGI).
+    `?order=<id>` : une seule commande. Reprise par l'en-tête Last-Event-ID.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    if order_status_hub.is_full():
+        # Limite du worker atteinte : EventSource retentera (sur un autre worker)
+        response = HttpResponse(status=503)
+        response['Retry-After'] = '30'
+        return response
 
     try:
-        # Vérifie PaymentIntent
-        intent = stripe.PaymentIntent.retrieve(payment_intent_id)
-
-        if intent.status != 'succeeded':
-            messages.error(request, "Le paiement n'a pas abouti.")
-            return redirect('marketplace:cart')
-
-        # Sécurité metadata
-        if intent.metadata.get('user_id') != str(request.user.id):
-            messages.error(request, "Paiement non autorisé.")
-            return redirect('marketplace:cart')
+        order_id = int(request.GET['order'])
+    except (KeyError, ValueError):
+        order_id = None
 
-        cart = get_object_or_404(Cart, user=request.user)
-
-        # Données livraison de session
-        order_data = request.session.get('checkout_data')
-        if not order_data:
-            messages.error(request, "Informations de livraison manquantes.")
-            return redirect('marketplace:cart')
-
-        # Création order
-        order = Order(
-            client=request.user,
-            status=Order.Status.CONFIRMED,
-            shipping_address=f"{order_data['address_line_1']}\n"
-                            f"{order_data.get('address_line_2', '')}\n"
-                            f"{order_data['postal_code']} {order_data['city']}",
-            notes=order_data.get('notes', ''),
-            total_amount=cart.get_total_amount(),
-            payment_intent_id=payment_intent_id,
-            payment_status='paid',
-        )
-        order.save()  # Sauvegarde pour PK
-
-        # Génération numéro (avec PK)
-        order.order_number = order.generate_order_number()
-        order.save(update_fields=['order_number'])
-
-        # Ajout OrderItem + maj stock (sync)
-        for cart_item in cart.items.all():
-            product = cart_item.product
-            if product.stock < cart_item.quantity:
-                messages.warning(request, f"Stock insuffisant pour {product.name}. Quantité ajustée.")
-                cart_item.quantity = product.stock
-
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=cart_item.quantity,
-                unit_price=product.price,
-                subtotal=cart_item.get_subtotal()
-            )
-
-            product.stock -= cart_item.quantity
-            product.save()
-
-        # Vidage panier
-        cart.items.all().delete()
-
-        # Nettoyage session
-        request.session.pop('checkout_data', None)
-
-        # Envoi email (optionnel)
-        send_mail(
-            'Confirmation de commande',
-            f'Votre commande {order.order_number} a été confirmée ! Montant: {order.total_amount} GNF.',
-            settings.DEFAULT_FROM_EMAIL,
-            [request.user.email],
-            fail_silently=True
-        )
-
-        messages.success(request, f"Commande {order.order_number} confirmée !")
-        return render(request, 'pages/marketplace/payment_success.html', {'order': order})
-
-    except stripe.error.StripeError as e:
-        logger.error(f"Erreur Stripe: {e}")
-        messages.error(request, "Erreur vérification paiement.")
-        return redirect('marketplace:cart')
-    except Exception as e:
-        logger.error(f"Erreur générale: {e}")
-        messages.error(request, "Erreur inattendue.")
-        return redirect('marketplace:cart')    
\ No newline at end of file
+    response = StreamingHttpResponse(
+        stream_order_status(user.id, request.headers.get('Last-Event-ID'), order_id),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # pas de mise en tampon par nginx
+    return response
@@ -4,7 +4,9 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
+from django.db import transaction
 from .models import Order, OrderItem, Cart, CartItem
+from services.notification_service import NotificationService
 
 
 # ==================== INLINE POUR ORDERITEM ====================
@@ -60,23 +62,41 @@ class OrderAdmin(admin.ModelAdmin):
     # Actions personnalisées
     actions = ['mark_as_preparing', 'mark_as_shipped', 'mark_as_delivered', 'mark_as_cancelled']
 
+    def _set_status(self, queryset, status):
+        """
+        UPDATE groupé ; chaque transition est poussée aux flux de suivi des
+        clients et notifiée (notifications en masse, emails après commit)
+        """
+        with transaction.atomic():
+            orders = list(
+                Order.objects.select_for_update(of=('self',)).select_related('client')
+                .filter(pk__in=queryset.values('pk'))
+            )
+            updated = Order.objects.filter(pk__in=[order.pk for order in orders]).update(status=status)
+            NotificationService.notify_order_status_updates(
+                [(order, order.status) for order in orders], status
+            )
+        return updated
+
     def mark_as_preparing(self, request, queryset):
-        updated = queryset.update(status=Order.Status.PREPARING)
+        updated = self._set_status(queryset, Order.Status.PREPARING)
         self.message_user(request, f"{updated} commande(s) marquée(s) en préparation.")
     mark_as_preparing.short_description = "FMarquer comme en préparation"
 
     def mark_as_shipped(self, request, queryset):
-        updated = queryset.update(status=Order.Status.SHIPPED)
+        updated = self._set_status(queryset, Order.Status.SHIPPED)
         self.message_user(request, f"{updated} commande(s) marquée(s) comme expédiée(s).")
     mark_as_shipped.short_description = "Marquer comme expédiée(s)"
 
     def mark_as_delivered(self, request, queryset):
-        updated = queryset.update(status=Order.Status.DELIVERED)
+        updated = self._set_status(queryset, Order.Status.DELIVERED)
         self.message_user(request, f"{updated} commande(s) marquée(s) comme livrée(s).")
     mark_as_delivered.short_description = "Marquer comme livrée(s)"
 
     def mark_as_cancelled(self, request, queryset):
-        updated = queryset.filter(status__in=[Order.Status.PENDING, Order.Status.CONFIRMED]).update(status=Order.Status.CANCELLED)
+        updated = self._set_status(
+            queryset.filter(status__in=[Order.Status.PENDING, Order.Status.CONFIRMED]), Order.Status.CANCELLED
+        )
         self.message_user(request, f"{updated} commande(s) annulée(s).")
     mark_as_cancelled.short_description = "Annuler les commandes sélectionnées"
 
@@ -116,7 +136,7 @@ class OrderAdmin(admin.ModelAdmin):
     created_at_formatted.admin_order_field = 'created_at'
 
     def items_count(self, obj):
-        return obj.items_count
+        return obj.summary.items_count
     items_count.short_description = "Articles"
 
 
@@ -128,6 +148,9 @@ class CartItemInline(admin.TabularInline):
     readonly_fields = ('get_subtotal',)
     raw_id_fields = ('product',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
@@ -146,7 +169,7 @@ class CartAdmin(admin.ModelAdmin):
     user_link.admin_order_field = 'user__username'
 
     def total_amount(self, obj):
-        return f"{obj.get_total_amount():.2f} €"
+        return f"{obj.summary.total_amount:.2f} €"
     total_amount.short_description = "Total panier"
 
     def updated_at_formatted(self, obj):
@@ -155,7 +178,7 @@ class CartAdmin(admin.ModelAdmin):
     updated_at_formatted.admin_order_field = 'updated_at'
 
     def items_count(self, obj):
-        return obj.items_count
+        return obj.summary.items_count
     items_count.short_description = "Articles"
 
 
@@ -1,3 +1,5 @@
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -5,9 +7,13 @@ from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
 from django.shortcuts import get_object_or_404
 from ..models import Order, OrderItem, Cart, CartItem
+from ..cart_store import HotCartStore
+from ..services import CartService
+from apps.products.stock import StockService
 from .serializers import OrderSerializer, OrderCreateSerializer, CartSerializer
 from apps.marketplace.services import PaymentService
 from tasks.email_tasks import send_order_confirmation_task
+from services.notification_service import NotificationService
 
 class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
@@ -27,24 +33,12 @@ class OrderViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         with transaction.atomic():
+            # OrderCreateSerializer.create -> OrderBuilder : prix figés, stock
+            # décrémenté en un UPDATE, lignes en bulk_create (rollback si rupture)
             order = serializer.save(client=self.request.user)
-            
-            # Créer les items
-            items_data = self.request.data.get('items', [])
-            for item_data in items_data:
-                product = get_object_or_404(OrderItem, product_id=item_data['product'])
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=item_data['quantity'],
-                    unit_price=product.price
-                )
-                # Mettre à jour le stock
-                product.stock -= item_data['quantity']
-                product.save()
-            
-            # Email async
-            send_order_confirmation_task.delay(order.id)
+
+            # Email async, une fois la commande validée
+            transaction.on_commit(lambda: send_order_confirmation_task.delay(order.id))
             
             return order
 
@@ -59,13 +53,20 @@ class OrderViewSet(viewsets.ModelViewSet):
         if not order.can_be_cancelled:
             return Response({'error': 'la Commande ne peut pas être annulée'}, status=status.HTTP_400_BAD_REQUEST)
         
-        order.status = 'CANCELLED'
-        order.save()
-        
-        # Remettre le stock
-        for item in order.items.all():
-            item.product.stock += item.quantity
-            item.product.save()
+        with transaction.atomic():
+            # Transition conditionnelle : deux annulations simultanées ne remettent
+            # le stock qu'une fois
+            cancelled = Order.objects.filter(
+                pk=order.pk,
+                status__in=[Order.Status.PENDING, Order.Status.CONFIRMED]
+            ).update(status=Order.Status.CANCELLED)
+            if not cancelled:
+                return Response({'error': 'la Commande ne peut pas être annulée'}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Remettre le stock (un seul UPDATE)
+            StockService.increment(order.items.values_list('product_id', 'quantity'))
+            # Flux de suivi SSE, notification et email du client
+            NotificationService.notify_order_status_update(order, order.status, Order.Status.CANCELLED)
         
         return Response({'status': 'Commande annulée'})
 
@@ -99,8 +100,14 @@ class CartViewSet(viewsets.ModelViewSet):
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
 
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # L'API travaille sur le panier en base : flush du panier chaud d'abord
+        if request.user.is_authenticated:
+            HotCartStore.checkin(request.user.id)
+
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user).prefetch_related('items')
+        return Cart.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
         cart, created = Cart.objects.get_or_create(user=self.request.user)
@@ -113,23 +120,25 @@ class CartViewSet(viewsets.ModelViewSet):
         product_id = request.data.get('product_id')
         quantity = request.data.get('quantity', 1)
         
+        try:
+            quantity = Decimal(str(quantity))
+        except InvalidOperation:
+            return Response({'error': 'Quantité invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        if quantity <= 0:
+            return Response({'error': 'Quantité invalide'}, status=status.HTTP_400_BAD_REQUEST)
+
         from apps.products.models import Product
-        product = get_object_or_404(Product, id=product_id)
-        
-        if product.stock < quantity:
+        get_object_or_404(Product, id=product_id)
+
+        # Upsert plafonné au stock vendable, sûr en cas de requêtes concurrentes
+        line = CartService.add(cart.pk, product_id, quantity)
+        if line is None:
             return Response({'error': 'Stock insuffisant'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            item.quantity += quantity
-            item.save()
-        
-        return Response(CartSerializer(cart).data)
+
+        data = CartSerializer(cart).data
+        if line.clamped:
+            data['warning'] = f"Stock insuffisant : quantité limitée à {line.quantity}"
+        return Response(data)
 
     @action(detail=True, methods=['post'])
     def remove_item(self, request, pk=None):
@@ -137,7 +146,7 @@ class CartViewSet(viewsets.ModelViewSet):
         cart = self.get_object()
         product_id = request.data.get('product_id')
         
-        CartItem.objects.filter(cart=cart, product_id=product_id).delete()
+        CartService.remove(cart.pk, product_id)
         
         return Response(CartSerializer(cart).data)
 
@@ -1,5 +1,7 @@
 from rest_framework import serializers
+from apps.products.stock import InsufficientStock
 from ..models import Order, OrderItem, Cart, CartItem
+from ..services import OrderBuilder
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -40,6 +42,17 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         
         return items
 
+    def create(self, validated_data):
+        """Commande, lignes et stock en une passe ; tout ou rien si une ligne manque de stock"""
+        items = validated_data.pop('items')
+        builder = OrderBuilder(**validated_data)
+        for item in items:
+            builder.add(item['product'], item['quantity'])
+        try:
+            return builder.build()
+        except InsufficientStock as e:
+            raise serializers.ValidationError({'items': e.shortfalls})
+
 
 class CartItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -51,13 +64,11 @@ class CartItemSerializer(serializers.ModelSerializer):
 
 
 class CartSerializer(serializers.ModelSerializer):
-    items = CartItemSerializer(many=True, read_only=True)
-    total = serializers.SerializerMethodField()
+    # Lignes et totaux lus dans Cart.summary (une requête, en cache)
+    items = CartItemSerializer(source='summary.lines', many=True, read_only=True)
+    total = serializers.DecimalField(source='summary.total_amount', max_digits=12, decimal_places=2, read_only=True)
     
     class Meta:
         model = Cart
         fields = ['id', 'user', 'items', 'total', 'updated_at']
-        read_only_fields = ['user']
-    
-    def get_total(self, obj):
-        return sum(item.quantity * item.product.price for item in obj.items.all())
\ No newline at end of file
+        read_only_fields = ['user']
\ No newline at end of file
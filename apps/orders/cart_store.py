@@ -0,0 +1,257 @@
+"""
+Panier "chaud" dans Redis, écrit en base en différé (write-behind).
+
+Avec CART_STORAGE = 'redis', un ajout au panier est un HINCRBY sur le hash
+`cart:hot:<user_id>` (product_id -> quantité en centièmes, les quantités étant
+décimales) : ni get_or_create du panier ni save de ligne sur le chemin de la
+requête. Les utilisateurs modifiés sont notés dans `cart:hot:dirty` et la tâche
+`tasks.cart_tasks.flush_hot_carts` recopie leur hash dans Cart / CartItem.
+
+Le hash, quand il existe, fait foi ; sinon c'est la base. Au premier ajout, le
+champ sentinelle `_seeded` (HSETNX : un seul gagnant) déclenche la recopie des
+lignes déjà en base dans le hash. Les écrans qui lisent ou modifient le panier en
+base (page panier, checkout, API) appellent d'abord `checkin` : le hash est
+retiré de Redis et écrit en base de façon synchrone ; le prochain ajout le recrée.
+
+Avec CART_STORAGE = 'database', tout passe par la base comme avant et `checkin`
+ne fait rien. CART_STORAGE = 'redis' sans cache Redis est une erreur de
+configuration (check système orders.E001, ImproperlyConfigured à l'usage) ;
+seule une panne Redis passagère bascule, avec un avertissement, sur la base.
+"""
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+
+from utils.redis_client import RedisError, get_redis, redis_key
+
+from .models import Cart, CartItem
+
+logger = logging.getLogger(__name__)
+
+CART_STORAGE = getattr(settings, 'CART_STORAGE', 'database')
+HOT_CART_TTL = getattr(settings, 'HOT_CART_TTL_SECONDS', 7 * 24 * 3600)
+FLUSH_BATCH_SIZE = getattr(settings, 'HOT_CART_FLUSH_BATCH_SIZE', 200)
+
+SEEDED_FIELD = '_seeded'
+DIRTY_KEY = 'cart:hot:dirty'
+HUNDREDTHS = Decimal('100')
+
+
+def check_cart_storage(app_configs=None, **kwargs):
+    """Check système : CART_STORAGE = 'redis' exige un cache Redis"""
+    if CART_STORAGE == 'redis' and get_redis() is None:
+        return [checks.Error(
+            "CART_STORAGE = 'redis' mais le cache 'default' n'est pas Redis.",
+            hint="Configurer CACHES['default'] sur django-redis ou CART_STORAGE = 'database'.",
+            id='orders.E001',
+        )]
+    return []
+
+
+def _cart_key(user_id):
+    return redis_key('cart', 'hot', user_id)
+
+
+def _to_hundredths(quantity):
+    return int(Decimal(str(quantity)) * HUNDREDTHS)
+
+
+def _parse(raw):
+    """{b'product_id': b'centièmes'} -> {product_id: Decimal}, lignes > 0 seulement"""
+    quantities = {}
+    for field, value in raw.items():
+        field = field.decode() if isinstance(field, bytes) else field
+        if field == SEEDED_FIELD:
+            continue
+        quantity = Decimal(int(value)) / HUNDREDTHS
+        if quantity > 0:
+            quantities[int(field)] = quantity
+    return quantities
+
+
+def _write_cart(user_id, quantities):
+    """
+    Remplace les lignes du panier en base par `quantities` (une transaction).
+    Les produits supprimés ou désactivés depuis l'ajout sont écartés (sinon la
+    clé étrangère de CartItem échouerait au commit). Retourne leurs ids.
+    """
+    from apps.products.models import Product
+    from .services import CartSummary
+
+    active = set(Product.objects.filter(pk__in=list(quantities), is_active=True).values_list('pk', flat=True))
+    dropped = set(quantities) - active
+    quantities = {pid: q for pid, q in quantities.items() if pid in active}
+
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user_id=user_id)
+        cart.items.exclude(product_id__in=list(quantities)).delete()
+        if quantities:
+            CartItem.objects.bulk_create(
+                [CartItem(cart=cart, product_id=pid, quantity=q) for pid, q in quantities.items()],
+                update_conflicts=True,
+                unique_fields=['cart', 'product'],
+                update_fields=['quantity'],
+            )
+        # bulk_create n'émet pas post_save
+        CartSummary.invalidate(cart.pk)
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+    return dropped
+
+
+def _restore(client, user_id, raw):
+    """
+    Remet un hash retiré par `checkin` dont l'écriture a échoué (WATCH + MULTI,
+    TTL réappliqué). Si un ajout concurrent a déjà réamorcé le panier depuis la
+    base, on ne remet rien : ses lignes seraient comptées deux fois.
+    """
+    key = _cart_key(user_id)
+
+    def restore(pipe):
+        if pipe.hexists(key, SEEDED_FIELD):
+            return
+        pipe.multi()
+        pipe.hset(key, mapping=raw)
+        pipe.expire(key, HOT_CART_TTL)
+        pipe.sadd(redis_key(DIRTY_KEY), user_id)
+
+    try:
+        client.transaction(restore, key)
+    except RedisError as e:
+        logger.error(f"❌ Panier chaud {user_id} non restauré : {e}")
+
+
+class HotCartStore:
+    """Paniers actifs dans Redis (mode CART_STORAGE = 'redis')"""
+
+    @staticmethod
+    def client():
+        """Client Redis si le mode est actif, sinon None"""
+        if CART_STORAGE != 'redis':
+            return None
+        client = get_redis()
+        if client is None:
+            raise ImproperlyConfigured("CART_STORAGE = 'redis' exige un cache Redis (CACHES['default'])")
+        return client
+
+    @classmethod
+    def add(cls, user_id, product_id, quantity=1):
+        """
+        Ajoute `quantity` (négatif pour retirer) au produit. Retourne False si le
+        panier chaud est indisponible : l'appelant passe alors par la base.
+        """
+        client = cls.client()
+        if client is None:
+            return False
+
+        key = _cart_key(user_id)
+        try:
+            pipe = client.pipeline(transaction=True)
+            pipe.hsetnx(key, SEEDED_FIELD, 1)
+            pipe.hincrby(key, product_id, _to_hundredths(quantity))
+            pipe.expire(key, HOT_CART_TTL)
+            pipe.sadd(redis_key(DIRTY_KEY), user_id)
+            seeded_now = pipe.execute()[0]
+
+            if seeded_now:
+                # Premier accès depuis le dernier checkin : on repart du panier en base
+                lines = CartItem.objects.filter(cart__user_id=user_id).values_list('product_id', 'quantity')
+                pipe = client.pipeline(transaction=True)
+                for pid, q in lines:
+                    pipe.hincrby(key, pid, _to_hundredths(q))
+                pipe.execute()
+        except RedisError as e:
+            logger.warning(f"⚠️ Panier chaud indisponible, écriture en base : {e}")
+            return False
+        return True
+
+    @classmethod
+    def quantities(cls, user_id):
+        """{product_id: quantité} du panier chaud, ou None s'il n'existe pas"""
+        client = cls.client()
+        if client is None:
+            return None
+        try:
+            raw = client.hgetall(_cart_key(user_id))
+        except RedisError:
+            return None
+        return _parse(raw) if raw else None
+
+    @classmethod
+    def total_quantity(cls, user_id):
+        """Nombre d'articles (badge du panier) sans requête SQL, ou None"""
+        quantities = cls.quantities(user_id)
+        return None if quantities is None else sum(quantities.values(), Decimal('0'))
+
+    @classmethod
+    def checkin(cls, user_id):
+        """
+        Flush synchrone avant une lecture / écriture du panier en base : le hash
+        est retiré de Redis (MULTI HGETALL + DEL) puis écrit en base.
+        Retourne True si un panier chaud a été écrit.
+        """
+        client = cls.client()
+        if client is None:
+            return False
+
+        key = _cart_key(user_id)
+        try:
+            pipe = client.pipeline(transaction=True)
+            pipe.hgetall(key)
+            pipe.delete(key)
+            pipe.srem(redis_key(DIRTY_KEY), user_id)
+            raw = pipe.execute()[0]
+        except RedisError as e:
+            logger.warning(f"⚠️ Checkin du panier chaud {user_id} impossible : {e}")
+            return False
+        if not raw:
+            return False
+
+        try:
+            _write_cart(user_id, _parse(raw))
+        except Exception:
+            # Remis en place pour le prochain flush plutôt que perdu
+            _restore(client, user_id, raw)
+            raise
+        return True
+
+    @classmethod
+    def flush(cls, batch_size=FLUSH_BATCH_SIZE):
+        """
+        Écrit en base les paniers modifiés depuis le dernier passage. Le hash reste
+        dans Redis (il fait toujours foi) ; un utilisateur retiré du set puis
+        modifié pendant l'écriture y est remis par son ajout suivant.
+        Retourne le nombre de paniers écrits.
+        """
+        client = cls.client()
+        if client is None:
+            return 0
+
+        written = 0
+        failed = []
+        while True:
+            user_ids = client.spop(redis_key(DIRTY_KEY), batch_size)
+            for user_id in user_ids or []:
+                user_id = int(user_id)
+                raw = client.hgetall(_cart_key(user_id))
+                if SEEDED_FIELD.encode() not in raw:
+                    continue  # déjà écrit (et retiré) par un checkin
+                try:
+                    dropped = _write_cart(user_id, _parse(raw))
+                    if dropped:
+                        client.hdel(_cart_key(user_id), *dropped)
+                    written += 1
+                except Exception as e:
+                    failed.append(user_id)
+                    logger.error(f"❌ Écriture du panier chaud {user_id} impossible : {e}")
+            if not user_ids or len(user_ids) < batch_size:
+                break
+
+        if failed:
+            # Repris au prochain passage
+            client.sadd(redis_key(DIRTY_KEY), *failed)
+        return written
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-01-14 10:15
+
+import apps.orders.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_stockreservation'),
+    ]
+
+    operations = [
+        # Séquence des numéros de commande, démarrée après les numéros existants (basés sur le PK)
+        migrations.RunSQL(
+            sql="""
+                CREATE SEQUENCE IF NOT EXISTS orders_order_number_seq;
+                SELECT setval(
+                    'orders_order_number_seq',
+                    GREATEST((SELECT COALESCE(MAX(id), 0) FROM orders_order), 1),
+                    (SELECT COUNT(*) > 0 FROM orders_order)
+                );
+            """,
+            reverse_sql="DROP SEQUENCE IF EXISTS orders_order_number_seq;",
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_number',
+            field=models.CharField(db_default=apps.orders.models.NextOrderNumber(), db_index=True, max_length=50, unique=True, verbose_name='Numéro de commande'),
+        ),
+    ]
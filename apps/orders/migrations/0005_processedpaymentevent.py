@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-01-15 09:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_number_sequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedPaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_intent_id', models.CharField(max_length=255, unique=True, verbose_name='ID intention paiement')),
+                ('source', models.CharField(choices=[('redirect', 'Redirection client'), ('webhook', 'Webhook')], max_length=20, verbose_name='Source')),
+                ('processed_at', models.DateTimeField(auto_now_add=True, verbose_name='Traité le')),
+            ],
+            options={
+                'verbose_name': 'Paiement traité',
+                'verbose_name_plural': 'Paiements traités',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('payment_intent_id', ''), _negated=True), fields=['payment_intent_id'], name='orders_orde_intent_idx'),
+        ),
+        migrations.AddField(
+            model_name='processedpaymentevent',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_events', to='orders.order'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-01-15 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_processedpaymentevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255, unique=True, verbose_name='ID événement')),
+                ('event_type', models.CharField(max_length=100, verbose_name='Type')),
+                ('payment_intent_id', models.CharField(blank=True, max_length=255, verbose_name='ID intention paiement')),
+                ('payload', models.JSONField(verbose_name='Événement brut')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('processed', 'Traité'), ('failed', 'Échec')], default='pending', max_length=20, verbose_name='Statut')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')),
+                ('last_error', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Reçu le')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Traité le')),
+            ],
+            options={
+                'verbose_name': 'Webhook de paiement',
+                'verbose_name_plural': 'Webhooks de paiement',
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['id'], name='orders_webh_pending_idx'), models.Index(condition=models.Q(('status', 'pending')), fields=['payment_intent_id', 'id'], name='orders_webh_intent_idx')],
+            },
+        ),
+    ]
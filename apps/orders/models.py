@@ -1,12 +1,30 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Func, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from apps.products.models import Product
 from django.utils import timezone
+from django.utils.functional import cached_property
 from apps.utilisateur.models import Utilisateur
 
 User = Utilisateur
 
+ORDER_NUMBER_SEQUENCE = 'orders_order_number_seq'
+
+
+class NextOrderNumber(Func):
+    """AGR-AAAAMMJJ-NNNNNN, NNNNNN tiré de la séquence orders_order_number_seq"""
+    arity = 0
+    template = (
+        f"'AGR-' || TO_CHAR(NOW(), 'YYYYMMDD') || '-' || "
+        f"LPAD(NEXTVAL('{ORDER_NUMBER_SEQUENCE}')::text, 6, '0')"
+    )
+    output_field = models.CharField()
+
+
 class Order(models.Model):
     class Status(models.TextChoices):  # ← Upgradé : TextChoices pour Django 6.0
         PENDING = 'PENDING', _('En attente de paiement')
@@ -23,7 +41,7 @@ class Order(models.Model):
         related_name='orders',
         limit_choices_to={'role': 'CLIENT'}  # ← Filtre rôle pour cohérence UML
     )
-    order_number = models.CharField(max_length=50, unique=True, db_index=True, verbose_name=_('Numéro de commande'))
+    order_number = models.CharField(max_length=50, unique=True, db_index=True, db_default=NextOrderNumber(), verbose_name=_('Numéro de commande'))
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, verbose_name=_('Statut'))
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_('Montant total'))
     shipping_address = models.TextField(blank=True, verbose_name=_('Adresse de livraison'))
@@ -45,47 +63,26 @@ class Order(models.Model):
             models.Index(fields=['client', 'status']),
             models.Index(fields=['order_number']),
             models.Index(fields=['status', 'created_at']),  # Pour dashboards récents
+            # Recherche par intention de paiement (confirmation, webhook) ; partiel :
+            # les commandes sans paiement en ligne n'encombrent pas l'index
+            models.Index(
+                fields=['payment_intent_id'],
+                name='orders_orde_intent_idx',
+                condition=~models.Q(payment_intent_id=''),
+            ),
         ]
 
     def __str__(self):
         return f"Commande #{self.order_number} - {self.client.username}"
-    def save(self, *args, **kwargs):
-        is_new = self.pk is None
-
-        # 1️⃣ Premier save pour obtenir le PK
-        if is_new:
-            super().save(*args, **kwargs)
-
-        # 2️⃣ Génération du numéro UNIQUE basé sur le PK
-        if not self.order_number:
-            self.order_number = self.generate_order_number()
-
-        # 3️⃣ Calcul du total
-        self.total_amount = self.get_total_amount()
-
-        # 4️⃣ Save final
-        super().save(update_fields=['order_number', 'total_amount'] if not is_new else None)
 
-    # def save(self, *args, **kwargs):
-    #     if not self.order_number:
-    #         self.order_number = self.generate_order_number()
-    #     self.total_amount = self.get_total_amount()    
-    #     super().save(*args, **kwargs)
-
-    def generate_order_number(self):
-        """Génère un numéro unique AGR-YYYYMMDD-USERID-PK"""
-        """AGR-YYYYMMDD-PK"""
-        date_str = timezone.now().strftime('%Y%m%d')
-        return f"AGR-{date_str}-{self.pk:06d}"
-        # from datetime import datetime
-        # pk_str = str(self.pk) if self.pk else 'NEW'
-        # return f"AGR-{datetime.now().strftime('%Y%m%d')}-{self.client.id:06d}-{pk_str[:6]}"  # Padding pour unicité
+    # Pas de save() surchargé : le numéro est attribué par la base à l'INSERT
+    # (NextOrderNumber) et le total calculé à la création (apps/orders/services.OrderBuilder).
 
     def get_total_amount(self):
-        """Calcule total depuis OrderItem (auto si pas set)"""
-        if self.pk:  # Seulement si l'objet existe déjà en BDD (pour items.all())
-            return sum(item.subtotal for item in self.items.all()) or 0
-        return 0 
+        """Total des lignes en une requête (agrégat SQL)"""
+        if not self.pk:
+            return 0
+        return self.items.aggregate(total=Coalesce(Sum('subtotal'), Value(Decimal('0'))))['total']
 
     @property
     def items_count(self):
@@ -95,6 +92,70 @@ class Order(models.Model):
     def can_be_cancelled(self):
         return self.status in [self.Status.PENDING, self.Status.CONFIRMED]
 
+class ProcessedPaymentEvent(models.Model):
+    """
+    Une ligne par intention de paiement confirmée : la contrainte d'unicité rend
+    la confirmation idempotente (rafraîchissement de la page de succès, relance
+    de la redirection ou du webhook = simple lecture).
+    """
+    class Source(models.TextChoices):
+        REDIRECT = 'redirect', _('Redirection client')
+        WEBHOOK = 'webhook', _('Webhook')
+
+    payment_intent_id = models.CharField(max_length=255, unique=True, verbose_name=_('ID intention paiement'))
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='payment_events')
+    source = models.CharField(max_length=20, choices=Source.choices, verbose_name=_('Source'))
+    processed_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Traité le'))
+
+    class Meta:
+        app_label = 'orders'
+        verbose_name = _('Paiement traité')
+        verbose_name_plural = _('Paiements traités')
+
+    def __str__(self):
+        return f"{self.payment_intent_id} → {self.order_id}"
+
+
+class PaymentWebhookEvent(models.Model):
+    """
+    Boîte de réception des webhooks de paiement (ajout seul). L'endpoint vérifie la
+    signature, insère l'événement brut et répond 200 ; la tâche
+    `tasks.payment_tasks.drain_payment_webhooks` le traite ensuite par lots.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('En attente')
+        PROCESSED = 'processed', _('Traité')
+        FAILED = 'failed', _('Échec')
+
+    event_id = models.CharField(max_length=255, unique=True, verbose_name=_('ID événement'))  # dédoublonnage des relivraisons
+    event_type = models.CharField(max_length=100, verbose_name=_('Type'))
+    payment_intent_id = models.CharField(max_length=255, blank=True, verbose_name=_('ID intention paiement'))
+    payload = models.JSONField(verbose_name=_('Événement brut'))
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, verbose_name=_('Statut'))
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name=_('Tentatives'))
+    last_error = models.TextField(blank=True, verbose_name=_('Dernière erreur'))
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Reçu le'))
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Traité le'))
+
+    class Meta:
+        app_label = 'orders'
+        verbose_name = _('Webhook de paiement')
+        verbose_name_plural = _('Webhooks de paiement')
+        indexes = [
+            # File d'attente : seuls les événements en attente sont indexés
+            models.Index(fields=['id'], name='orders_webh_pending_idx', condition=models.Q(status='pending')),
+            # Ordre par intention : "un événement plus ancien est-il encore en attente ?"
+            models.Index(
+                fields=['payment_intent_id', 'id'],
+                name='orders_webh_intent_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id} ({self.status})"
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.PROTECT, verbose_name=_('Produit'), related_name='order_items')
@@ -112,7 +173,9 @@ class OrderItem(models.Model):
         return f"{self.product.name} x {self.quantity}"
 
     def save(self, *args, **kwargs):
-        self.unit_price = self.product.price  # Sync avec prix actuel du produit
+        # Prix figé à la commande : le produit n'est relu que si aucun prix n'est fourni
+        if self.unit_price is None:
+            self.unit_price = self.product.price
         self.subtotal = self.quantity * self.unit_price
         super().save(*args, **kwargs)
 
@@ -136,12 +199,21 @@ class Cart(models.Model):
     def __str__(self):
         return f"Panier de {self.user.username}"
 
+    @cached_property
+    def summary(self):
+        """
+        CartSummary (lignes + totaux, une requête, en cache). Calculé une fois par
+        instance : relire le panier après l'avoir modifié.
+        """
+        from .services import CartSummary
+        return CartSummary.for_cart(self)
+
     def get_total_amount(self):
-        return sum(item.get_subtotal() for item in self.items.all()) or 0
+        return self.summary.total_amount
 
     @property
     def items_count(self):
-        return self.items.count()
+        return self.summary.items_count
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
@@ -158,10 +230,38 @@ class CartItem(models.Model):
         return f"{self.product.name} x {self.quantity}"
 
     def get_subtotal(self):
-        return self.quantity * self.product.price
+        # Annoté par CartSummary : pas de lecture du produit
+        line_total = getattr(self, 'line_total', None)
+        return line_total if line_total is not None else self.quantity * self.product.price
 
     def save(self, *args, **kwargs):
         if self.quantity <= 0:
             self.delete()
             return
         super().save(*args, **kwargs)
+
+
+class StockReservation(models.Model):
+    """
+    Stock retenu pour un panier pendant le paiement, jusqu'à `expires_at`.
+    Le total par produit est reporté dans Product.reserved_stock (cf. apps/orders/reservations.py).
+    """
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_('Quantité'))
+    expires_at = models.DateTimeField(verbose_name=_('Expire le'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Créé le'))
+
+    class Meta:
+        app_label = 'orders'
+        verbose_name = _('Réservation de stock')
+        verbose_name_plural = _('Réservations de stock')
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product_reservation'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='orders_stoc_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity} (panier {self.cart_id})"
@@ -0,0 +1,142 @@
+"""
+Réservations de stock limitées dans le temps pendant le paiement.
+
+Quand le client ouvre le checkout, chaque ligne de son panier est retenue pour
+STOCK_RESERVATION_TTL secondes : une ligne StockReservation par (panier, produit)
+et le total par produit dans Product.reserved_stock. Le stock vendable est donc
+`stock - reserved_stock`, lisible sans agrégat.
+
+Réserver est un UPDATE conditionnel (reserved_stock + q WHERE stock - reserved_stock >= q)
+suivi d'un INSERT groupé : O(lignes), et les lignes produit ne sont verrouillées
+que le temps de la requête, jamais pendant le paiement. Libérer / expirer est un
+DELETE ... RETURNING qui décrémente les compteurs dans la même instruction.
+La tâche `tasks.product_tasks.expire_stock_reservations` purge les réservations
+échues par lots.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.products.models import Product
+from apps.products.stock import InsufficientStock
+
+from .models import StockReservation
+
+logger = logging.getLogger(__name__)
+
+STOCK_RESERVATION_TTL = getattr(settings, 'STOCK_RESERVATION_TTL_SECONDS', 15 * 60)
+SWEEP_BATCH_SIZE = getattr(settings, 'STOCK_RESERVATION_SWEEP_BATCH_SIZE', 1000)
+
+
+def _release_sql(condition):
+    """DELETE des réservations + décrément des compteurs, en une instruction"""
+    return (
+        f"WITH released AS ("
+        f"  DELETE FROM {StockReservation._meta.db_table} WHERE {condition}"
+        f"  RETURNING product_id, quantity"
+        f"), totals AS ("
+        f"  SELECT product_id, SUM(quantity) AS qty, COUNT(*) AS n FROM released GROUP BY product_id"
+        f") "
+        f"UPDATE {Product._meta.db_table} AS p "
+        f"SET reserved_stock = GREATEST(p.reserved_stock - t.qty, 0) "
+        f"FROM totals t WHERE p.id = t.product_id "
+        f"RETURNING t.n"
+    )
+
+
+def _execute_release(condition, params):
+    with connection.cursor() as cursor:
+        cursor.execute(_release_sql(condition), params)
+        return sum(n for (n,) in cursor.fetchall())
+
+
+class ReservationService:
+    """Réserve, libère et expire le stock retenu par les paniers"""
+
+    @staticmethod
+    def reserve(cart, ttl=STOCK_RESERVATION_TTL):
+        """
+        Retient le contenu du panier jusqu'à maintenant + ttl (remplace les
+        réservations précédentes du panier). Tout ou rien : lève InsufficientStock
+        si une ligne dépasse le stock vendable. Retourne la date d'expiration.
+        """
+        totals = {}
+        for product_id, quantity in cart.items.values_list('product_id', 'quantity'):
+            totals[product_id] = totals.get(product_id, Decimal('0')) + quantity
+        expires_at = timezone.now() + timedelta(seconds=ttl)
+
+        with transaction.atomic():
+            _execute_release('cart_id = %s', [cart.pk])
+            if not totals:
+                return None
+
+            values = ', '.join(['(%s::bigint, %s::numeric)'] * len(totals))
+            params = [p for item in sorted(totals.items()) for p in item]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {Product._meta.db_table} AS p "
+                    f"SET reserved_stock = p.reserved_stock + v.qty "
+                    f"FROM (VALUES {values}) AS v(id, qty) "
+                    f"WHERE p.id = v.id AND p.is_active AND p.stock - p.reserved_stock >= v.qty "
+                    f"RETURNING p.id",
+                    params,
+                )
+                reserved = {pid for (pid,) in cursor.fetchall()}
+
+            missing = [pid for pid in totals if pid not in reserved]
+            if missing:
+                products = Product.objects.filter(pk__in=missing).values_list('pk', 'stock', 'reserved_stock')
+                available = {pid: max(stock - held, 0) for pid, stock, held in products}
+                raise InsufficientStock([
+                    {
+                        'product_id': pid,
+                        'requested': totals[pid],
+                        'available': available.get(pid, Decimal('0')),
+                    }
+                    for pid in missing
+                ])
+
+            StockReservation.objects.bulk_create([
+                StockReservation(cart=cart, product_id=pid, quantity=quantity, expires_at=expires_at)
+                for pid, quantity in totals.items()
+            ])
+        return expires_at
+
+    @staticmethod
+    def release(cart):
+        """Libère les réservations du panier (paiement abouti ou abandonné)"""
+        return _execute_release('cart_id = %s', [cart.pk])
+
+    @staticmethod
+    def expire(batch_size=SWEEP_BATCH_SIZE, now=None):
+        """
+        Purge les réservations échues par lots (SKIP LOCKED : plusieurs
+        balayeurs ou un checkout en cours ne se bloquent pas). Retourne le nombre purgé.
+        """
+        now = now or timezone.now()
+        table = StockReservation._meta.db_table
+        condition = (
+            f"id IN (SELECT id FROM {table} WHERE expires_at <= %s "
+            f"ORDER BY expires_at LIMIT %s FOR UPDATE SKIP LOCKED)"
+        )
+        expired = 0
+        while True:
+            with transaction.atomic():
+                n = _execute_release(condition, [now, batch_size])
+            expired += n
+            if n < batch_size:
+                return expired
+
+    @staticmethod
+    def expires_at(cart):
+        """Fin de la réservation active du panier (None si aucune)"""
+        return (
+            StockReservation.objects.filter(cart=cart, expires_at__gt=timezone.now())
+            .order_by('expires_at')
+            .values_list('expires_at', flat=True)
+            .first()
+        )
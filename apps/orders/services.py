@@ -0,0 +1,383 @@
+"""
+Création de commande en une passe.
+
+OrderBuilder fige les prix (une lecture des produits), décrémente le stock de
+toutes les lignes (StockService, un UPDATE), insère la commande avec son total
+déjà calculé et son numéro tiré d'une séquence PostgreSQL (renvoyé par l'INSERT,
+pas de second save), puis crée toutes les lignes en un bulk_create.
+Le nombre de requêtes ne dépend pas du nombre de lignes.
+
+CartSummary : lignes, quantités et total d'un panier en une requête annotée,
+mis en cache par panier (versions 'cart:<id>' et 'product').
+
+CartService : ajout / incrément / décrément / retrait d'une ligne en une
+instruction (INSERT ... ON CONFLICT DO UPDATE ou UPDATE), bornée au stock
+vendable dans la même instruction : pas de lecture-modification-écriture, donc
+pas de mise à jour perdue sur un double clic.
+"""
+import logging
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import DecimalField, F
+from django.db.models.functions import Cast
+
+from apps.products.models import Product
+from apps.products.stock import InsufficientStock, StockService
+
+from utils.cache_versions import bump_version, get_versions
+
+from .models import CartItem, Order, OrderItem, StockReservation
+from .reservations import ReservationService
+
+logger = logging.getLogger(__name__)
+
+CART_SUMMARY_CACHE_TIMEOUT = 300
+
+# Après ce nombre de conflits, une ligne toujours en rupture est retirée de la commande
+STOCK_ADJUST_ATTEMPTS = 3
+
+
+class OrderBuilder:
+    """
+    Usage :
+        builder = OrderBuilder(client=user, shipping_address=...)
+        builder.add(product_id, quantity)
+        order = builder.build()
+    """
+
+    def __init__(self, client, cart=None, **order_fields):
+        self.client = client
+        self.cart = cart
+        self.order_fields = order_fields
+        self.quantities = {}
+        self.adjustments = []  # [(produit, quantité demandée, quantité retenue)]
+
+    @classmethod
+    def from_cart(cls, cart, **order_fields):
+        """Lignes du panier ; ses réservations de stock deviennent la vente"""
+        builder = cls(client=cart.user, cart=cart, **order_fields)
+        for product_id, quantity in cart.items.values_list('product_id', 'quantity'):
+            builder.add(product_id, quantity)
+        return builder
+
+    def add(self, product_id, quantity):
+        product_id = int(product_id)
+        quantity = Decimal(str(quantity))
+        self.quantities[product_id] = self.quantities.get(product_id, Decimal('0')) + quantity
+        return self
+
+    def _lock_prices(self):
+        """Prix figés au moment de la commande (une seule lecture)"""
+        return Product.objects.filter(pk__in=list(self.quantities), is_active=True).only(
+            'id', 'name', 'price'
+        ).in_bulk()
+
+    def _decrement_stock(self, products, adjust_to_stock):
+        requested = dict(self.quantities)
+        granted = {pid: q for pid, q in requested.items() if pid in products}
+        unavailable = [pid for pid in requested if pid not in products]
+        if unavailable and not adjust_to_stock:
+            raise InsufficientStock([
+                {'product_id': pid, 'requested': requested[pid], 'available': Decimal('0')}
+                for pid in unavailable
+            ])
+        if unavailable:
+            # Désactivé (ou supprimé) depuis le checkout alors que le paiement est
+            # encaissé : ligne retenue à 0 et tracée dans `adjustments` (remboursement)
+            withdrawn = Product.objects.filter(pk__in=unavailable).only('id', 'name', 'price').in_bulk()
+            for pid in unavailable:
+                product = withdrawn.get(pid) or Product(pk=pid, name=f"Produit #{pid}")
+                self.adjustments.append((product, requested[pid], Decimal('0')))
+                logger.warning(f"⚠️ Produit {pid} indisponible à la confirmation : ligne retirée ({requested[pid]})")
+
+        attempts = 0
+        while True:
+            try:
+                StockService.decrement(granted.items())
+                break
+            except InsufficientStock as e:
+                if not adjust_to_stock:
+                    raise
+                attempts += 1
+                for product_id, available in e.available().items():
+                    granted[product_id] = available if attempts < STOCK_ADJUST_ATTEMPTS else Decimal('0')
+
+        for product_id, quantity in requested.items():
+            if product_id in products and granted[product_id] < quantity:
+                self.adjustments.append((products[product_id], quantity, granted[product_id]))
+        return {pid: q for pid, q in granted.items() if q > 0}
+
+    def build(self, adjust_to_stock=False):
+        """
+        Crée la commande et ses lignes dans une transaction.
+        adjust_to_stock=False : tout ou rien, lève InsufficientStock (rien n'est écrit).
+        adjust_to_stock=True : une ligne en rupture est ramenée au stock disponible
+        (paiement déjà encaissé), cf. `adjustments`.
+        """
+        with transaction.atomic():
+            if self.cart is not None:
+                # Libération + décrément dans la même transaction : les lignes
+                # produit restent verrouillées jusqu'au commit
+                ReservationService.release(self.cart)
+
+            products = self._lock_prices()
+            quantities = self._decrement_stock(products, adjust_to_stock)
+
+            lines = [
+                OrderItem(
+                    product_id=product_id,
+                    quantity=quantity,
+                    unit_price=products[product_id].price,
+                    subtotal=quantity * products[product_id].price,
+                )
+                for product_id, quantity in quantities.items()
+            ]
+            order = Order(
+                client=self.client,
+                total_amount=sum((line.subtotal for line in lines), Decimal('0')),
+                **self.order_fields,
+            )
+            # Un seul INSERT : order_number est renvoyé par la base (NextOrderNumber)
+            order.save()
+
+            for line in lines:
+                line.order = order
+            OrderItem.objects.bulk_create(lines)
+
+            if self.cart is not None:
+                self.cart.items.all().delete()
+
+        logger.info(f"🧾 Commande {order.order_number} créée ({len(lines)} lignes, {order.total_amount})")
+        return order
+
+
+class CartSummary:
+    """
+    Contenu et totaux d'un panier, pour tous ses consommateurs (partials HTMX,
+    checkout, API, admin) : une requête (lignes + produit + producteur, sous-total
+    calculé en SQL), puis cache invalidé par version à chaque modification d'une
+    ligne du panier ('cart:<id>') ou d'un produit ('product').
+    """
+
+    def __init__(self, cart_id, lines):
+        self.cart_id = cart_id
+        self.lines = lines  # CartItem avec product (et producteur) chargés, `line_total` annoté
+        self.items_count = len(lines)
+        self.total_quantity = sum((line.quantity for line in lines), Decimal('0'))
+        self.total_amount = sum((line.line_total for line in lines), Decimal('0'))
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    @staticmethod
+    def version_namespace(cart_id):
+        return f"cart:{cart_id}"
+
+    @classmethod
+    def _load(cls, cart_id):
+        lines = list(
+            CartItem.objects.filter(cart_id=cart_id)
+            .select_related('product__producer__user')
+            .only(
+                'id', 'cart_id', 'quantity',
+                'product__id', 'product__name', 'product__price', 'product__unit',
+                'product__image', 'product__stock', 'product__reserved_stock',
+                'product__producer__id', 'product__producer__user__id',
+                'product__producer__user__username',
+            )
+            .annotate(line_total=Cast(
+                F('quantity') * F('product__price'),
+                DecimalField(max_digits=12, decimal_places=2),
+            ))
+            .order_by('id')
+        )
+        return cls(cart_id, lines)
+
+    @classmethod
+    def for_cart(cls, cart):
+        cart_id = getattr(cart, 'pk', cart)
+        cache_key = cls._cache_key(cart_id, *get_versions(cls.version_namespace(cart_id), 'product'))
+        summary = cache.get(cache_key)
+        if summary is None:
+            summary = cls._load(cart_id)
+            cache.set(cache_key, summary, CART_SUMMARY_CACHE_TIMEOUT)
+        return summary
+
+    @classmethod
+    def _cache_key(cls, cart_id, cart_version, product_version):
+        return f"cart:summary:{cart_id}:{cart_version}.{product_version}"
+
+    @classmethod
+    def cached(cls, cart_id):
+        """Résumé en cache pour les versions courantes, sans le calculer (ou None)"""
+        return cache.get(cls._cache_key(cart_id, *get_versions(cls.version_namespace(cart_id), 'product')))
+
+    @classmethod
+    def patch(cls, before, line, cart_version):
+        """
+        Reporte une mutation (CartLine) sur le résumé d'avant la mutation et le met
+        en cache sous la nouvelle version du panier : le rendu qui suit ne relit pas
+        le panier. Sans résumé préalable, ou pour une ligne nouvelle, rien n'est fait
+        (le prochain for_cart recharge).
+        """
+        if before is None or cart_version is None:
+            return None
+
+        lines = []
+        found = False
+        for item in before.lines:
+            if item.product_id == line.product_id:
+                found = True
+                if line.removed:
+                    continue
+                item.quantity = line.quantity
+                item.line_total = (line.quantity * item.product.price).quantize(Decimal('0.01'))
+            lines.append(item)
+        if not found and not line.removed:
+            return None
+
+        summary = cls(before.cart_id, lines)
+        key = cls._cache_key(before.cart_id, cart_version, get_versions('product')[0])
+        cache.set(key, summary, CART_SUMMARY_CACHE_TIMEOUT)
+        return summary
+
+    @classmethod
+    def invalidate(cls, cart_id):
+        """
+        Tout de suite (la requête en cours relit sa propre écriture) et, dans une
+        transaction, au commit (un lecteur concurrent a pu mettre en cache l'état
+        d'avant). Retourne la nouvelle version du panier.
+        """
+        version = bump_version(cls.version_namespace(cart_id))
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: bump_version(cls.version_namespace(cart_id)))
+        return version
+
+
+class CartLine:
+    """État d'une ligne de panier après une mutation de CartService"""
+
+    def __init__(self, product_id, quantity, requested, available=None, name='', item_id=None):
+        self.product_id = product_id
+        self.item_id = item_id
+        self.name = name
+        self.requested = requested  # quantité visée, avant plafonnement au stock
+        self.quantity = max(quantity, Decimal('0'))
+        self.available = available
+
+    @property
+    def removed(self):
+        return self.quantity <= 0
+
+    @property
+    def clamped(self):
+        """La quantité visée dépassait le stock vendable"""
+        return self.quantity < self.requested
+
+
+def _line_sql(statement):
+    """
+    `statement` (INSERT ... ON CONFLICT ou UPDATE de la ligne) dispose de deux CTE :
+    `p`, le stock vendable du produit (stock - réservé, plus ce que ce panier retient
+    déjà pour lui-même ; 0 si le produit est désactivé), et `cur`, la quantité avant
+    mutation (pour indiquer au client la quantité visée).
+    """
+    return (
+        f"WITH p AS ("
+        f"  SELECT pr.id, pr.name, CASE WHEN pr.is_active THEN"
+        f"    GREATEST(pr.stock - pr.reserved_stock, 0) + COALESCE(("
+        f"      SELECT r.quantity FROM {StockReservation._meta.db_table} r"
+        f"      WHERE r.cart_id = %(cart)s AND r.product_id = pr.id"
+        f"    ), 0) ELSE 0 END AS available"
+        f"  FROM {Product._meta.db_table} pr WHERE pr.id = %(product)s"
+        f"), cur AS ("
+        f"  SELECT quantity FROM {CartItem._meta.db_table}"
+        f"  WHERE cart_id = %(cart)s AND product_id = %(product)s"
+        f") {statement} "
+        f"RETURNING {CartItem._meta.db_table}.id, {CartItem._meta.db_table}.quantity,"
+        f"  (SELECT available FROM p), (SELECT name FROM p),"
+        f"  COALESCE((SELECT quantity FROM cur), 0) + %(delta)s::numeric"
+    )
+
+
+class CartService:
+    """
+    Mutations de panier concurrentes sans verrou applicatif. Chaque méthode
+    retourne la CartLine résultante (quantité, plafonnement, retrait) : la vue
+    s'en sert pour ses messages et pour mettre à jour le résumé en cache.
+    """
+
+    @staticmethod
+    def _apply(cart_id, product_id, delta, statement):
+        before = CartSummary.cached(cart_id)
+        with connection.cursor() as cursor:
+            cursor.execute(_line_sql(statement), {'cart': cart_id, 'product': product_id, 'delta': delta})
+            row = cursor.fetchone()
+        if row is None:
+            CartSummary.invalidate(cart_id)
+            return None
+
+        item_id, quantity, available, name, requested = row
+        line = CartLine(product_id, quantity, requested, available, name, item_id)
+        if line.removed:
+            # Re-vérifié en base : un ajout concurrent a pu remonter la quantité entre-temps
+            CartItem.objects.filter(pk=item_id, quantity__lte=0).delete()
+        CartSummary.patch(before, line, CartSummary.invalidate(cart_id))
+        return line
+
+    @classmethod
+    def add(cls, cart_id, product_id, quantity=1):
+        """
+        Ajoute `quantity`, en créant la ligne si besoin :
+        INSERT ... ON CONFLICT (cart, product) DO UPDATE SET quantity = quantity + EXCLUDED.quantity,
+        plafonné au stock vendable. Retourne None si le produit est désactivé ou épuisé
+        et absent du panier.
+        """
+        quantity = Decimal(str(quantity))
+        if quantity <= 0:
+            return cls.change(cart_id, product_id, quantity)
+
+        table = CartItem._meta.db_table
+        return cls._apply(cart_id, product_id, quantity, (
+            f"INSERT INTO {table} (cart_id, product_id, quantity) "
+            f"SELECT %(cart)s, p.id, LEAST(%(delta)s::numeric, p.available) FROM p "
+            f"WHERE LEAST(%(delta)s::numeric, p.available) > 0 "
+            f"ON CONFLICT (cart_id, product_id) DO UPDATE "
+            f"SET quantity = LEAST({table}.quantity + EXCLUDED.quantity, (SELECT available FROM p))"
+        ))
+
+    @classmethod
+    def change(cls, cart_id, product_id, delta):
+        """
+        Incrémente ou décrémente une ligne existante : UPDATE ... SET quantity =
+        LEAST(quantity + delta, stock vendable). Une ligne tombée à 0 est supprimée.
+        Retourne None si la ligne n'existe pas.
+        """
+        delta = Decimal(str(delta))
+        if delta > 0:
+            return cls.add(cart_id, product_id, delta)
+
+        table = CartItem._meta.db_table
+        return cls._apply(cart_id, product_id, delta, (
+            f"UPDATE {table} SET quantity = LEAST({table}.quantity + %(delta)s::numeric, p.available) "
+            f"FROM p WHERE {table}.cart_id = %(cart)s AND {table}.product_id = p.id"
+        ))
+
+    @staticmethod
+    def remove(cart_id, product_id):
+        """Retire la ligne (DELETE ... RETURNING). Retourne None si elle n'existait pas"""
+        before = CartSummary.cached(cart_id)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {CartItem._meta.db_table} WHERE cart_id = %s AND product_id = %s RETURNING id",
+                [cart_id, product_id],
+            )
+            row = cursor.fetchone()
+        version = CartSummary.invalidate(cart_id)
+        if row is None:
+            return None
+        line = CartLine(product_id, Decimal('0'), Decimal('0'), item_id=row[0])
+        CartSummary.patch(before, line, version)
+        return line
@@ -0,0 +1,28 @@
+"""
+Cohérence de Product.reserved_stock quand des réservations sont supprimées par
+l'ORM (suppression en cascade d'un panier, admin). Les libérations de
+ReservationService passent par du SQL et ajustent déjà le compteur.
+
+Invalidation du CartSummary à chaque modification d'une ligne de panier.
+"""
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.products.models import Product
+
+from .models import CartItem, StockReservation
+from .services import CartSummary
+
+
+@receiver(post_delete, sender=StockReservation)
+def release_deleted_reservation(sender, instance, **kwargs):
+    Product.objects.filter(pk=instance.product_id).update(
+        reserved_stock=Greatest(F('reserved_stock') - instance.quantity, 0)
+    )
+
+
+@receiver([post_save, post_delete], sender=CartItem)
+def invalidate_cart_summary(sender, instance, **kwargs):
+    CartSummary.invalidate(instance.cart_id)
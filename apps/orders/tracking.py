@@ -0,0 +1,277 @@
+"""
+Suivi du statut des commandes en Server-Sent Events.
+
+Chaque transition est publiée (`OrderStatusFeed`) par un script Lua, en un seul
+aller-retour : XADD dans le journal du client `orders:status:log:<client_id>`
+(borné, pour la reprise) puis PUBLISH sur le canal unique `orders:status`.
+
+Côté serveur ASGI, chaque worker n'ouvre qu'UNE connexion pub/sub, partagée par
+tous ses flux (`OrderStatusHub`) : un message est remis à la file asyncio des
+flux du client concerné. Un suivi inactif ne coûte qu'une tâche en attente sur
+sa file et un commentaire de heartbeat de temps en temps : ni requête SQL ni
+commande Redis. À la reconnexion, le navigateur renvoie Last-Event-ID (l'id du
+journal) et les transitions manquées sont rejouées par un XRANGE.
+
+Sans Redis (développement), les transitions sont remises aux flux du même
+processus et la reprise n'est pas disponible.
+"""
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from utils.redis_client import RedisError, get_async_redis, get_redis, redis_key
+
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = getattr(settings, 'ORDER_TRACKING_MAX_CONNECTIONS', 2000)
+HEARTBEAT_SECONDS = getattr(settings, 'ORDER_TRACKING_HEARTBEAT_SECONDS', 20)
+BACKLOG_LENGTH = 50
+BACKLOG_TTL = 86400
+QUEUE_SIZE = 32
+RETRY_MS = 5000
+RECONNECT_DELAY = 2
+
+EVENT_ID = re.compile(r'^\d+-\d+$')
+
+# Journal borné + notification des workers, atomiquement
+PUBLISH_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'data', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('PUBLISH', KEYS[2], ARGV[4] .. '|' .. id .. '|' .. ARGV[2])
+return id
+"""
+
+
+def _channel():
+    return redis_key('orders', 'status')
+
+
+def _backlog_key(client_id):
+    return redis_key('orders', 'status', 'log', client_id)
+
+
+def _id_key(event_id):
+    """Ordre des ids de journal Redis 'ms-seq'"""
+    ms, seq = event_id.split('-')
+    return int(ms), int(seq)
+
+
+def _format_event(event_id, data):
+    return f"id: {event_id}\nevent: order.status\ndata: {data}\n\n"
+
+
+class Subscription:
+    """File d'un flux SSE ; fermée si elle déborde ou si le pub/sub a décroché"""
+
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.closed = False
+
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Client trop lent : il se reconnectera et rejouera depuis Last-Event-ID
+            self.close()
+
+    def close(self):
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+
+class OrderStatusHub:
+    """Abonnements du worker : une connexion pub/sub pour tous les flux"""
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.connections = 0
+        self.loop = None
+        self.listener = None
+        self.redis = None
+        self.local_sequence = 0
+
+    def is_full(self):
+        return self.connections >= MAX_CONNECTIONS
+
+    def _bind(self):
+        """Rattache le hub à la boucle courante (une par worker ASGI)"""
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.redis = get_async_redis()
+            self.listener = None
+        if self.redis is not None and (self.listener is None or self.listener.done()):
+            self.listener = loop.create_task(self._listen())
+
+    def subscribe(self, client_id):
+        self._bind()
+        subscription = Subscription()
+        self.subscribers[client_id].add(subscription)
+        self.connections += 1
+        return subscription
+
+    def unsubscribe(self, client_id, subscription):
+        subscribers = self.subscribers.get(client_id)
+        if subscribers and subscription in subscribers:
+            subscribers.discard(subscription)
+            self.connections -= 1
+            if not subscribers:
+                del self.subscribers[client_id]
+
+    def dispatch(self, client_id, event_id, data):
+        for subscription in list(self.subscribers.get(client_id, ())):
+            subscription.put((event_id, data))
+
+    def _dispatch_raw(self, raw):
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        client_id, event_id, data = raw.split('|', 2)
+        self.dispatch(int(client_id), event_id, data)
+
+    async def _listen(self):
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(_channel())
+                async for message in pubsub.listen():
+                    self._dispatch_raw(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Pub/sub suivi des commandes interrompu : {e}")
+                # Messages perdus pendant la coupure : les flux reprennent via Last-Event-ID
+                for subscribers in list(self.subscribers.values()):
+                    for subscription in list(subscribers):
+                        subscription.close()
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    async def backlog(self, client_id, last_event_id):
+        """Transitions du journal postérieures à last_event_id : [(id, data)]"""
+        if self.redis is None or not EVENT_ID.match(last_event_id or ''):
+            return []
+        try:
+            entries = await self.redis.xrange(
+                _backlog_key(client_id), min=f'({last_event_id}', max='+', count=BACKLOG_LENGTH
+            )
+        except RedisError as e:
+            logger.warning(f"⚠️ Reprise du suivi {client_id} impossible : {e}")
+            return []
+        return [(event_id.decode(), fields[b'data'].decode()) for event_id, fields in entries]
+
+    def publish_local(self, client_id, data):
+        """Sans Redis : remise aux flux de ce processus (appel depuis un thread)"""
+        self.local_sequence += 1
+        event_id = f"{int(time.time() * 1000)}-{self.local_sequence}"
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.dispatch, client_id, event_id, data)
+        return event_id
+
+
+order_status_hub = OrderStatusHub()
+
+
+async def stream_order_status(client_id, last_event_id=None, order_id=None):
+    """
+    Flux SSE des transitions du client : reprise depuis last_event_id, puis
+    événements en direct et heartbeat. `order_id` limite le flux à une commande.
+    """
+    subscription = order_status_hub.subscribe(client_id)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        last_seen = None
+        for event_id, data in await order_status_hub.backlog(client_id, last_event_id):
+            last_seen = event_id
+            if order_id is None or json.loads(data)['order_id'] == order_id:
+                yield _format_event(event_id, data)
+
+        while not subscription.closed:
+            try:
+                item = await asyncio.wait_for(subscription.queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if item is None:
+                break
+            event_id, data = item
+            if last_seen and _id_key(event_id) <= _id_key(last_seen):
+                continue  # déjà rejoué depuis le journal
+            if order_id is None or json.loads(data)['order_id'] == order_id:
+                yield _format_event(event_id, data)
+    finally:
+        order_status_hub.unsubscribe(client_id, subscription)
+
+
+class OrderStatusFeed:
+    """Publication des transitions de statut vers les flux de suivi"""
+
+    @staticmethod
+    def payload(order_id, order_number, old_status, new_status):
+        try:
+            status_display = str(Order.Status(new_status).label)
+        except ValueError:
+            status_display = new_status
+        return {
+            'order_id': order_id,
+            'order_number': order_number,
+            'old_status': old_status,
+            'status': new_status,
+            'status_display': status_display,
+            'at': timezone.now(),
+        }
+
+    @classmethod
+    def publish_many(cls, events):
+        """
+        Publie [(client_id, payload)] : un appel du script par transition, dans
+        un seul pipeline. Retourne les ids de journal (None sans Redis / en erreur).
+        """
+        events = [(client_id, json.dumps(payload, cls=DjangoJSONEncoder)) for client_id, payload in events]
+        if not events:
+            return []
+
+        client = get_redis()
+        if client is None:
+            return [order_status_hub.publish_local(client_id, data) for client_id, data in events]
+
+        try:
+            script = client.register_script(PUBLISH_SCRIPT)
+            pipe = client.pipeline(transaction=False)
+            for client_id, data in events:
+                script(
+                    keys=[_backlog_key(client_id), _channel()],
+                    args=[BACKLOG_LENGTH, data, BACKLOG_TTL, client_id],
+                    client=pipe,
+                )
+            return [event_id.decode() if isinstance(event_id, bytes) else event_id for event_id in pipe.execute()]
+        except RedisError as e:
+            logger.warning(f"⚠️ {len(events)} transition(s) de commande non publiée(s) : {e}")
+            return [None] * len(events)
+
+    @classmethod
+    def transitions(cls, rows, new_status):
+        """Transitions en masse : rows = [(order_id, client_id, order_number, ancien statut)]"""
+        events = [
+            (client_id, cls.payload(order_id, order_number, old_status, new_status))
+            for order_id, client_id, order_number, old_status in rows
+            if old_status != new_status
+        ]
+        if events:
+            transaction.on_commit(lambda: cls.publish_many(events), robust=True)
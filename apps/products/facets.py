@@ -0,0 +1,152 @@
+"""
+Facettes du catalogue (catégorie, unité, tranche de prix, producteur bio, en stock).
+
+Toutes les facettes sont calculées en UNE requête : le périmètre de recherche est
+groupé par la combinaison (catégorie, unité, tranche, bio, en stock), ce qui donne
+au plus quelques centaines de lignes. Les comptes de chaque facette sont ensuite
+dérivés en Python, en appliquant les autres facettes sélectionnées (comptes
+"disjonctifs" : cocher "kg" ne fait pas tomber les autres unités à zéro).
+
+Les lignes groupées ne dépendent que de la recherche texte : elles sont mises en
+cache sous une signature normalisée de ce périmètre (et la version du catalogue),
+et servent pour toutes les combinaisons de filtres cochés.
+"""
+import hashlib
+import json
+import re
+
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, CharField, Count, ExpressionWrapper, Q, Value, When
+
+from utils.cache_versions import get_versions
+
+from .models import Category, Product
+from .search import PRICE_BUCKETS
+
+FACETS_CACHE_TIMEOUT = 300
+CATEGORIES_CACHE_KEY = 'products:active_categories'
+CATEGORIES_CACHE_TIMEOUT = 600
+
+
+def get_active_categories():
+    """Catégories actives (mises en cache, partagées par les filtres et les facettes)"""
+    categories = cache.get(CATEGORIES_CACHE_KEY)
+    if categories is None:
+        categories = list(Category.objects.filter(is_active=True))
+        cache.set(CATEGORIES_CACHE_KEY, categories, CATEGORIES_CACHE_TIMEOUT)
+    return categories
+
+
+def _price_bucket_expression():
+    whens = []
+    for key, _, low, high in PRICE_BUCKETS:
+        condition = Q()
+        if low is not None:
+            condition &= Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        whens.append(When(condition, then=Value(key)))
+    return Case(*whens, output_field=CharField())
+
+
+def normalize_search(text):
+    """Texte de recherche normalisé (casse, espaces) pour la clé de cache"""
+    return re.sub(r'\s+', ' ', (text or '').strip().lower())
+
+
+def facet_signature(search):
+    payload = json.dumps({'q': normalize_search(search.search)}, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _grouped_rows(search):
+    """Une seule requête GROUP BY sur le périmètre de recherche (mise en cache)"""
+    # Version du catalogue dans la clé : toute sauvegarde produit/producteur l'invalide
+    versions = '.'.join(str(v) for v in get_versions('product', 'producer'))
+    cache_key = f"products:facets:{versions}:{facet_signature(search)}"
+    rows = cache.get(cache_key)
+    if rows is not None:
+        return rows
+
+    queryset = search.search_filter(search.base_queryset(), rank=False)
+    rows = [
+        (row['category_id'], row['unit'], row['price_bucket'], row['organic'], row['in_stock'], row['n'])
+        for row in queryset.annotate(
+            price_bucket=_price_bucket_expression(),
+            organic=ExpressionWrapper(Q(producer__is_organic=True), output_field=BooleanField()),
+            in_stock=ExpressionWrapper(Q(stock__gt=0), output_field=BooleanField()),
+        ).values(
+            'category_id', 'unit', 'price_bucket', 'organic', 'in_stock'
+        ).annotate(n=Count('id')).order_by()
+    ]
+    cache.set(cache_key, rows, FACETS_CACHE_TIMEOUT)
+    return rows
+
+
+def _matches(row, search, exclude):
+    category_id, unit, price_bucket, organic, in_stock, _ = row
+    if exclude != 'category' and search.categories and str(category_id) not in search.categories:
+        return False
+    if exclude != 'unit' and search.units and unit not in search.units:
+        return False
+    if exclude != 'price' and search.prices and price_bucket not in search.prices:
+        return False
+    if exclude != 'organic' and search.organic and not organic:
+        return False
+    if exclude != 'in_stock' and search.in_stock and not in_stock:
+        return False
+    return True
+
+
+def _counts(rows, search, facet, index):
+    counts = {}
+    for row in rows:
+        if _matches(row, search, facet):
+            counts[row[index]] = counts.get(row[index], 0) + row[5]
+    return counts
+
+
+def compute_facets(search):
+    """
+    Facettes pour une `ProductSearch`. Retourne un dict prêt pour le template /
+    l'API : chaque entrée liste les valeurs avec leur compte et leur état.
+    """
+    rows = _grouped_rows(search)
+
+    category_counts = _counts(rows, search, 'category', 0)
+    unit_counts = _counts(rows, search, 'unit', 1)
+    price_counts = _counts(rows, search, 'price', 2)
+    organic_counts = _counts(rows, search, 'organic', 3)
+    stock_counts = _counts(rows, search, 'in_stock', 4)
+
+    return {
+        'category': [
+            {
+                'value': str(category.id),
+                'label': category.name,
+                'count': category_counts.get(category.id, 0),
+                'selected': str(category.id) in search.categories,
+            }
+            for category in get_active_categories()
+        ],
+        'unit': [
+            {
+                'value': code,
+                'label': label,
+                'count': unit_counts.get(code, 0),
+                'selected': code in search.units,
+            }
+            for code, label in Product.UNIT_CHOICES
+        ],
+        'price': [
+            {
+                'value': key,
+                'label': label,
+                'count': price_counts.get(key, 0),
+                'selected': key in search.prices,
+            }
+            for key, label, _, _ in PRICE_BUCKETS
+        ],
+        'organic': {'count': organic_counts.get(True, 0), 'selected': search.organic},
+        'in_stock': {'count': stock_counts.get(True, 0), 'selected': search.in_stock},
+    }
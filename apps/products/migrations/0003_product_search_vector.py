@@ -0,0 +1,95 @@
+# Generated by Django 6.0 on 2026-01-05 10:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Vecteur pondéré : A=nom, B=catégorie, C=description, D=producteur.
+# La catégorie et le producteur vivent dans d'autres tables : un champ généré
+# ne peut pas les lire, d'où le trigger.
+CREATE_TRIGGERS_SQL = """
+CREATE OR REPLACE FUNCTION products_product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('french', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('french', coalesce(
+            (SELECT c.name FROM products_category c WHERE c.id = NEW.category_id), '')), 'B') ||
+        setweight(to_tsvector('french', coalesce(NEW.description, '')), 'C') ||
+        setweight(to_tsvector('french', coalesce(
+            (SELECT u.username
+               FROM utilisateur_producerprofile p
+               JOIN utilisateur_utilisateur u ON u.id = p.user_id
+              WHERE p.id = NEW.producer_id), '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description, category_id, producer_id
+    ON products_product
+    FOR EACH ROW EXECUTE FUNCTION products_product_search_vector_update();
+
+-- Renommage d'une catégorie : recalcul des produits concernés
+CREATE OR REPLACE FUNCTION products_category_search_vector_refresh() RETURNS trigger AS $$
+BEGIN
+    IF NEW.name IS DISTINCT FROM OLD.name THEN
+        UPDATE products_product SET name = name WHERE category_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_category_search_vector_trigger
+    AFTER UPDATE OF name ON products_category
+    FOR EACH ROW EXECUTE FUNCTION products_category_search_vector_refresh();
+
+-- Changement de nom d'utilisateur d'un producteur
+CREATE OR REPLACE FUNCTION products_producer_search_vector_refresh() RETURNS trigger AS $$
+BEGIN
+    IF NEW.username IS DISTINCT FROM OLD.username THEN
+        UPDATE products_product SET name = name
+         WHERE producer_id IN (
+            SELECT id FROM utilisateur_producerprofile WHERE user_id = NEW.id
+         );
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_producer_search_vector_trigger
+    AFTER UPDATE OF username ON utilisateur_utilisateur
+    FOR EACH ROW EXECUTE FUNCTION products_producer_search_vector_refresh();
+
+-- Remplissage initial
+UPDATE products_product SET name = name;
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS products_producer_search_vector_trigger ON utilisateur_utilisateur;
+DROP FUNCTION IF EXISTS products_producer_search_vector_refresh();
+DROP TRIGGER IF EXISTS products_category_search_vector_trigger ON products_category;
+DROP FUNCTION IF EXISTS products_category_search_vector_refresh();
+DROP TRIGGER IF EXISTS products_product_search_vector_trigger ON products_product;
+DROP FUNCTION IF EXISTS products_product_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_is_deleted'),
+        ('utilisateur', '0005_producerprofile_image_utilisateur_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='products_pr_search_gin_idx'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-01-09 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='daily_views',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
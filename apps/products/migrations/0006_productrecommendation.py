@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-01-12 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_daily_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('copurchase', 'Achetés ensemble'), ('content', 'Produits similaires')], max_length=20)),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='products.product')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+            ],
+            options={
+                'ordering': ['product', 'source', 'rank'],
+                'indexes': [models.Index(fields=['product', 'source', 'rank'], name='products_re_lookup_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'source', 'recommended'), name='unique_product_recommendation')],
+            },
+        ),
+    ]
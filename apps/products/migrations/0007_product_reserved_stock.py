@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-01-13 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_productrecommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='reserved_stock',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.translation import gettext_lazy as _
 from apps.utilisateur.models import  ProducerProfile 
 from django.contrib import admin
@@ -41,6 +43,8 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     unit = models.CharField(max_length=20, choices=UNIT_CHOICES)
     stock = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Quantité retenue par les paniers en cours de paiement (cf. apps/orders/reservations.py)
+    reserved_stock = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     image = models.ImageField(upload_to='products/%Y/%m/', blank=True)
     is_active = models.BooleanField(default=True)
     is_deleted = models.BooleanField(default=False)
@@ -49,6 +53,10 @@ class Product(models.Model):
     
     # Stats
     view_count = models.PositiveIntegerField(default=0)
+    daily_views = models.PositiveIntegerField(default=0)  # Remis à zéro chaque nuit
+
+    # Recherche plein texte (alimenté par trigger PostgreSQL, cf. migration 0003)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         app_label = 'products'  # Fix pour matcher INSTALLED_APPS
@@ -56,6 +64,12 @@ class Product(models.Model):
         indexes = [
             models.Index(fields=['category', 'is_active']),
             models.Index(fields=['price']),
+            GinIndex(fields=['search_vector'], name='products_pr_search_gin_idx'),
+            # Pagination keyset : (colonne de tri, id) pour chaque tri exposé
+            models.Index(fields=['price', 'id'], name='products_pr_price_id_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['name', 'id'], name='products_pr_name_id_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['created_at', 'id'], name='products_pr_created_id_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['view_count', 'id'], name='products_pr_views_id_idx', condition=models.Q(is_active=True)),
         ]
 
     @property
@@ -71,6 +85,11 @@ class Product(models.Model):
     def is_in_stock(self):
         return self.stock > 0
 
+    @property
+    def available_stock(self):
+        """Stock vendable : stock moins les réservations actives des paniers"""
+        return max(self.stock - self.reserved_stock, 0)
+
     @property
     def stock_status(self):
         if self.stock == 0:
@@ -80,6 +99,33 @@ class Product(models.Model):
         return 'in_stock'
 
 
+
+class ProductRecommendation(models.Model):
+    """Voisins précalculés d'un produit (tâches de recommandation)"""
+    class Source(models.TextChoices):
+        COPURCHASE = 'copurchase', _('Achetés ensemble')
+        CONTENT = 'content', _('Produits similaires')
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    source = models.CharField(max_length=20, choices=Source.choices)
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'products'
+        ordering = ['product', 'source', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'source', 'recommended'], name='unique_product_recommendation'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'source', 'rank'], name='products_re_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.recommended_id} ({self.source}, {self.score:.3f})"
+
 # class ProducerProfile(models.Model):
 #     """Profil producteur"""
 #     user = models.OneToOneField(Utilisateur, on_delete=models.CASCADE, related_name='producer_profile')
@@ -0,0 +1,406 @@
+"""
+Recommandations produits précalculées.
+
+Co-achat : on construit la matrice creuse commandes x produits (B, binaire) par
+blocs de commandes lus en flux, et on accumule C = Bᵀ·B, la matrice de
+co-occurrence produit x produit. C est ensuite normalisée (cosinus ou lift) et
+les K meilleurs voisins de chaque produit sont écrits dans ProductRecommendation.
+Servir une recommandation revient alors à lire une liste d'ids (cache, puis index).
+
+Produits similaires : les produits neufs n'ont pas d'historique d'achat. On
+vectorise nom + description + catégorie en TF-IDF (lignes normalisées L2, donc
+produit scalaire = cosinus) et on garde les K plus proches voisins, source CONTENT.
+Un ajout / une modification de produit ne recalcule que sa ligne de similarité
+et met à jour les listes des produits qui le voient parmi leurs voisins. Ces
+mises à jour sont regroupées : les produits modifiés sont notés dans Redis et
+une tâche par fenêtre de SIMILAR_REFRESH_DELAY secondes les traite tous avec une
+seule construction de la matrice TF-IDF.
+
+NumPy / SciPy ne sont importés que dans les fonctions de calcul (tâches Celery),
+pas au chargement des vues.
+"""
+import logging
+import math
+import re
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from utils.cache_versions import bump_version, get_version
+from utils.redis_client import RedisError, get_redis, redis_key
+
+from .models import Product, ProductRecommendation
+
+logger = logging.getLogger(__name__)
+
+PAID_STATUSES = ['CONFIRMED', 'PREPARING', 'SHIPPED', 'DELIVERED']
+RECOMMENDATIONS_CACHE_TIMEOUT = 60 * 60 * 24
+MIN_CONTENT_SIMILARITY = 0.05
+SCORE_DECIMALS = 6
+
+# Produits similaires : recalcul incrémental regroupé par fenêtre
+SIMILAR_REFRESH_DELAY = getattr(settings, 'SIMILAR_PRODUCTS_REFRESH_DELAY', 60)
+PENDING_REFRESH_KEY = 'similar:pending'
+REFRESH_SCHEDULED_KEY = 'similar:refresh:scheduled'
+
+STOP_WORDS = frozenset("""
+    au aux avec ce ces dans de des du elle en et eux il je la le les leur lui ma
+    mais me meme mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se
+    ses son sur ta te tes toi ton tu un une vos votre vous est sont tres plus bien
+    frais fraiche fraiches produit produits
+""".split())
+
+
+def _basket_matrix(order_ids, product_cols, n_products):
+    """Matrice binaire (commandes du bloc) x (tous les produits)"""
+    import numpy as np
+    from scipy import sparse
+
+    _, rows = np.unique(np.asarray(order_ids), return_inverse=True)
+    basket = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float64), (rows, np.asarray(product_cols))),
+        shape=(rows.max() + 1, n_products),
+    )
+    basket.data[:] = 1.0  # une ligne de commande en double ne compte qu'une fois
+    return basket
+
+
+def copurchase_matrix(chunk_size=5000, statuses=PAID_STATUSES):
+    """
+    Co-occurrences produit x produit sur les commandes payées.
+    Retourne (ids produits triés, matrice C au format CSR, nombre de commandes).
+    Les lignes de commande sont lues en flux, triées par commande, et un bloc ne
+    coupe jamais une commande en deux.
+    """
+    import numpy as np
+    from scipy import sparse
+    from apps.orders.models import OrderItem
+
+    product_ids = np.fromiter(
+        Product.objects.order_by('id').values_list('id', flat=True).iterator(),
+        dtype=np.int64,
+    )
+    n_products = len(product_ids)
+    cooc = sparse.csr_matrix((n_products, n_products), dtype=np.float64)
+    n_orders = 0
+
+    lines = (
+        OrderItem.objects.filter(order__status__in=statuses)
+        .order_by('order_id')
+        .values_list('order_id', 'product_id')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    order_buf, product_buf = [], []
+
+    def flush(orders, products):
+        nonlocal cooc, n_orders
+        if not orders:
+            return
+        cols = np.searchsorted(product_ids, np.asarray(products, dtype=np.int64))
+        basket = _basket_matrix(orders, cols, n_products)
+        cooc = cooc + (basket.T @ basket).tocsr()
+        n_orders += basket.shape[0]
+
+    for order_id, product_id in lines:
+        if len(order_buf) >= chunk_size and order_id != order_buf[-1]:
+            flush(order_buf, product_buf)
+            order_buf, product_buf = [], []
+        order_buf.append(order_id)
+        product_buf.append(product_id)
+    flush(order_buf, product_buf)
+
+    return product_ids, cooc, n_orders
+
+
+def normalize_cooccurrence(cooc, n_orders, measure='cosine', min_support=2):
+    """
+    cosinus : C_ij / sqrt(c_i · c_j)
+    lift    : C_ij · N / (c_i · c_j)
+    où c_i = nombre de commandes contenant i (diagonale de C).
+    Les paires vues moins de `min_support` fois sont ignorées (bruit).
+    """
+    import numpy as np
+    from scipy import sparse
+
+    counts = cooc.diagonal().astype(np.float64)
+    pairs = cooc.tolil()
+    pairs.setdiag(0)
+    pairs = pairs.tocsr()
+    pairs.data[pairs.data < min_support] = 0
+    pairs.eliminate_zeros()
+
+    with np.errstate(divide='ignore'):
+        if measure == 'lift':
+            inv = np.where(counts > 0, 1.0 / counts, 0.0)
+            scaled = sparse.diags(inv) @ pairs @ sparse.diags(inv)
+            return (scaled * float(max(n_orders, 1))).tocsr()
+        inv_sqrt = np.where(counts > 0, 1.0 / np.sqrt(counts), 0.0)
+        return (sparse.diags(inv_sqrt) @ pairs @ sparse.diags(inv_sqrt)).tocsr()
+
+
+def top_k_neighbours(product_ids, scores, top_k=10, row_ids=None):
+    """
+    Itère sur (product_id, [(voisin_id, score), ...]) triés par score décroissant,
+    à égalité par id de voisin (même résultat en calcul complet ou incrémental).
+    `row_ids` étiquette les lignes quand `scores` n'en couvre qu'une partie.
+    """
+    import numpy as np
+
+    row_ids = product_ids if row_ids is None else row_ids
+    indptr, indices, data = scores.indptr, scores.indices, scores.data
+    for row in range(scores.shape[0]):
+        start, end = indptr[row], indptr[row + 1]
+        if start == end:
+            continue
+        row_scores = np.round(data[start:end], SCORE_DECIMALS)
+        neighbour_ids = product_ids[indices[start:end]]
+        best = np.lexsort((neighbour_ids, -row_scores))[:top_k]
+        yield int(row_ids[row]), [
+            (int(neighbour_ids[i]), float(row_scores[i])) for i in best
+        ]
+
+
+def _ranked(items, top_k):
+    """Même ordre que top_k_neighbours pour des paires (voisin_id, score)"""
+    return sorted(items, key=lambda item: (-item[1], item[0]))[:top_k]
+
+
+def store_neighbours(source, neighbours, batch_size=2000):
+    """Remplace toutes les recommandations d'une source (transaction unique)"""
+    stored = 0
+    with transaction.atomic():
+        ProductRecommendation.objects.filter(source=source).delete()
+        batch = []
+        for product_id, items in neighbours:
+            for rank, (recommended_id, score) in enumerate(items, start=1):
+                batch.append(ProductRecommendation(
+                    product_id=product_id,
+                    recommended_id=recommended_id,
+                    source=source,
+                    score=score,
+                    rank=rank,
+                ))
+            if len(batch) >= batch_size:
+                ProductRecommendation.objects.bulk_create(batch)
+                stored += len(batch)
+                batch = []
+        if batch:
+            ProductRecommendation.objects.bulk_create(batch)
+            stored += len(batch)
+    transaction.on_commit(lambda: bump_version(f'recommendations:{source}'))
+    return stored
+
+
+def tokenize(text):
+    """Minuscules sans accents, mots vides retirés, pluriel simple ramené au singulier"""
+    text = unicodedata.normalize('NFKD', (text or '').lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    tokens = []
+    for word in re.findall(r'[a-z0-9]{2,}', text):
+        if len(word) > 3 and word[-1] in 'sx':
+            word = word[:-1]
+        if word not in STOP_WORDS:
+            tokens.append(word)
+    return tokens
+
+
+def product_tokens(name, description, category_id, category_name):
+    """Le nom compte double ; la catégorie ajoute un jeton dédié"""
+    tokens = tokenize(name) * 2 + tokenize(description) + tokenize(category_name)
+    if category_id:
+        tokens.append(f'cat_{category_id}')
+    return tokens
+
+
+def tfidf_matrix():
+    """
+    Matrice TF-IDF (produits actifs x vocabulaire), lignes normalisées L2.
+    tf sous-linéaire (1 + log tf), idf lissé log((1 + N) / (1 + df)) + 1.
+    Retourne (ids produits triés, matrice CSR).
+    """
+    import numpy as np
+    from scipy import sparse
+
+    rows = Product.objects.filter(is_active=True).order_by('id').values_list(
+        'id', 'name', 'description', 'category_id', 'category__name'
+    )
+    vocabulary = {}
+    product_ids, indptr, indices, data = [], [0], [], []
+    for product_id, name, description, category_id, category_name in rows.iterator():
+        counts = {}
+        for token in product_tokens(name, description, category_id, category_name):
+            column = vocabulary.setdefault(token, len(vocabulary))
+            counts[column] = counts.get(column, 0) + 1
+        product_ids.append(product_id)
+        indices.extend(counts.keys())
+        data.extend(1.0 + math.log(n) for n in counts.values())
+        indptr.append(len(indices))
+
+    n_products = len(product_ids)
+    matrix = sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float64), np.asarray(indices, dtype=np.int64), np.asarray(indptr)),
+        shape=(n_products, len(vocabulary)),
+    )
+    if n_products == 0 or not vocabulary:
+        return np.asarray(product_ids, dtype=np.int64), matrix
+
+    df = np.bincount(matrix.indices, minlength=len(vocabulary))
+    idf = np.log((1.0 + n_products) / (1.0 + df)) + 1.0
+    matrix = (matrix @ sparse.diags(idf)).tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    matrix = (sparse.diags(np.where(norms > 0, 1.0 / np.where(norms > 0, norms, 1.0), 0.0)) @ matrix).tocsr()
+    return np.asarray(product_ids, dtype=np.int64), matrix
+
+
+def _similarity_rows(matrix, rows, min_score=MIN_CONTENT_SIMILARITY):
+    """Cosinus des lignes `rows` contre tous les produits, sans le produit lui-même"""
+    block = (matrix[rows] @ matrix.T).tolil()
+    for i, row in enumerate(rows):
+        block[i, row] = 0
+    block = block.tocsr()
+    block.data[block.data < min_score] = 0
+    block.eliminate_zeros()
+    return block
+
+
+def content_neighbours(product_ids, matrix, top_k=10, chunk_size=1000):
+    """Voisins TF-IDF de tous les produits, calculés par blocs de lignes (mémoire bornée)"""
+    import numpy as np
+
+    for start in range(0, len(product_ids), chunk_size):
+        rows = np.arange(start, min(start + chunk_size, len(product_ids)))
+        yield from top_k_neighbours(
+            product_ids, _similarity_rows(matrix, rows), top_k=top_k, row_ids=product_ids[rows]
+        )
+
+
+def queue_content_refresh(product_id):
+    """
+    Note le produit pour le prochain recalcul groupé. Retourne False sans Redis :
+    l'appelant recalcule alors directement.
+    """
+    client = get_redis()
+    if client is None:
+        return False
+    try:
+        client.sadd(redis_key(PENDING_REFRESH_KEY), product_id)
+    except RedisError as e:
+        logger.warning(f"⚠️ Recalcul des similaires du produit {product_id} non mis en file : {e}")
+        return False
+    return True
+
+
+def pop_content_refresh():
+    """Ids des produits en attente de recalcul (retirés de la file)"""
+    client = get_redis()
+    if client is None:
+        return []
+    key = redis_key(PENDING_REFRESH_KEY)
+    pipe = client.pipeline(transaction=True)
+    pipe.smembers(key)
+    pipe.delete(key)
+    return sorted(int(product_id) for product_id in pipe.execute()[0])
+
+
+def refresh_content_neighbours(product_id, top_k=10, tfidf=None):
+    """
+    Mise à jour incrémentale après ajout / modification d'un produit : sa propre
+    liste est recalculée, et il est inséré dans (ou retiré de) la liste des
+    produits dont il devient (ou cesse d'être) l'un des K plus proches voisins.
+    Une liste pleine dont il sort est recalculée pour la compléter ; la liste
+    d'un produit désactivé depuis le dernier recalcul complet est supprimée.
+    L'idf des autres produits n'est pas réécrit : le recalcul nocturne s'en charge.
+    `tfidf` : (ids, matrice) de tfidf_matrix(), partagé entre plusieurs produits.
+    Retourne le nombre de produits dont la liste a changé.
+    """
+    import numpy as np
+
+    source = ProductRecommendation.Source.CONTENT
+    product_ids, matrix = tfidf if tfidf is not None else tfidf_matrix()
+    active = set(product_ids.tolist())
+    row = int(np.searchsorted(product_ids, product_id))
+    present = row < len(product_ids) and product_ids[row] == product_id
+
+    lists, scores = {product_id: []}, {}
+    if present:
+        for _, items in top_k_neighbours(product_ids, _similarity_rows(matrix, [row]), top_k=len(product_ids)):
+            scores = dict(items)
+        lists[product_id] = _ranked(scores.items(), top_k)
+
+    # Listes actuelles des produits proches et de ceux qui le citent déjà
+    existing = {}
+    for rec in ProductRecommendation.objects.filter(source=source).filter(
+        Q(product_id__in=list(scores)) | Q(recommended_id=product_id)
+    ).exclude(product_id=product_id).order_by('product_id', 'rank'):
+        existing.setdefault(rec.product_id, []).append((rec.recommended_id, rec.score))
+
+    to_recompute = []
+    for other_id in set(existing) | set(scores):
+        if other_id not in active:
+            lists[other_id] = []  # propriétaire désactivé : liste périmée supprimée
+            continue
+        current = existing.get(other_id, [])
+        neighbours = [(pid, score) for pid, score in current if pid != product_id]
+        if other_id in scores:  # cosinus symétrique
+            neighbours.append((product_id, scores[other_id]))
+        ranked = _ranked(neighbours, top_k)
+        if ranked == current:
+            continue
+        if len(current) >= top_k and len(ranked) < top_k:
+            to_recompute.append(other_id)
+        else:
+            lists[other_id] = ranked
+
+    if to_recompute:
+        rows = np.searchsorted(product_ids, to_recompute)
+        lists.update(top_k_neighbours(
+            product_ids, _similarity_rows(matrix, rows), top_k=top_k, row_ids=product_ids[rows]
+        ))
+        for other_id in to_recompute:
+            lists.setdefault(other_id, [])
+
+    with transaction.atomic():
+        ProductRecommendation.objects.filter(source=source, product_id__in=list(lists)).delete()
+        ProductRecommendation.objects.bulk_create([
+            ProductRecommendation(
+                product_id=owner_id,
+                recommended_id=recommended_id,
+                source=source,
+                score=score,
+                rank=rank,
+            )
+            for owner_id, items in lists.items()
+            for rank, (recommended_id, score) in enumerate(items, start=1)
+        ])
+    transaction.on_commit(lambda: bump_version(f'recommendations:{source}'))
+    return len(lists)
+
+
+def recommended_ids(product_id, source, limit=10):
+    """Liste d'ids précalculée pour un produit (cache, puis index (product, source, rank))"""
+    version = get_version(f'recommendations:{source}')
+    cache_key = f"product_recs:{source}:{version}:{product_id}"
+    ids = cache.get(cache_key)
+    if ids is None:
+        ids = list(
+            ProductRecommendation.objects.filter(product_id=product_id, source=source)
+            .order_by('rank')
+            .values_list('recommended_id', flat=True)[:50]
+        )
+        cache.set(cache_key, ids, RECOMMENDATIONS_CACHE_TIMEOUT)
+    return ids[:limit]
+
+
+def recommended_products(product_id, source, limit=10):
+    """Produits recommandés encore disponibles, dans l'ordre des scores"""
+    ids = recommended_ids(product_id, source, limit=limit * 2)
+    if not ids:
+        return []
+    products = Product.objects.filter(is_active=True, stock__gt=0).select_related(
+        'producer__user', 'category'
+    ).in_bulk(ids)
+    return [products[pk] for pk in ids if pk in products][:limit]
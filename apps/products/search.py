@@ -0,0 +1,173 @@
+"""
+Recherche plein texte du catalogue produits.
+
+Le vecteur `Product.search_vector` est maintenu par des triggers PostgreSQL
+(voir migration 0003) avec la configuration `french` et les poids suivants :
+
+    A = nom du produit
+    B = nom de la catégorie
+    C = description
+    D = nom du producteur
+
+La vue HTML (ProductListView) et l'API (ProductViewSet) passent toutes les deux
+par `ProductSearch` : même filtrage, même classement par pertinence.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+
+from .models import Product
+
+SEARCH_CONFIG = 'french'
+
+# Tranches de prix (GNF) : clé, libellé, borne basse incluse, borne haute exclue
+PRICE_BUCKETS = [
+    ('lt5000', 'Moins de 5 000', None, 5000),
+    ('5000-20000', '5 000 – 20 000', 5000, 20000),
+    ('20000-100000', '20 000 – 100 000', 20000, 100000),
+    ('gte100000', '100 000 et plus', 100000, None),
+]
+PRICE_BUCKET_KEYS = [key for key, _, _, _ in PRICE_BUCKETS]
+
+TRUE_VALUES = ('1', 'true', 'on', 'yes')
+
+
+def _as_list(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value if v not in (None, '')]
+    return [str(value)]
+
+
+def price_bucket_q(keys):
+    """Q correspondant à l'union des tranches de prix sélectionnées"""
+    condition = Q()
+    for key, _, low, high in PRICE_BUCKETS:
+        if key not in keys:
+            continue
+        bucket = Q()
+        if low is not None:
+            bucket &= Q(price__gte=low)
+        if high is not None:
+            bucket &= Q(price__lt=high)
+        condition |= bucket
+    return condition
+
+
+class ProductSearch:
+    """Requête catalogue partagée (recherche + filtres à facettes + tri)"""
+
+    # Tris exposés aux clients -> champs ORM
+    VALID_SORTS = {
+        'name': 'name',
+        '-name': '-name',
+        'price': 'price',
+        '-price': '-price',
+        'newest': '-created_at',
+        'popularity': '-view_count',
+        'relevance': '-rank',
+    }
+    DEFAULT_SORT = 'newest'
+    VALID_UNITS = [code for code, _ in Product.UNIT_CHOICES]
+
+    def __init__(self, search='', category=None, sort=None, in_stock=False,
+                 units=None, prices=None, organic=False):
+        self.search = (search or '').strip()
+        self.categories = sorted({c for c in _as_list(category) if c.isdigit()}, key=int)
+        self.units = sorted({u for u in _as_list(units) if u in self.VALID_UNITS})
+        self.prices = [k for k in PRICE_BUCKET_KEYS if k in _as_list(prices)]
+        self.organic = bool(organic)
+        self.in_stock = bool(in_stock)
+        self.sort = self._resolve_sort(sort)
+
+    @classmethod
+    def from_params(cls, params, in_stock=False):
+        """
+        Construit la requête depuis request.GET / request.query_params.
+        `in_stock` est la valeur par défaut quand ?in_stock n'est pas fourni.
+        """
+        getlist = getattr(params, 'getlist', None) or (lambda key: _as_list(params.get(key)))
+        if 'in_stock' in params:
+            in_stock = params.get('in_stock', '').lower() in TRUE_VALUES
+        return cls(
+            search=params.get('search', ''),
+            category=getlist('category'),
+            sort=params.get('sort'),
+            in_stock=in_stock,
+            units=getlist('unit'),
+            prices=getlist('price'),
+            organic=params.get('organic', '').lower() in TRUE_VALUES,
+        )
+
+    @property
+    def category(self):
+        """Catégorie unique sélectionnée (compatibilité avec le select HTML)"""
+        return self.categories[0] if len(self.categories) == 1 else None
+
+    def _resolve_sort(self, sort):
+        if sort == 'relevance' and not self.search:
+            return self.DEFAULT_SORT
+        if sort in self.VALID_SORTS:
+            return sort
+        # Avec une recherche, la pertinence est le tri naturel
+        return 'relevance' if self.search else self.DEFAULT_SORT
+
+    @property
+    def ordering(self):
+        """Ordre ORM complet, avec l'id comme départage stable"""
+        field = self.VALID_SORTS[self.sort]
+        tiebreak = '-id' if field.startswith('-') else 'id'
+        if self.sort == 'relevance':
+            return [field, '-created_at', '-id']
+        return [field, tiebreak]
+
+    def base_queryset(self):
+        return Product.objects.filter(is_active=True)
+
+    def search_filter(self, queryset, rank=True):
+        """Recherche plein texte seule (périmètre des facettes)"""
+        if self.search:
+            queryset = search_queryset(queryset, self.search, rank=rank)
+        return queryset
+
+    def facet_filters(self, exclude=None):
+        """Filtres de facettes sélectionnés, sous forme de Q (hors `exclude`)"""
+        condition = Q()
+        if self.categories and exclude != 'category':
+            condition &= Q(category_id__in=self.categories)
+        if self.units and exclude != 'unit':
+            condition &= Q(unit__in=self.units)
+        if self.prices and exclude != 'price':
+            condition &= price_bucket_q(self.prices)
+        if self.organic and exclude != 'organic':
+            condition &= Q(producer__is_organic=True)
+        if self.in_stock and exclude != 'in_stock':
+            condition &= Q(stock__gt=0)
+        return condition
+
+    def filter(self, queryset):
+        """Applique recherche et filtres (sans tri)"""
+        return self.search_filter(queryset).filter(self.facet_filters())
+
+    def queryset(self, queryset=None):
+        """Queryset filtré et trié, prêt à être paginé"""
+        if queryset is None:
+            queryset = self.base_queryset()
+        return self.filter(queryset).order_by(*self.ordering)
+
+
+def search_queryset(queryset, query, rank=True):
+    """
+    Filtre un queryset Product sur le vecteur plein texte et annote `rank`.
+    La syntaxe "websearch" accepte les guillemets, OR et le préfixe "-".
+    """
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    queryset = queryset.filter(search_vector=search_query)
+    if rank:
+        # ts_rank renvoie un real : casté en double pour que la valeur relue dans
+        # un curseur de pagination se compare exactement à celle de la base
+        queryset = queryset.annotate(
+            rank=Cast(SearchRank(F('search_vector'), search_query), FloatField())
+        )
+    return queryset
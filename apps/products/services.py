@@ -1,6 +1,8 @@
 from django.db.models import Q, Count, Avg
 from django.db import transaction
-from .models import Product, Category
+from .models import Product, Category, ProductRecommendation
+from .recommendations import recommended_products
+from .search import ProductSearch
 from services.notification_service import NotificationService
 
 class ProductService:
@@ -8,18 +10,9 @@ class ProductService:
     
     @staticmethod
     def search_products(query, category=None, producer=None, min_price=None, max_price=None):
-        """Recherche avancée de produits"""
-        products = Product.objects.filter(is_active=True)
-        
-        if query:
-            products = products.filter(
-                Q(name__icontains=query) | 
-                Q(description__icontains=query) |
-                Q(producer__farm_name__icontains=query)
-            )
-        
-        if category:
-            products = products.filter(category_id=category)
+        """Recherche avancée de produits (plein texte, classée par pertinence)"""
+        search = ProductSearch(search=query, category=category)
+        products = search.filter(Product.objects.filter(is_active=True))
         
         if producer:
             products = products.filter(producer_id=producer)
@@ -30,17 +23,32 @@ class ProductService:
         if max_price:
             products = products.filter(price__lte=max_price)
         
-        return products.distinct()
+        return products.order_by(*search.ordering)
     
     @staticmethod
     def get_recommendations(product_id, limit=5):
-        """Produit des recommandations basées sur la catégorie"""
-        product = Product.objects.get(id=product_id)
-        recommendations = Product.objects.filter(
-            category=product.category,
+        """
+        Produits souvent achetés avec ce produit (voisins de co-achat précalculés
+        par tasks.product_tasks.update_product_recommendations). Repli sur la
+        même catégorie tant que le produit n'a pas d'historique d'achat.
+        """
+        recommendations = recommended_products(product_id, ProductRecommendation.Source.COPURCHASE, limit)
+        if recommendations:
+            return recommendations
+
+        product = Product.objects.only('category_id').get(id=product_id)
+        return list(Product.objects.filter(
+            category_id=product.category_id,
             is_active=True
-        ).exclude(id=product_id)[:limit]
-        return recommendations
+        ).exclude(id=product_id)[:limit])
+
+    @staticmethod
+    def get_similar_products(product_id, limit=6):
+        """
+        Produits au contenu proche (nom, description, catégorie), précalculés par
+        TF-IDF : utile aussi pour les produits neufs, sans historique d'achat.
+        """
+        return recommended_products(product_id, ProductRecommendation.Source.CONTENT, limit)
     
     @staticmethod
     @transaction.atomic
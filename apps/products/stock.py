@@ -0,0 +1,169 @@
+"""
+Moteur de décrément de stock atomique.
+
+Toutes les lignes d'une commande sont appliquées en UN aller-retour par un UPDATE
+conditionnel (stock = stock - q WHERE stock - réservé >= q) : pas de lecture / calcul en
+Python / save() (mises à jour perdues) ni de SELECT ... FOR UPDATE ligne par
+ligne (commandes sérialisées sur les verrous). Si une ligne manque de stock, rien
+n'est appliqué (savepoint annulé) et l'exception détaille les manques par produit.
+
+Les passages sous le seuil d'alerte sont signalés en un seul envoi, après commit,
+et les nouveaux niveaux poussés aux dashboards producteurs ouverts (WebSocket).
+"""
+import logging
+from decimal import Decimal
+
+from django.db import connections, router, transaction
+from django.db.models import Case, DecimalField, F, Value, When
+
+from services.realtime_service import RealtimeService
+from utils.cache_versions import bump_version
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+LOW_STOCK_THRESHOLD = 10
+
+
+class InsufficientStock(Exception):
+    """Au moins une ligne dépasse le stock disponible ; aucune n'a été appliquée"""
+
+    def __init__(self, shortfalls):
+        self.shortfalls = shortfalls  # [{'product_id', 'requested', 'available'}]
+        super().__init__(
+            ', '.join(
+                f"produit {s['product_id']} : {s['requested']} demandé(s), {s['available']} disponible(s)"
+                for s in shortfalls
+            )
+        )
+
+    def available(self):
+        """{product_id: stock disponible} pour ajuster les quantités"""
+        return {s['product_id']: s['available'] for s in self.shortfalls}
+
+
+def _normalize(lines):
+    """[(product_id, quantité)] -> {product_id: quantité totale}, quantités > 0"""
+    totals = {}
+    for product_id, quantity in lines:
+        quantity = Decimal(str(quantity))
+        if quantity > 0:
+            totals[int(product_id)] = totals.get(int(product_id), Decimal('0')) + quantity
+    return totals
+
+
+def _decrement_postgresql(connection, totals):
+    """UPDATE ... FROM (VALUES ...) ... RETURNING : un seul aller-retour, stock après mise à jour"""
+    table = connection.ops.quote_name(Product._meta.db_table)
+    values = ', '.join(['(%s::bigint, %s::numeric)'] * len(totals))
+    params = [p for item in sorted(totals.items()) for p in item]
+    sql = (
+        f"UPDATE {table} AS p SET stock = p.stock - v.qty "
+        f"FROM (VALUES {values}) AS v(id, qty) "
+        f"WHERE p.id = v.id AND p.stock - p.reserved_stock >= v.qty "
+        f"RETURNING p.id, p.stock"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return dict(cursor.fetchall())
+
+
+def _decrement_orm(totals):
+    """Repli hors PostgreSQL (pas de UPDATE ... FROM / RETURNING) : F() sous verrou"""
+    current = {
+        pid: (stock, reserved)
+        for pid, stock, reserved in Product.objects.select_for_update().filter(
+            pk__in=list(totals)
+        ).values_list('pk', 'stock', 'reserved_stock')
+    }
+    applied = {
+        pid: q for pid, q in totals.items()
+        if pid in current and current[pid][0] - current[pid][1] >= q
+    }
+    if applied:
+        Product.objects.filter(pk__in=list(applied)).update(stock=F('stock') - _delta(applied))
+    return {pid: current[pid][0] - q for pid, q in applied.items()}
+
+
+def _delta(totals):
+    return Case(
+        *[When(pk=pid, then=Value(q)) for pid, q in totals.items()],
+        default=Value(0),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+class StockService:
+    """Mouvements de stock atomiques pour le checkout et les API de commande"""
+
+    @staticmethod
+    def decrement(lines, threshold=LOW_STOCK_THRESHOLD):
+        """
+        Retire les quantités `lines` ([(product_id, quantité)]) du stock, tout ou rien.
+        Le stock retenu par les paniers en cours de paiement n'est pas vendable :
+        libérer d'abord les réservations du panier acheteur (ReservationService.release).
+        Retourne {product_id: nouveau stock}. Lève InsufficientStock (rien appliqué)
+        si une ligne dépasse le stock disponible.
+        """
+        totals = _normalize(lines)
+        if not totals:
+            return {}
+
+        connection = connections[router.db_for_write(Product)]
+        with transaction.atomic(using=connection.alias):
+            if connection.vendor == 'postgresql':
+                new_stock = _decrement_postgresql(connection, totals)
+            else:
+                new_stock = _decrement_orm(totals)
+
+            missing = [pid for pid in totals if pid not in new_stock]
+            if missing:
+                available = {
+                    pid: max(stock - reserved, 0)
+                    for pid, stock, reserved in Product.objects.filter(
+                        pk__in=missing
+                    ).values_list('pk', 'stock', 'reserved_stock')
+                }
+                # L'exception annule le savepoint : aucune ligne n'est appliquée
+                raise InsufficientStock([
+                    {
+                        'product_id': pid,
+                        'requested': totals[pid],
+                        'available': available.get(pid, Decimal('0')),
+                    }
+                    for pid in missing
+                ])
+
+            crossed = [
+                pid for pid, stock in new_stock.items()
+                if stock <= threshold < stock + totals[pid]
+            ]
+            if crossed:
+                StockService._emit_low_stock(crossed, threshold)
+            RealtimeService.stock_changed(new_stock)
+            if any(stock <= 0 for stock in new_stock.values()):
+                # UPDATE direct : pas de post_save, on invalide les sections "en stock"
+                transaction.on_commit(lambda: bump_version('product'))
+        return new_stock
+
+    @staticmethod
+    def increment(lines):
+        """Remet en stock (annulation de commande) : un seul UPDATE, sans lecture préalable"""
+        totals = _normalize(lines)
+        if not totals:
+            return 0
+        updated = Product.objects.filter(pk__in=list(totals)).update(stock=F('stock') + _delta(totals))
+        transaction.on_commit(lambda: bump_version('product'))
+        RealtimeService.stock_changed(totals)
+        return updated
+
+    @staticmethod
+    def _emit_low_stock(product_ids, threshold):
+        """Un seul envoi pour tous les produits passés sous le seuil, après commit"""
+        from tasks.notification_tasks import notify_low_stock_transitions
+
+        logger.info(f"⚠️ {len(product_ids)} produit(s) passent sous le seuil de stock ({threshold})")
+        transaction.on_commit(
+            lambda: notify_low_stock_transitions.delay(sorted(product_ids), threshold)
+        )
@@ -0,0 +1,230 @@
+"""
+Compteur de vues produits en écriture différée (write-behind).
+
+Chaque vue fait un HINCRBY dans Redis (un seul aller-retour pipeliné) au lieu d'un
+UPDATE en base. La tâche `tasks.product_tasks.flush_product_view_counts` vide le
+hash en attente et applique les comptes par lots, un seul UPDATE par lot.
+
+Compteurs tenus dans Redis :
+    views:pending              hash product_id -> vues non encore écrites en base
+    views:daily:<AAAAMMJJ>     hash des vues du jour (conservé 2 jours)
+    views:hour:<AAAAMMJJHH>    hash horaire, sommé pour la fenêtre glissante
+
+Sans Redis (développement, panne), les vues sont agrégées dans un tampon LRU
+local au processus, vidé en base par lot quand il est plein ou trop ancien.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.utils import timezone
+
+from utils.redis_client import RedisError, get_redis, redis_key
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = getattr(settings, 'PRODUCT_VIEWS_FLUSH_BATCH_SIZE', 500)
+ROLLING_WINDOW_HOURS = getattr(settings, 'PRODUCT_VIEWS_ROLLING_HOURS', 24)
+LOCAL_BUFFER_SIZE = getattr(settings, 'PRODUCT_VIEWS_LOCAL_BUFFER_SIZE', 1000)
+LOCAL_FLUSH_INTERVAL = getattr(settings, 'PRODUCT_VIEWS_LOCAL_FLUSH_SECONDS', 30)
+
+
+def apply_view_counts(counts, batch_size=FLUSH_BATCH_SIZE):
+    """
+    Ajoute `counts` ({product_id: vues}) à view_count et daily_views.
+    Un UPDATE ... SET view_count = view_count + CASE id WHEN ... par lot, tous
+    les lots dans une transaction : un échec n'en laisse aucun appliqué, le lot
+    peut être rejoué sans compter deux fois.
+    """
+    items = sorted((int(pid), int(n)) for pid, n in counts.items() if int(n) > 0)
+    updated = 0
+    with transaction.atomic():
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            delta = Case(
+                *[When(pk=pid, then=Value(n)) for pid, n in batch],
+                default=Value(0),
+                output_field=PositiveIntegerField(),
+            )
+            updated += Product.objects.filter(pk__in=[pid for pid, _ in batch]).update(
+                view_count=F('view_count') + delta,
+                daily_views=F('daily_views') + delta,
+            )
+    return updated
+
+
+class _LocalViewBuffer:
+    """Tampon LRU borné, utilisé uniquement quand Redis ne répond pas"""
+
+    def __init__(self, capacity, flush_interval):
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def add(self, product_id, n=1):
+        with self._lock:
+            self._counts[product_id] = self._counts.pop(product_id, 0) + n
+            expired = time.monotonic() - self._last_flush >= self.flush_interval
+            if expired:
+                to_flush, self._counts = dict(self._counts), OrderedDict()
+                self._last_flush = time.monotonic()
+            elif len(self._counts) > self.capacity:
+                # Plein : on écrit la moitié la moins récemment vue
+                to_flush = {}
+                for _ in range(len(self._counts) // 2):
+                    pid, count = self._counts.popitem(last=False)
+                    to_flush[pid] = count
+            else:
+                return
+        try:
+            apply_view_counts(to_flush)
+        except Exception as e:
+            logger.error(f"❌ Écriture du tampon de vues local impossible : {e}")
+            self.requeue(to_flush)
+
+    def drain(self):
+        with self._lock:
+            counts, self._counts = dict(self._counts), OrderedDict()
+            self._last_flush = time.monotonic()
+        return counts
+
+    def requeue(self, counts):
+        """Remet des comptes non écrits (échec d'écriture) dans le tampon"""
+        with self._lock:
+            for product_id, n in counts.items():
+                self._counts[product_id] = self._counts.pop(product_id, 0) + n
+
+
+_local_buffer = _LocalViewBuffer(LOCAL_BUFFER_SIZE, LOCAL_FLUSH_INTERVAL)
+
+
+class ProductViewCounter:
+    """Enregistrement et lecture des vues produits"""
+
+    PENDING_KEY = 'views:pending'
+    PROCESSING_KEY = 'views:processing'
+
+    @staticmethod
+    def _daily_key(day):
+        return redis_key('views', 'daily', day.strftime('%Y%m%d'))
+
+    @staticmethod
+    def _hour_key(moment):
+        return redis_key('views', 'hour', moment.strftime('%Y%m%d%H'))
+
+    @classmethod
+    def record(cls, product_id, n=1):
+        """Compte une vue (O(1), sans écriture en base sur le chemin de la requête)"""
+        client = get_redis()
+        if client is None:
+            _local_buffer.add(product_id, n)
+            return
+
+        now = timezone.now()
+        daily_key = cls._daily_key(now)
+        hour_key = cls._hour_key(now)
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.hincrby(redis_key(cls.PENDING_KEY), product_id, n)
+            pipe.hincrby(daily_key, product_id, n)
+            pipe.expire(daily_key, int(timedelta(days=2).total_seconds()))
+            pipe.hincrby(hour_key, product_id, n)
+            pipe.expire(hour_key, (ROLLING_WINDOW_HOURS + 1) * 3600)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"⚠️ Redis indisponible, vue mise en tampon local : {e}")
+            _local_buffer.add(product_id, n)
+
+    @classmethod
+    def daily_views(cls, product_ids, day=None):
+        """Vues du jour (Redis) : {product_id: vues}"""
+        client = get_redis()
+        product_ids = list(product_ids)
+        if client is None or not product_ids:
+            return {}
+        try:
+            values = client.hmget(cls._daily_key(day or timezone.now()), product_ids)
+        except RedisError:
+            return {}
+        return {pid: int(v or 0) for pid, v in zip(product_ids, values)}
+
+    @classmethod
+    def rolling_views(cls, product_ids, hours=ROLLING_WINDOW_HOURS):
+        """Vues sur les `hours` dernières heures glissantes : {product_id: vues}"""
+        client = get_redis()
+        product_ids = list(product_ids)
+        if client is None or not product_ids:
+            return {}
+        hours = min(hours, ROLLING_WINDOW_HOURS)
+        now = timezone.now()
+        try:
+            pipe = client.pipeline(transaction=False)
+            for offset in range(hours):
+                pipe.hmget(cls._hour_key(now - timedelta(hours=offset)), product_ids)
+            buckets = pipe.execute()
+        except RedisError:
+            return {}
+        totals = dict.fromkeys(product_ids, 0)
+        for values in buckets:
+            for pid, v in zip(product_ids, values):
+                totals[pid] += int(v or 0)
+        return totals
+
+    @classmethod
+    def drain_pending(cls):
+        """
+        Récupère et vide les vues en attente : (comptes, clé du lot Redis, comptes
+        du tampon local). Le hash est d'abord renommé : les vues qui arrivent
+        pendant l'écriture repartent dans un hash neuf. Un lot resté en
+        "processing" (flush interrompu) est repris en premier. Le tampon local
+        n'est vidé qu'après la lecture Redis : une erreur Redis ne le perd pas.
+        """
+        redis_counts, processing = {}, None
+        client = get_redis()
+        if client is not None:
+            pending = redis_key(cls.PENDING_KEY)
+            processing = redis_key(cls.PROCESSING_KEY)
+            try:
+                if not client.exists(processing) and client.exists(pending):
+                    client.rename(pending, processing)
+                redis_counts = {int(pid): int(n) for pid, n in client.hgetall(processing).items()}
+            except RedisError as e:
+                # Lot éventuel laissé dans Redis, repris au prochain passage
+                logger.warning(f"⚠️ Vues en attente illisibles dans Redis : {e}")
+                redis_counts, processing = {}, None
+
+        local = _local_buffer.drain()
+        counts = dict(redis_counts)
+        for pid, n in local.items():
+            counts[pid] = counts.get(pid, 0) + n
+        return counts, processing, local
+
+    @staticmethod
+    def requeue_local(counts):
+        """
+        Écriture échouée : le lot Redis reste en "processing" et sera rejoué,
+        les comptes du tampon local y sont remis (sinon perdus).
+        """
+        if counts:
+            _local_buffer.requeue(counts)
+
+    @classmethod
+    def acknowledge(cls, processing_key):
+        """
+        Supprime le lot Redis. Appelé dans la transaction des UPDATE, avant le
+        commit : un DEL en échec annule l'écriture (le lot sera rejoué), un lot
+        supprimé ne peut plus être rejoué après un commit réussi.
+        """
+        if processing_key:
+            client = get_redis()
+            if client is not None:
+                client.delete(processing_key)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Utilisateur, ProducerProfile, Notification
+from .models import Utilisateur, ProducerProfile, Notification, BroadcastNotification
 
 @admin.register(Utilisateur)
 class CustomUserAdmin(UserAdmin):
@@ -10,7 +10,7 @@ class CustomUserAdmin(UserAdmin):
     ordering = ['-created_at'] 
     fieldsets = UserAdmin.fieldsets + (
         ('Informations supplémentaires', {
-            'fields': ('role', 'phone', 'image')
+            'fields': ('role', 'phone', 'image', 'notification_digest')
         }),
     )
     add_fieldsets = UserAdmin.add_fieldsets + (
@@ -33,4 +33,11 @@ class ProducerProfileAdmin(admin.ModelAdmin):
 
 @admin.register(Notification)
 class NotificationsAdmin(admin.ModelAdmin):
-    list_display = ['user', 'type', 'title', 'is_read', 'created_at']
\ No newline at end of file
+    list_display = ['user', 'type', 'title', 'is_read', 'created_at']
+
+
+@admin.register(BroadcastNotification)
+class BroadcastNotificationAdmin(admin.ModelAdmin):
+    list_display = ['title', 'type', 'priority', 'roles', 'created_at', 'expires_at']
+    list_filter = ['type', 'priority']
+    search_fields = ['title', 'message']
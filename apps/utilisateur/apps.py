@@ -3,5 +3,7 @@ from django.apps import AppConfig
 
 class UtilisateurConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.utilisateur' 
+    name = 'apps.utilisateur'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,106 @@
+"""
+WebSocket temps réel : notifications, nouvelles commandes et niveaux de stock.
+
+Une connexion rejoint les groupes de son utilisateur, de son rôle et des
+annonces, plus celui de son profil producteur pour un compte entreprise ; les
+événements y sont publiés par services.realtime_service.RealtimeService. Les
+messages envoyés au client ont la forme {"event": ..., "data": {...}}.
+
+Authentification : session (navigateur) ou jeton JWT d'accès en paramètre
+`?token=` (application mobile, sans cookie).
+"""
+import logging
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.security.websocket import AllowedHostsOriginValidator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+
+from services.realtime_service import BROADCAST_GROUP, RealtimeService
+
+from .models import ProducerProfile
+
+logger = logging.getLogger(__name__)
+
+# Fermeture applicative : connexion non authentifiée
+CLOSE_UNAUTHENTICATED = 4401
+
+
+@database_sync_to_async
+def _user_from_token(raw_token):
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.settings import api_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    try:
+        token = AccessToken(raw_token)
+        return get_user_model().objects.get(
+            **{api_settings.USER_ID_FIELD: token[api_settings.USER_ID_CLAIM]}, is_active=True
+        )
+    except (TokenError, KeyError, get_user_model().DoesNotExist):
+        return AnonymousUser()
+
+
+class JWTQueryAuthMiddleware:
+    """
+    Connexion avec `?token=<jwt d'accès>` : utilisateur du jeton, sans cookie ni
+    contrôle d'origine (client mobile). Sinon : `session_app` (session Django,
+    origine vérifiée contre le détournement de WebSocket inter-sites).
+    """
+
+    def __init__(self, app, session_app):
+        self.app = app
+        self.session_app = session_app
+
+    async def __call__(self, scope, receive, send):
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+        if not token:
+            return await self.session_app(scope, receive, send)
+        scope = dict(scope, user=await _user_from_token(token[0]))
+        return await self.app(scope, receive, send)
+
+
+def websocket_auth_stack(app):
+    """Pile d'authentification des WebSockets : JWT en paramètre ou session"""
+    return JWTQueryAuthMiddleware(app, AllowedHostsOriginValidator(AuthMiddlewareStack(app)))
+
+
+@database_sync_to_async
+def _producer_id(user_id):
+    return ProducerProfile.objects.filter(user_id=user_id).values_list('id', flat=True).first()
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """Flux d'événements de l'utilisateur connecté"""
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=CLOSE_UNAUTHENTICATED)
+            return
+
+        self.groups = [
+            RealtimeService.user_group(user.id),
+            RealtimeService.role_group(user.role),
+            BROADCAST_GROUP,
+        ]
+        if user.is_entreprise:
+            producer_id = await _producer_id(user.id)
+            if producer_id is not None:
+                self.groups.append(RealtimeService.producer_group(producer_id))
+
+        # self.groups : quittés automatiquement à la déconnexion
+        for group in self.groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+
+    async def receive_json(self, content, **kwargs):
+        # Keep-alive des clients mobiles derrière un proxy
+        if content.get('type') == 'ping':
+            await self.send_json({'event': 'pong', 'data': {}})
+
+    async def push_event(self, message):
+        await self.send_json({'event': message['event'], 'data': message['data']})
@@ -213,7 +213,7 @@ class UserProfileEditForm(UserChangeForm):
 
     class Meta:
         model = Utilisateur
-        fields = ['email', 'phone', 'location', 'role', 'image', 'first_name', 'last_name']
+        fields = ['email', 'phone', 'location', 'role', 'image', 'first_name', 'last_name', 'notification_digest']
         widgets = {
             'email': forms.EmailInput(attrs={'class': 'form-control', 'placeholder': 'example@gmail.com'}),
             'phone': forms.TextInput(attrs={'class': 'form-control', 'placeholder': '+224 000 00 00 00'}),
@@ -222,6 +222,7 @@ class UserProfileEditForm(UserChangeForm):
             'image': forms.FileInput(attrs={'class': 'form-control'}),
             'first_name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Prénom'}),
             'last_name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Nom de famille'}),
+            'notification_digest': forms.Select(attrs={'class': 'form-control'}),
         }
 
     def clean(self):
@@ -243,6 +244,9 @@ class UserProfileEditForm(UserChangeForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Résumés d'alertes : stock et commandes ne concernent que les producteurs
+        if not self.instance.is_entreprise:
+            self.fields.pop('notification_digest', None)
         for field_name, field in self.fields.items():
             if isinstance(field.widget, forms.TextInput) or isinstance(field.widget, forms.EmailInput) or isinstance(field.widget, forms.PasswordInput):
                 field.widget.attrs.update({'class': 'form-control'})
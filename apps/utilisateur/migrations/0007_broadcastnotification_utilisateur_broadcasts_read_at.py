@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-01-16 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utilisateur', '0006_notification_priority_read_at_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='utilisateur',
+            name='broadcasts_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='BroadcastNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('NEW_ORDER', 'Nouvelle commande'), ('LOW_STOCK', 'Stock bas'), ('ORDER_UPDATE', 'Mise à jour commande'), ('MESSAGE', 'Nouveau message'), ('INFO', 'Information')], default='INFO', max_length=20)),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('priority', models.PositiveSmallIntegerField(default=1)),
+                ('roles', models.JSONField(blank=True, default=list, help_text='Rôles ciblés (vide : tous)')),
+                ('user_ids', models.JSONField(blank=True, default=list, help_text='Utilisateurs ciblés (vide : tous)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
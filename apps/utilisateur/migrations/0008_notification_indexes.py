@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-01-16 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utilisateur', '0007_broadcastnotification_utilisateur_broadcasts_read_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at', '-id'], include=['is_read'], name='utilisateur_notif_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user', '-created_at'], name='utilisateur_notif_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 6.0 on 2026-01-17 09:00
+"""
+utilisateur_notification devient une table partitionnée par mois (RANGE sur
+created_at), pour une rétention par DETACH / DROP de partition au lieu d'un
+DELETE massif (voir apps.utilisateur.partitions).
+
+PostgreSQL impose la clé de partition dans la clé primaire : elle devient
+(id, created_at) ; id reste unique en pratique (séquence) et l'ORM n'en voit
+pas la différence. Les données existantes sont recopiées dans une transaction :
+à planifier hors heures de pointe sur une grosse table.
+"""
+from django.db import migrations
+
+TABLE = 'utilisateur_notification'
+
+# Contraintes et index recréés à l'identique (mêmes noms que ceux de Django)
+CONSTRAINTS_AND_INDEXES = f"""
+ALTER TABLE {TABLE} ADD CONSTRAINT utilisateur_notifica_user_id_c18d66a1_fk_utilisate
+    FOREIGN KEY (user_id) REFERENCES utilisateur_utilisateur(id) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE {TABLE} ADD CONSTRAINT utilisateur_notifica_related_order_id_850bc297_fk_orders_or
+    FOREIGN KEY (related_order_id) REFERENCES orders_order(id) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE {TABLE} ADD CONSTRAINT utilisateur_notifica_related_product_id_a2511451_fk_products_
+    FOREIGN KEY (related_product_id) REFERENCES products_product(id) DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX utilisateur_notification_user_id_c18d66a1 ON {TABLE} (user_id);
+CREATE INDEX utilisateur_notification_related_order_id_850bc297 ON {TABLE} (related_order_id);
+CREATE INDEX utilisateur_notification_related_product_id_a2511451 ON {TABLE} (related_product_id);
+CREATE INDEX utilisateur_notif_feed_idx ON {TABLE} (user_id, created_at DESC, id DESC) INCLUDE (is_read);
+CREATE INDEX utilisateur_notif_unread_idx ON {TABLE} (user_id, created_at DESC) WHERE NOT is_read;
+"""
+
+
+def _copy_into_new_table(old, partitioned):
+    """Renomme la table en `old`, la recopie dans une nouvelle table du même nom, supprime `old`"""
+    partition_by = 'PARTITION BY RANGE (created_at)' if partitioned else ''
+    partitions = f"""
+DO $$
+DECLARE
+    part_start timestamptz := date_trunc('month', COALESCE((SELECT min(created_at) FROM {old}), now()));
+    last_start timestamptz := date_trunc('month', now()) + interval '3 months';
+BEGIN
+    WHILE part_start <= last_start LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF {TABLE} FOR VALUES FROM (%L) TO (%L)',
+            '{TABLE}_p' || to_char(part_start, 'YYYYMM'), part_start, part_start + interval '1 month'
+        );
+        part_start := part_start + interval '1 month';
+    END LOOP;
+END $$;
+CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT;
+""" if partitioned else ''
+    primary_key = '(id, created_at)' if partitioned else '(id)'
+    return f"""
+SET LOCAL TIME ZONE 'UTC';
+ALTER TABLE {TABLE} RENAME TO {old};
+CREATE TABLE {TABLE} (
+    LIKE {old} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS
+) {partition_by};
+{partitions}
+INSERT INTO {TABLE} SELECT * FROM {old};
+DROP TABLE {old} CASCADE;
+DO $$
+BEGIN
+    EXECUTE format('ALTER SEQUENCE %s RENAME TO {TABLE}_id_seq', pg_get_serial_sequence('{TABLE}', 'id'));
+END $$;
+SELECT setval('{TABLE}_id_seq', COALESCE((SELECT max(id) FROM {TABLE}), 0) + 1, false);
+ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY {primary_key};
+{CONSTRAINTS_AND_INDEXES}
+"""
+
+
+def partition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(_copy_into_new_table(f'{TABLE}_unpartitioned', partitioned=True), params=None)
+
+
+def unpartition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(_copy_into_new_table(f'{TABLE}_partitioned', partitioned=False), params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utilisateur', '0008_notification_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-01-18 10:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utilisateur', '0009_partition_notification_by_month'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='utilisateur',
+            name='notification_digest',
+            field=models.CharField(choices=[('IMMEDIATE', 'Immédiatement'), ('HOURLY', 'Résumé toutes les heures'), ('DAILY', 'Résumé quotidien')], default='IMMEDIATE', max_length=10, verbose_name='Alertes stock et commandes'),
+        ),
+        migrations.CreateModel(
+            name='DigestEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('STOCK', 'Stock bas'), ('ORDER', 'Nouvelle commande')], max_length=10)),
+                ('data', models.JSONField(default=dict)),
+                ('due_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='digest_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['due_at', 'user', 'kind'], name='utilisateur_digest_due_idx')],
+            },
+        ),
+    ]
@@ -9,6 +9,11 @@ class Utilisateur(AbstractUser):
         CLIENT = 'CLIENT', _('Client (Agriculteur/Acheteur)')
         ENTREPRISE = 'ENTREPRISE', _('Entreprise (Producteur/Fournisseur)')
 
+    class DigestFrequency(models.TextChoices):
+        IMMEDIATE = 'IMMEDIATE', _('Immédiatement')
+        HOURLY = 'HOURLY', _('Résumé toutes les heures')
+        DAILY = 'DAILY', _('Résumé quotidien')
+
     role = models.CharField(max_length=20, choices=Role.choices, default=Role.CLIENT)
     location = models.CharField(max_length=255, blank=True, help_text="Ex: Coordonnées GPS de la ferme")
     phone = models.CharField(max_length=20, blank=True)
@@ -18,6 +23,13 @@ class Utilisateur(AbstractUser):
         verbose_name="Dernier changement de mot de passe"
     )
     image = models.ImageField(upload_to='user_profiles/', null=True, blank=True, verbose_name=_("Image de profil"))
+    # Annonces (BroadcastNotification) lues jusqu'à cette date ; à défaut, date d'inscription
+    broadcasts_read_at = models.DateTimeField(null=True, blank=True)
+    # Alertes stock / nouvelles commandes : à l'unité par défaut, regroupées (DigestEvent) sur demande
+    notification_digest = models.CharField(
+        max_length=10, choices=DigestFrequency.choices, default=DigestFrequency.IMMEDIATE,
+        verbose_name=_("Alertes stock et commandes")
+    )
 
     class Meta:
         app_label = 'utilisateur'  
@@ -74,12 +86,88 @@ class Notification(models.Model):
     title = models.CharField(max_length=200)
     message = models.TextField()
     is_read = models.BooleanField(default=False)
+    priority = models.PositiveSmallIntegerField(default=1)  # 1: bas, 2: moyen, 3: élevé
     created_at = models.DateTimeField(auto_now_add=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
     related_order = models.ForeignKey('orders.Order', null=True, blank=True, on_delete=models.SET_NULL)
     related_product = models.ForeignKey('products.Product', null=True, blank=True, on_delete=models.SET_NULL)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Fil keyset (user, created_at, id) ; is_read inclus : pages d'ids / états
+            # et marquage des notifications affichées en index-only
+            models.Index(
+                fields=['user', '-created_at', '-id'],
+                include=['is_read'],
+                name='utilisateur_notif_feed_idx',
+            ),
+            # Non lues seulement : compteurs, "tout marquer comme lu"
+            models.Index(
+                fields=['user', '-created_at'],
+                condition=models.Q(is_read=False),
+                name='utilisateur_notif_unread_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.user.username}"
+
+
+class BroadcastNotification(models.Model):
+    """
+    Annonce à toute une audience : une seule ligne, quel que soit le nombre de
+    destinataires. Chaque lecteur la fusionne avec ses notifications personnelles
+    (fan-out à la lecture) ; l'état lu / non lu vient de Utilisateur.broadcasts_read_at.
+    """
+    type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES, default='INFO')
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    priority = models.PositiveSmallIntegerField(default=1)
+    roles = models.JSONField(default=list, blank=True, help_text="Rôles ciblés (vide : tous)")
+    user_ids = models.JSONField(default=list, blank=True, help_text="Utilisateurs ciblés (vide : tous)")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    is_broadcast = True
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.title
+
+    def targets(self, user):
+        """L'annonce s'adresse-t-elle à `user` ?"""
+        return (
+            (not self.roles or user.role in self.roles)
+            and (not self.user_ids or user.id in self.user_ids)
+        )
+
+
+class DigestEvent(models.Model):
+    """
+    Événement (stock bas, nouvelle commande) en attente du prochain résumé de
+    son destinataire : les événements d'un même (user, kind) sont envoyés en
+    une notification et un email à `due_at` (services.digest_service).
+    """
+    KINDS = [
+        ('STOCK', 'Stock bas'),
+        ('ORDER', 'Nouvelle commande'),
+    ]
+
+    user = models.ForeignKey(Utilisateur, on_delete=models.CASCADE, related_name='digest_events')
+    kind = models.CharField(max_length=10, choices=KINDS)
+    data = models.JSONField(default=dict)
+    due_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Résumés échus : la tâche de flush ne lit que cet index
+            models.Index(fields=['due_at', 'user', 'kind'], name='utilisateur_digest_due_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.title} - {self.user.username}"
\ No newline at end of file
+        return f"{self.kind} - {self.user_id} ({self.due_at:%d/%m %H:%M})"
@@ -0,0 +1,193 @@
+"""
+Partitions mensuelles de utilisateur_notification (RANGE sur created_at).
+
+La table est partitionnée par la migration 0009 : une partition par mois
+(`utilisateur_notification_pAAAAMM`) et une partition DEFAULT de secours qui
+doit rester vide. `ensure_future` crée à l'avance les partitions des mois à
+venir ; si des lignes sont tombées dans DEFAULT (maintenance interrompue plus
+de MONTHS_AHEAD mois), il crée aussi les partitions de leurs mois et les y
+déplace, sans quoi PostgreSQL refuserait ces partitions. `drop_expired` applique la rétention en détachant puis supprimant les
+partitions entièrement plus anciennes que la limite : une opération sur les
+métadonnées, sans DELETE ligne à ligne ni gonflement de la table. La rétention
+se fait donc au mois près.
+
+Les requêtes filtrées sur created_at (fil récent, tranches keyset) ne lisent
+que les partitions concernées (partition pruning).
+"""
+import logging
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+MONTHS_AHEAD = 3
+PARTITION_NAME = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def _month_start(moment):
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _next_month(start):
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def _partition_name(start):
+    return f"{Notification._meta.db_table}_p{start:%Y%m}"
+
+
+def _default_name():
+    return f"{Notification._meta.db_table}_default"
+
+
+def is_partitioned():
+    """La table est-elle partitionnée (PostgreSQL, migration 0009 appliquée) ?"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass)",
+            [Notification._meta.db_table],
+        )
+        return cursor.fetchone()[0]
+
+
+def partitions():
+    """{nom: début du mois} des partitions mensuelles existantes (hors DEFAULT)"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [Notification._meta.db_table],
+        )
+        names = [name for (name,) in cursor.fetchall()]
+    found = {}
+    for name in names:
+        match = PARTITION_NAME.search(name)
+        if match:
+            found[name] = datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)
+    return found
+
+
+def default_months():
+    """Débuts des mois ayant des lignes dans la partition DEFAULT (vide en temps normal)"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [_default_name()])
+        if not cursor.fetchone()[0]:
+            return set()
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC') "
+            f"FROM {connection.ops.quote_name(_default_name())}"
+        )
+        return {month.replace(tzinfo=dt_timezone.utc) for (month,) in cursor.fetchall()}
+
+
+class NotificationPartitions:
+    """Création à l'avance et rétention des partitions mensuelles"""
+
+    @staticmethod
+    def ensure_future(months_ahead=MONTHS_AHEAD, now=None):
+        """
+        Crée les partitions du mois courant et des `months_ahead` suivants si
+        elles manquent, ainsi que celles des mois présents dans DEFAULT (lignes
+        déplacées). Retourne les noms créés.
+        """
+        existing = partitions()
+        stranded = default_months()
+        start = _month_start(now or timezone.now())
+        months = set(stranded)
+        for _ in range(months_ahead + 1):
+            months.add(start)
+            start = _next_month(start)
+
+        created = []
+        for start in sorted(months):
+            name = _partition_name(start)
+            if name in existing:
+                continue
+            if start in stranded:
+                moved = NotificationPartitions._create_from_default(name, start)
+                logger.warning(f"⚠️ {moved} notification(s) sorties de la partition DEFAULT vers {name}")
+            else:
+                NotificationPartitions._create(name, start)
+            created.append(name)
+        if created:
+            logger.info(f"🗂️ Partitions de notifications créées : {', '.join(created)}")
+        return created
+
+    @staticmethod
+    def _create(name, start):
+        table = connection.ops.quote_name(Notification._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(name)} "
+                f"PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+                [start, _next_month(start)],
+            )
+
+    @staticmethod
+    def _create_from_default(name, start):
+        """
+        Partition d'un mois dont des lignes sont dans DEFAULT : DEFAULT détachée,
+        partition créée, lignes déplacées, DEFAULT rattachée, en une transaction.
+        Retourne le nombre de lignes déplacées (compteurs de non lues inchangés).
+        """
+        table = connection.ops.quote_name(Notification._meta.db_table)
+        default = connection.ops.quote_name(_default_name())
+        partition = connection.ops.quote_name(name)
+        bounds = [start, _next_month(start)]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {default}")
+            cursor.execute(
+                f"CREATE TABLE {partition} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)", bounds
+            )
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {default} WHERE created_at >= %s AND created_at < %s RETURNING *) "
+                f"INSERT INTO {partition} SELECT * FROM moved",
+                bounds,
+            )
+            moved = cursor.rowcount
+            cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT")
+        return moved
+
+    @staticmethod
+    def drop_expired(retention_days, now=None):
+        """
+        Supprime les partitions dont tout le mois est antérieur à
+        maintenant - retention_days. Les compteurs de non lues des utilisateurs
+        concernés sont décrémentés. Retourne le nombre (estimé) de lignes supprimées.
+        """
+        from services.notification_service import NotificationService
+
+        cutoff = (now or timezone.now()) - timedelta(days=retention_days)
+        table = connection.ops.quote_name(Notification._meta.db_table)
+        dropped_rows = 0
+
+        for name, start in sorted(partitions().items(), key=lambda item: item[1]):
+            if _next_month(start) > cutoff:
+                continue
+            partition = connection.ops.quote_name(name)
+            with transaction.atomic(), connection.cursor() as cursor:
+                # Non lues seulement : lu sur l'index partiel de la partition
+                cursor.execute(
+                    f"SELECT user_id, COUNT(*) FROM {partition} WHERE NOT is_read GROUP BY user_id"
+                )
+                per_user = cursor.fetchall()
+                # Taille estimée (statistiques), sans parcourir la partition
+                cursor.execute("SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = %s::regclass", [name])
+                rows = cursor.fetchone()[0]
+                # DETACH puis DROP : métadonnées seulement, verrou bref sur la table mère
+                cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {partition}")
+                cursor.execute(f"DROP TABLE {partition}")
+                NotificationService._adjust_unread_on_commit(
+                    {user_id: -unread for user_id, unread in per_user}
+                )
+            dropped_rows += rows
+            logger.info(f"🧹 Partition {name} supprimée ({rows} notifications)")
+
+        return dropped_rows
@@ -0,0 +1,15 @@
+"""
+Invalidation du cache des annonces (BroadcastNotification) par incrément de
+version à chaque modification, admin comprise.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from utils.cache_versions import bump_version
+
+from .models import BroadcastNotification
+
+
+@receiver([post_save, post_delete], sender=BroadcastNotification)
+def invalidate_broadcasts(sender, **kwargs):
+    bump_version('broadcast')
@@ -36,4 +36,5 @@ urlpatterns = [
         template_name='utilisateur/password_reset_complete.html'
     ), name='password_reset_complete'),
     path('notifications/', views.NotificationsView.as_view(), name='notifications'),
+    path('notifications/read/', views.NotificationsMarkReadView.as_view(), name='notifications_mark_read'),
 ]
\ No newline at end of file
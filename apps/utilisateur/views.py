@@ -233,51 +233,111 @@ class UserProfileEditView(LoginRequiredMixin, View):
     
 
 ## NOTIFICATIONS ET EMAILS GÉRÉS DANS services/email_service.py ##
-from django.views.generic import ListView
-from .models import Notification
+from .models import BroadcastNotification, Notification
 from django.contrib import messages
-
-class NotificationsView(LoginRequiredMixin, ListView):
-    model = Notification
-    template_name = 'utilisateur/notifications.html' 
-    context_object_name = 'notifications'
-    paginate_by = 20
-    ordering = ['-created_at']  
-
-    def get_queryset(self):
-        """Retourne les notifications de l'utilisateur connecté"""
-        return Notification.objects.filter(user=self.request.user).select_related(
-            'related_order', 'related_product'
-        )
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['unread_count'] = Notification.objects.filter(
-            user=self.request.user, is_read=False
-        ).count()
-        return context
+from services.notification_service import NotificationService
+
+
+# Plus grand id d'une clé BigAutoField : au-delà, PostgreSQL lève DataError
+MAX_ID = 2 ** 63 - 1
+
+
+def _posted_ids(values):
+    """Ids postés valides (entiers dans la plage des clés) ; les autres sont ignorés"""
+    ids = []
+    for value in values:
+        try:
+            pk = int(value)
+        except (TypeError, ValueError):
+            continue
+        if 0 < pk <= MAX_ID:
+            ids.append(pk)
+    return ids
+
+
+def _visible_broadcasts(request):
+    """Annonces affichées (ids postés) qui concernent l'utilisateur"""
+    ids = _posted_ids(request.POST.getlist('broadcast_ids'))
+    if not ids:
+        return []
+    return [b for b in NotificationService.broadcasts_for(request.user) if b.id in ids]
+
+
+class NotificationsView(LoginRequiredMixin, View):
+    """
+    Fil des notifications en défilement infini : la page complète affiche la
+    première tranche, les suivantes sont chargées par HTMX (?cursor=...) en
+    pagination keyset, sans OFFSET ni COUNT.
+    """
+    template_name = 'utilisateur/notifications.html'
+    page_template_name = 'utilisateur/partials/notification_page.html'
+
+    def get(self, request, *args, **kwargs):
+        page = NotificationService.get_feed_page(request.user, cursor=request.GET.get('cursor'))
+        context = {
+            'notifications': page.items,
+            'next_cursor': page.next_cursor,
+        }
+        if request.htmx:
+            return render(request, self.page_template_name, context)
+
+        context['unread_count'] = NotificationService.get_total_unread_count(request.user)
+        return render(request, self.template_name, context)
 
     def post(self, request, *args, **kwargs):
         """Gère les actions POST : marquer tout lu ou une seule lu"""
         if 'mark_all_read' in request.POST:
-            updated = Notification.objects.filter(
-                user=request.user, is_read=False
-            ).update(is_read=True)
+            updated = NotificationService.mark_all_as_read(request.user.id)
+            updated += NotificationService.mark_broadcasts_as_read(request.user)
             if updated:
                 messages.success(request, f"{updated} notification(s) marquée(s) comme lue(s).")
             else:
                 messages.info(request, "Aucune nouvelle notification à marquer.")
 
         elif 'mark_read' in request.POST:
-            notification_id = request.POST.get('notification_id')
-            try:
-                notif = Notification.objects.get(
-                    id=notification_id, user=request.user
-                )
-                notif.is_read = True
-                notif.save(update_fields=['is_read'])
+            notification_id = (_posted_ids(request.POST.getlist('notification_id')) or [None])[0]
+            if notification_id and Notification.objects.filter(id=notification_id, user=request.user).exists():
+                NotificationService.mark_as_read(notification_id, request.user.id)
                 messages.success(request, "Notification marquée comme lue.")
-            except Notification.DoesNotExist:
+            else:
                 messages.error(request, "Notification introuvable.")
 
-        return redirect('utilisateur:notifications')
\ No newline at end of file
+        elif 'mark_broadcast_read' in request.POST:
+            broadcast_id = (_posted_ids(request.POST.getlist('broadcast_id')) or [None])[0]
+            broadcast = broadcast_id and BroadcastNotification.objects.filter(id=broadcast_id).first()
+            if broadcast and broadcast.targets(request.user):
+                # Filigrane : les annonces antérieures passent aussi à lues
+                NotificationService.mark_broadcasts_as_read(request.user, until=broadcast.created_at)
+                messages.success(request, "Annonce marquée comme lue.")
+            else:
+                messages.error(request, "Annonce introuvable.")
+
+        return redirect('utilisateur:notifications')
+
+
+class NotificationsMarkReadView(LoginRequiredMixin, View):
+    """
+    Marque comme lues les notifications affichées (ids postés par la page) :
+    un UPDATE limité à ces ids, jamais l'ensemble des notifications
+    """
+
+    def post(self, request, *args, **kwargs):
+        notification_ids = _posted_ids(request.POST.getlist('notification_ids'))
+        updated = NotificationService.mark_many_as_read(request.user.id, notification_ids)
+
+        broadcasts = _visible_broadcasts(request)
+        if broadcasts:
+            updated += NotificationService.mark_broadcasts_as_read(
+                request.user, until=max(b.created_at for b in broadcasts)
+            )
+
+        if updated:
+            messages.success(request, f"{updated} notification(s) marquée(s) comme lue(s).")
+        else:
+            messages.info(request, "Aucune nouvelle notification à marquer.")
+
+        if request.htmx:
+            response = HttpResponse(status=204)
+            response['HX-Refresh'] = 'true'
+            return response
+        return redirect('utilisateur:notifications')
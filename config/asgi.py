@@ -2,21 +2,28 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP passe par Django ; les WebSockets temps réel (notifications, commandes,
+stock) par Channels. Servi par uvicorn : `uvicorn config.asgi:application`.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
 import os
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
 
+# Initialise Django (apps, modèles) avant d'importer les consumers
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+from apps.utilisateur.consumers import websocket_auth_stack  # noqa: E402
+from apps.utilisateur.routing import websocket_urlpatterns  # noqa: E402
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    # WebSockets pour notifications temps réel (à étendre)
-    # "websocket": AuthMiddlewareStack(URLRouter(...)),
+    "http": django_asgi_app,
+    "websocket": websocket_auth_stack(URLRouter(websocket_urlpatterns)),
 })
 
 
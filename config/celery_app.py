@@ -41,6 +41,42 @@ app.conf.beat_schedule = {
         'schedule': crontab(hour=0, minute=0),  # Minuit
         'options': {'queue': 'products'}
     },
+    # cette ligne definit une tache periodique qui ecrit en base les vues produits accumulees dans Redis chaque minute
+    'flush-product-view-counts': {
+        'task': 'tasks.product_tasks.flush_product_view_counts',
+        'schedule': 60.0,
+        'options': {'queue': 'products'}
+    },
+    # Filet de sécurité de la boîte de réception des webhooks de paiement
+    'drain-payment-webhooks': {
+        'task': 'tasks.payment_tasks.drain_payment_webhooks',
+        'schedule': 30.0,
+        'options': {'queue': 'payments'}
+    },
+    # Écriture différée des paniers chauds (CART_STORAGE = 'redis')
+    'flush-hot-carts': {
+        'task': 'tasks.cart_tasks.flush_hot_carts',
+        'schedule': 30.0,
+        'options': {'queue': 'products'}
+    },
+    # Libère les réservations de stock des paniers abandonnés au paiement
+    'expire-stock-reservations': {
+        'task': 'tasks.product_tasks.expire_stock_reservations',
+        'schedule': 60.0,
+        'options': {'queue': 'products'}
+    },
+    # Recalcul nocturne des recommandations "achetés ensemble" (1h du matin)
+    'update-product-recommendations': {
+        'task': 'tasks.product_tasks.update_product_recommendations',
+        'schedule': crontab(hour=1, minute=0),
+        'options': {'queue': 'heavy_tasks'}
+    },
+    # Recalcul complet nocturne des produits similaires (TF-IDF), 1h30
+    'update-similar-products': {
+        'task': 'tasks.product_tasks.update_similar_products',
+        'schedule': crontab(hour=1, minute=30),
+        'options': {'queue': 'heavy_tasks'}
+    },
     'welcome-new-users': {
         'task': 'tasks.email_tasks.send_welcome_emails_to_new_users',
         'schedule': crontab(hour=8, minute=30),
@@ -55,6 +91,22 @@ app.conf.beat_schedule = {
         'options': {'queue': 'maintenance'}
     },
     
+    # Partitions mensuelles des notifications : mois à venir créés à l'avance,
+    # mois échus supprimés (quotidien, la création ne doit jamais manquer)
+    'maintain-notification-partitions': {
+        'task': 'tasks.notification_tasks.maintain_notification_partitions',
+        'schedule': crontab(hour=3, minute=30),
+        'kwargs': {'days_to_keep': 90, 'months_ahead': 3},
+        'options': {'queue': 'maintenance'}
+    },
+    
+    # Résumés d'alertes (stock, commandes) échus : fenêtres horaires / quotidiennes
+    'flush-notification-digests': {
+        'task': 'tasks.notification_tasks.flush_notification_digests',
+        'schedule': crontab(minute='*/5'),
+        'options': {'queue': 'notifications'}
+    },
+    
     # Tâches horaires
     'sync-notifications-cache': {
         'task': 'tasks.notification_tasks.sync_unread_notifications_cache',
@@ -62,6 +114,13 @@ app.conf.beat_schedule = {
         'options': {'queue': 'notifications'}
     },
     
+    # Pré-chauffage du cache des sections d'accueil (toutes les 5 minutes)
+    'warm-marketplace-sections': {
+        'task': 'tasks.periodic_tasks.warm_marketplace_sections',
+        'schedule': crontab(minute='*/5'),
+        'options': {'queue': 'maintenance'}
+    },
+    
     # Tâches mensuelles (1er du mois à 6h)
     'deactivate-out-of-stock-products': {
         'task': 'tasks.product_tasks.check_and_deactivate_out_of_stock_products',
@@ -83,6 +142,10 @@ app.conf.task_routes = {
     'tasks.email_tasks.send_order_confirmation_task': {'queue': 'high_priority'},
     'tasks.email_tasks.send_password_reset_task': {'queue': 'high_priority'},
     'tasks.notification_tasks.process_low_stock_alerts': {'queue': 'high_priority'},
+    'tasks.notification_tasks.notify_low_stock_transitions': {'queue': 'high_priority'},
+    
+    # Paiements : file dédiée, les webhooks ne concurrencent pas les autres tâches
+    'tasks.payment_tasks.*': {'queue': 'payments'},
     
     # Priorité moyenne
     'tasks.email_tasks.send_daily_sales_report': {'queue': 'reports'},
@@ -92,10 +155,17 @@ app.conf.task_routes = {
     # Tâches lourdes
     'tasks.product_tasks.generate_product_catalog_pdf': {'queue': 'heavy_tasks'},
     'tasks.product_tasks.check_and_update_product_statistics': {'queue': 'heavy_tasks'},
+    'tasks.product_tasks.flush_product_view_counts': {'queue': 'products'},
+    'tasks.product_tasks.expire_stock_reservations': {'queue': 'products'},
+    'tasks.cart_tasks.flush_hot_carts': {'queue': 'products'},
+    'tasks.product_tasks.update_product_recommendations': {'queue': 'heavy_tasks'},
+    'tasks.product_tasks.update_similar_products': {'queue': 'heavy_tasks'},
+    'tasks.product_tasks.refresh_similar_products': {'queue': 'products'},
     
     # Maintenance
     'tasks.periodic_tasks.*': {'queue': 'maintenance'},
     'tasks.notification_tasks.cleanup_old_notifications': {'queue': 'maintenance'},
+    'tasks.notification_tasks.maintain_notification_partitions': {'queue': 'maintenance'},
 }
 
 # Configuration de la tolérance aux fautes
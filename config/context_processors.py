@@ -1,8 +1,56 @@
-from apps.utilisateur.models import Notification
-
-def unread_notifications(request):
-    if request.user.is_authenticated:
-        unread_count = Notification.objects.filter(user=request.user, is_read=False).count()
-    else:
-        unread_count = 0
-    return {'unread_notifications_count': unread_count}
+"""
+Contexte commun à tous les gabarits (badges du header).
+
+Un seul processeur, et paresseux : il ne renvoie que des fonctions, que le moteur
+de gabarits n'appelle qu'au moment où une variable est lue. Un partiel HTMX qui
+n'affiche pas le header ne coûte donc aucune requête. Les valeurs sont calculées
+une seule fois par requête HTTP (plusieurs rendus compris) et viennent des
+caches existants : compteur de notifications non lues (plus les annonces en
+cache) et panier chaud / résumé de panier.
+"""
+from functools import cached_property
+
+from apps.orders.cart_store import HotCartStore
+from apps.orders.models import Cart
+from services.notification_service import NotificationService
+
+
+class RequestContextValues:
+    """Valeurs du contexte commun, mémorisées pour la durée de la requête"""
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def unread_notifications_count(self):
+        if not self.user.is_authenticated:
+            return 0
+        return NotificationService.get_total_unread_count(self.user)
+
+    @cached_property
+    def cart_count(self):
+        if not self.user.is_authenticated:
+            return 0
+        # Panier chaud (Redis) s'il existe, sans requête SQL
+        count = HotCartStore.total_quantity(self.user.id)
+        if count is None:
+            try:
+                count = self.user.cart.summary.total_quantity
+            except Cart.DoesNotExist:
+                count = 0
+        return count
+
+    @classmethod
+    def for_request(cls, request):
+        values = getattr(request, '_context_values', None)
+        if values is None:
+            values = request._context_values = cls(request.user)
+        return values
+
+
+def site_context(request):
+    values = RequestContextValues.for_request(request)
+    return {
+        'unread_notifications_count': lambda: values.unread_notifications_count,
+        'cart_count': lambda: values.cart_count,
+    }
@@ -35,6 +35,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third party
     'corsheaders',
@@ -85,15 +86,36 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'config.context_processors.unread_notifications',
-                'apps.orders.context_processors.cart_context',
-                "marketplace.context_processors.cart_context",
+                'config.context_processors.site_context',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# Channels : WebSockets temps réel (notifications, commandes, stock)
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {
+            'hosts': [env('CHANNEL_LAYER_URL', default='redis://localhost:6379/2')],
+            'capacity': 1500,
+            'expiry': 10,
+        },
+    }
+}
+# Au-delà de ce nombre de destinataires, une création en masse n'est pas poussée
+REALTIME_FANOUT_LIMIT = env.int('REALTIME_FANOUT_LIMIT', default=500)
+
+# Suivi des commandes en SSE : flux simultanés par worker ASGI, intervalle de heartbeat
+ORDER_TRACKING_MAX_CONNECTIONS = env.int('ORDER_TRACKING_MAX_CONNECTIONS', default=2000)
+ORDER_TRACKING_HEARTBEAT_SECONDS = env.int('ORDER_TRACKING_HEARTBEAT_SECONDS', default=20)
+
+# Résumés d'alertes stock / commandes : fenêtre des résumés horaires, heure du résumé quotidien
+NOTIFICATION_DIGEST_WINDOW_MINUTES = env.int('NOTIFICATION_DIGEST_WINDOW_MINUTES', default=60)
+NOTIFICATION_DIGEST_DAILY_HOUR = env.int('NOTIFICATION_DIGEST_DAILY_HOUR', default=7)
 
 # # Database (PostgreSQL avec options avancées)
 DATABASES = {
@@ -217,7 +239,7 @@ CSRF_TRUSTED_ORIGINS = env.list('CSRF_TRUSTED_ORIGINS', default=['http://127.0.0
 # Cache Configuration
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'BACKEND': 'django_redis.cache.RedisCache',
         'LOCATION': env('REDIS_URL', default='redis://localhost:6379/1'),
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
@@ -226,12 +248,19 @@ CACHES = {
     }
 }
 
+# Panier : 'database' (par défaut) ou 'redis' (panier chaud, écrit en base en différé)
+CART_STORAGE = env('CART_STORAGE', default='database')
+
 # Password reset timeout
 PASSWORD_RESET_TIMEOUT = 259200  # 3 jours en secondes
 
 # Stripe Configuration
 STRIPE_PUBLIC_KEY = env('STRIPE_PUBLISHABLE_KEY', default='')
 STRIPE_SECRET_KEY = env('STRIPE_SECRET_KEY', default='')
+STRIPE_WEBHOOK_SECRET = env('STRIPE_WEBHOOK_SECRET', default='')
+# Client de paiement (chemin pointé) et URL d'API alternative, ex. scripts/stub_payment_server.py
+PAYMENT_CLIENT = env('PAYMENT_CLIENT', default='apps.marketplace.services.StripePaymentClient')
+STRIPE_API_BASE = env('STRIPE_API_BASE', default='')
 
 # File Upload Configuration
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
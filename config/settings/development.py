@@ -32,6 +32,12 @@ CACHES = {
     }
 }
 
+# ==================== CHANNELS ====================
+# Couche en mémoire : un seul processus (runserver ASGI, tâches Celery en mode eager)
+CHANNEL_LAYERS = {
+    'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+}
+
 # ==================== CELERY ====================
 # CELERY_BROKER_URL = 'memory://'  # Utiliser le broker en mémoire pour le développement
 CELERY_TASK_ALWAYS_EAGER = True  # Exécuter les tâches de manière synchrone
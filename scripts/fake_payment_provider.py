@@ -0,0 +1,120 @@
+"""
+Faux fournisseur de paiement pour tester en charge l'endpoint des webhooks Stripe.
+
+Envoie des événements signés comme Stripe (en-tête Stripe-Signature, HMAC-SHA256
+avec STRIPE_WEBHOOK_SECRET), en parallèle, avec une part de relivraisons
+(même ID d'événement) et plusieurs événements par intention, puis affiche les
+temps de réponse. Le traitement asynchrone se suit dans la table
+orders_paymentwebhookevent et la clé de cache 'payments:webhook_inbox:metrics'.
+
+Usage:
+    python scripts/fake_payment_provider.py --url http://localhost:8000/stripe/webhook/ \
+        --secret whsec_test --intents 500 --concurrency 20 --duplicates 0.2
+
+Avec --user-id et --cart-id, la dernière intention envoie aussi un
+'payment_intent.succeeded' (commande créée depuis ce panier).
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+LIFECYCLE = ['payment_intent.created', 'payment_intent.processing', 'payment_intent.requires_action']
+
+
+def build_event(event_type, intent_id, metadata=None):
+    return {
+        'id': f"evt_{uuid.uuid4().hex}",
+        'object': 'event',
+        'type': event_type,
+        'created': int(time.time()),
+        'data': {
+            'object': {
+                'id': intent_id,
+                'object': 'payment_intent',
+                'status': event_type.rsplit('.', 1)[-1],
+                'metadata': metadata or {},
+            }
+        },
+    }
+
+
+def sign(payload, secret):
+    """En-tête Stripe-Signature : t=<timestamp>,v1=<hmac(secret, 't.payload')>"""
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def send(url, secret, event):
+    payload = json.dumps(event)
+    request = urllib.request.Request(
+        url,
+        data=payload.encode(),
+        headers={'Content-Type': 'application/json', 'Stripe-Signature': sign(payload, secret)},
+        method='POST',
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except urllib.error.URLError:
+        status = 0
+    return status, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8000/stripe/webhook/')
+    parser.add_argument('--secret', required=True, help='STRIPE_WEBHOOK_SECRET du serveur testé')
+    parser.add_argument('--intents', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duplicates', type=float, default=0.1, help='part des événements relivrés')
+    parser.add_argument('--user-id')
+    parser.add_argument('--cart-id')
+    args = parser.parse_args()
+
+    events = []
+    for i in range(args.intents):
+        intent_id = f"pi_fake_{uuid.uuid4().hex[:16]}"
+        for event_type in LIFECYCLE:
+            events.append(build_event(event_type, intent_id))
+        if args.user_id and args.cart_id and i == args.intents - 1:
+            events.append(build_event(
+                'payment_intent.succeeded', intent_id,
+                {'user_id': args.user_id, 'cart_id': args.cart_id, 'shipping_address': 'Test de charge'},
+            ))
+    events += random.sample(events, int(len(events) * args.duplicates))
+    random.shuffle(events)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda event: send(args.url, args.secret, event), events))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    print(f"📨 {len(events)} événements en {elapsed:.2f}s ({len(events) / elapsed:.0f}/s)")
+    print(f"   statuts : {statuses}")
+    print(
+        f"   latence : p50 {statistics.median(latencies) * 1000:.1f} ms, "
+        f"p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1000:.1f} ms, "
+        f"max {latencies[-1] * 1000:.1f} ms"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Serveur de paiement local imitant l'API PaymentIntent de Stripe, pour mesurer la
+latence du checkout sans appel externe.
+
+Répond à :
+    POST /v1/payment_intents          création
+    POST /v1/payment_intents/<id>     modification (montant, metadata...)
+    GET  /v1/payment_intents/<id>     lecture
+avec une latence simulée (--latency-ms, --jitter-ms) et compte les appels reçus
+(GET /__stats__), ce qui permet de vérifier que les rechargements du checkout
+réutilisent l'intention au lieu d'en créer une nouvelle.
+
+Usage:
+    python scripts/stub_payment_server.py --port 12111 --latency-ms 300
+    STRIPE_API_BASE=http://localhost:12111 STRIPE_SECRET_KEY=sk_test_stub python manage.py runserver
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+INTENT_PATH = re.compile(r'^/v1/payment_intents(?:/(?P<id>[\w-]+))?$')
+
+intents = {}
+stats = {'create': 0, 'modify': 0, 'retrieve': 0}
+lock = threading.Lock()
+
+
+def parse_form(body):
+    """Décode les paramètres Stripe (metadata[cle]=valeur) en dict imbriqué"""
+    params = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        match = re.match(r'^(\w+)\[(\w+)\]$', key)
+        if match:
+            params.setdefault(match.group(1), {})[match.group(2)] = value
+        else:
+            params[key] = value
+    return params
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    jitter = 0.0
+
+    def _reply(self, status, payload):
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self, intent_id):
+        self._reply(404, {'error': {
+            'type': 'invalid_request_error',
+            'code': 'resource_missing',
+            'message': f"No such payment_intent: '{intent_id}'",
+        }})
+
+    def do_GET(self):
+        if self.path == '/__stats__':
+            with lock:
+                return self._reply(200, {**stats, 'intents': len(intents)})
+        match = INTENT_PATH.match(self.path.split('?')[0])
+        if not match or not match.group('id'):
+            return self._not_found('')
+        with lock:
+            stats['retrieve'] += 1
+            intent = intents.get(match.group('id'))
+        if intent is None:
+            return self._not_found(match.group('id'))
+        self._reply(200, intent)
+
+    def do_POST(self):
+        match = INTENT_PATH.match(self.path.split('?')[0])
+        if not match:
+            return self._not_found('')
+        length = int(self.headers.get('Content-Length') or 0)
+        params = parse_form(self.rfile.read(length).decode())
+        params.pop('automatic_payment_methods', None)
+
+        with lock:
+            if match.group('id') is None:
+                stats['create'] += 1
+                intent_id = f"pi_stub_{uuid.uuid4().hex[:20]}"
+                intent = intents[intent_id] = {
+                    'id': intent_id,
+                    'object': 'payment_intent',
+                    'client_secret': f"{intent_id}_secret_{uuid.uuid4().hex[:12]}",
+                    'status': 'requires_payment_method',
+                    'amount': int(params.pop('amount', 0)),
+                    'currency': params.pop('currency', 'gnf'),
+                    'metadata': params.pop('metadata', {}),
+                    'created': int(time.time()),
+                }
+            else:
+                stats['modify'] += 1
+                intent = intents.get(match.group('id'))
+                if intent is None:
+                    return self._not_found(match.group('id'))
+                if 'amount' in params:
+                    intent['amount'] = int(params.pop('amount'))
+                intent['metadata'].update(params.pop('metadata', {}))
+                intent.update(params)
+            payload = dict(intent)
+        self._reply(200, payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=12111)
+    parser.add_argument('--latency-ms', type=float, default=200, help='latence simulée par appel')
+    parser.add_argument('--jitter-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency_ms / 1000
+    StubHandler.jitter = args.jitter_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), StubHandler)
+    print(f"💳 Serveur de paiement factice sur http://127.0.0.1:{args.port} (latence {args.latency_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
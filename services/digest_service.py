@@ -0,0 +1,198 @@
+"""
+Résumés des alertes stock bas et nouvelles commandes.
+
+Selon sa préférence (Utilisateur.notification_digest), un producteur reçoit ces
+alertes à l'unité ou regroupées : l'événement est alors stocké (DigestEvent)
+avec l'échéance de son résumé, alignée sur la fenêtre (toutes les
+NOTIFICATION_DIGEST_WINDOW_MINUTES minutes, ou chaque jour à
+NOTIFICATION_DIGEST_DAILY_HOUR heure locale). La tâche périodique
+`flush_notification_digests` envoie, pour chaque (utilisateur, type) échu, UNE
+notification et UN email qui reprennent tous les événements de la fenêtre.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.utilisateur.models import DigestEvent, Utilisateur
+from .email_service import EmailService
+
+logger = logging.getLogger(__name__)
+
+WINDOW_MINUTES = getattr(settings, 'NOTIFICATION_DIGEST_WINDOW_MINUTES', 60)
+DAILY_HOUR = getattr(settings, 'NOTIFICATION_DIGEST_DAILY_HOUR', 7)
+FLUSH_BATCH_SIZE = 500
+PREVIEW_ITEMS = 5
+
+Frequency = Utilisateur.DigestFrequency
+
+
+def digest_due_at(frequency: str, now=None) -> datetime:
+    """Échéance du résumé en cours : fin de la fenêtre, ou prochain envoi quotidien"""
+    now = now or timezone.now()
+    if frequency == Frequency.DAILY:
+        local = timezone.localtime(now)
+        due = local.replace(hour=DAILY_HOUR, minute=0, second=0, microsecond=0)
+        return due if due > local else due + timedelta(days=1)
+    window = WINDOW_MINUTES * 60
+    return datetime.fromtimestamp((int(now.timestamp()) // window + 1) * window, tz=dt_timezone.utc)
+
+
+def _preview(items: List[str]) -> str:
+    text = ', '.join(items[:PREVIEW_ITEMS])
+    return text + ('…' if len(items) > PREVIEW_ITEMS else '')
+
+
+def _render_stock(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Un produit signalé plusieurs fois : dernier niveau connu
+    products = list({event['product_id']: event for event in events}.values())
+    return {
+        'title': f"⚠️ Stock faible sur {len(products)} produit(s)",
+        'message': "Sous le seuil d'alerte : " + _preview([f"{p['name']} ({p['stock']})" for p in products]),
+        'lines': [f"{p['name']} : {p['stock']} unité(s) en stock (seuil {p['threshold']})" for p in products],
+        'related_product_id': products[0]['product_id'] if len(products) == 1 else None,
+    }
+
+
+def _render_orders(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    total = sum(float(event['total_amount']) for event in events)
+    return {
+        'title': f"📦 {len(events)} nouvelle(s) commande(s)",
+        'message': f"Montant total : {total:.2f}€ — " + _preview([f"#{event['order_number']}" for event in events]),
+        'lines': [
+            f"#{event['order_number']} : {event['products']} produit(s), {float(event['total_amount']):.2f}€"
+            for event in events
+        ],
+        'related_order_id': events[0]['order_id'] if len(events) == 1 else None,
+    }
+
+
+RENDERERS = {
+    'STOCK': _render_stock,
+    'ORDER': _render_orders,
+}
+
+
+class DigestService:
+    """Mise en attente et envoi groupé des alertes"""
+
+    @staticmethod
+    def defers(user) -> bool:
+        """L'utilisateur reçoit-il ces alertes en résumé ?"""
+        return getattr(user, 'notification_digest', Frequency.IMMEDIATE) != Frequency.IMMEDIATE
+
+    @staticmethod
+    def stock_event(product, threshold: int) -> Dict[str, Any]:
+        return {
+            'product_id': product.id,
+            'name': product.name,
+            'stock': str(product.stock),
+            'threshold': threshold,
+        }
+
+    @staticmethod
+    def order_event(order, products_count: int, total_amount) -> Dict[str, Any]:
+        return {
+            'order_id': order.id,
+            'order_number': order.order_number,
+            'products': products_count,
+            'total_amount': str(total_amount),
+        }
+
+    @staticmethod
+    def enqueue_many(events: Iterable[Tuple[Any, str, Dict[str, Any]]]) -> int:
+        """Met en attente [(utilisateur, type, données)] : un seul INSERT"""
+        now = timezone.now()
+        rows = [
+            DigestEvent(user_id=user.id, kind=kind, data=data, due_at=digest_due_at(user.notification_digest, now))
+            for user, kind, data in events
+        ]
+        if rows:
+            DigestEvent.objects.bulk_create(rows)
+        return len(rows)
+
+    @classmethod
+    def flush(cls, now=None, batch_size: int = FLUSH_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Envoie les résumés échus : par lot de (utilisateur, type), événements
+        verrouillés (SKIP LOCKED : plusieurs workers possibles), notifications en
+        un bulk_create, événements supprimés ; emails après commit.
+        """
+        from .notification_service import NotificationService
+
+        now = now or timezone.now()
+        totals = {'digests': 0, 'events': 0, 'emails': 0}
+
+        while True:
+            groups = set(
+                DigestEvent.objects.filter(due_at__lte=now)
+                .values_list('user_id', 'kind').distinct()[:batch_size]
+            )
+            if not groups:
+                break
+
+            with transaction.atomic():
+                events = [
+                    event for event in DigestEvent.objects.select_for_update(skip_locked=True, of=('self',))
+                    .filter(
+                        due_at__lte=now,
+                        user_id__in={user_id for user_id, _ in groups},
+                        kind__in={kind for _, kind in groups},
+                    )
+                    .select_related('user')
+                    .order_by('id')
+                    if (event.user_id, event.kind) in groups
+                ]
+                if not events:
+                    break  # lot déjà pris par un autre worker
+
+                grouped = defaultdict(list)
+                for event in events:
+                    grouped[(event.user, event.kind)].append(event.data)
+
+                digests = [
+                    (user, kind, RENDERERS[kind](items), len(items))
+                    for (user, kind), items in grouped.items()
+                ]
+                NotificationService.create_notifications_bulk(
+                    {
+                        'user_id': user.id,
+                        'title': digest['title'],
+                        'message': digest['message'],
+                        'notification_type': kind,
+                        'related_order_id': digest.get('related_order_id'),
+                        'related_product_id': digest.get('related_product_id'),
+                        'priority': 2,
+                    }
+                    for user, kind, digest, _ in digests
+                )
+                DigestEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+
+            # Hors transaction : aucun verrou tenu pendant les envois SMTP
+            for user, kind, digest, count in digests:
+                if user.email and EmailService.send_template_email(
+                    recipient_email=user.email,
+                    subject=digest['title'],
+                    template_name='notification_digest',
+                    context={
+                        'user': user,
+                        'title': digest['title'],
+                        'lines': digest['lines'],
+                        'count': count,
+                        'frequency': user.get_notification_digest_display(),
+                    }
+                ):
+                    totals['emails'] += 1
+            totals['digests'] += len(digests)
+            totals['events'] += len(events)
+
+        if totals['digests']:
+            logger.info(
+                f"📬 {totals['digests']} résumé(s) envoyé(s) pour {totals['events']} événement(s), "
+                f"{totals['emails']} email(s)"
+            )
+        return totals
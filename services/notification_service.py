@@ -1,19 +1,73 @@
+import heapq
 import logging
-from typing import Optional, List, Dict, Any
-from django.db import transaction
-from django.db.models import Q
+from collections import Counter
+from datetime import timezone as dt_timezone
+from itertools import islice
+from typing import Optional, List, Dict, Any, Iterable, NamedTuple, Tuple
+from django.db import connection, transaction
+from django.db.models import Count, Q, QuerySet
 from django.utils import timezone
 from django.core.cache import cache
 from django.contrib.auth import get_user_model
 
-from apps.utilisateur.models import Notification
+from apps.utilisateur.models import BroadcastNotification, Notification
+from apps.utilisateur.partitions import NotificationPartitions, is_partitioned
 from apps.orders.models import Order
+from apps.orders.tracking import OrderStatusFeed
 from apps.products.models import Product
+from utils.cache_versions import get_version
+from utils.redis_client import RedisError, get_redis, redis_key
+from .digest_service import DigestService
 from .email_service import EmailService
+from .realtime_service import RealtimeService
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+# Compteurs de non lues : maintenus par INCR / DECR, recalés par la tâche horaire
+UNREAD_COUNT_TIMEOUT = 86400
+
+# Création en masse : notifications par bulk_create / compteurs par appel de script
+BULK_BATCH_SIZE = 1000
+
+# Fil des notifications : taille de page et origine des curseurs de keyset
+FEED_PAGE_SIZE = 20
+FEED_EPOCH = timezone.datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+
+# Annonces actives, en cache sous la version 'broadcast' (changée à chaque écriture)
+BROADCAST_CACHE_TIMEOUT = 300
+
+# INCRBY sur chaque clé existante seulement : un compteur absent sera recalculé
+INCR_IF_EXISTS_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('INCRBY', key, ARGV[i])
+    end
+end
+return #KEYS
+"""
+
+
+def encode_feed_cursor(notification) -> str:
+    """Curseur de keyset : (created_at, id) de la dernière notification d'une page"""
+    delta = notification.created_at - FEED_EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return f"{micros}_{notification.id}"
+
+
+def decode_feed_cursor(cursor: Optional[str]):
+    """(created_at, id) ou None si le curseur est absent / invalide (première page)"""
+    try:
+        micros, notification_id = (int(part) for part in cursor.split('_'))
+    except (AttributeError, ValueError):
+        return None
+    return FEED_EPOCH + timezone.timedelta(microseconds=micros), notification_id
+
+
+class FeedPage(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+
 
 class NotificationService:
     """Service centralisé de notifications in-app et emails"""
@@ -31,7 +85,56 @@ class NotificationService:
     }
     
     @staticmethod
+    def unread_cache_key(user_id: int) -> str:
+        return f"unread_notifications_{user_id}"
+    
+    @classmethod
+    def adjust_unread_counts(cls, deltas: Dict[int, int]) -> None:
+        """
+        Applique {user_id: delta} aux compteurs de non lues (INCR / DECR atomiques).
+        Un compteur absent n'est pas créé : il sera recalculé à la prochaine lecture.
+        Avec Redis, un seul pipeline quel que soit le nombre d'utilisateurs.
+        """
+        deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        
+        client = get_redis()
+        if client is not None:
+            try:
+                script = client.register_script(INCR_IF_EXISTS_SCRIPT)
+                items = list(deltas.items())
+                pipe = client.pipeline(transaction=False)
+                for start in range(0, len(items), BULK_BATCH_SIZE):
+                    chunk = items[start:start + BULK_BATCH_SIZE]
+                    # Clés au format du cache (préfixe:version:clé) : celles posées par cache.set
+                    script(
+                        keys=[redis_key(cls.unread_cache_key(user_id)) for user_id, _ in chunk],
+                        args=[delta for _, delta in chunk],
+                        client=pipe,
+                    )
+                pipe.execute()
+            except RedisError as e:
+                # Compteurs faux jusqu'à la prochaine réconciliation
+                logger.warning(f"⚠️ {len(deltas)} compteur(s) non lues non ajusté(s) : {e}")
+            return
+        
+        for user_id, delta in deltas.items():
+            try:
+                cache.incr(cls.unread_cache_key(user_id), delta)
+            except ValueError:
+                pass  # Pas de compteur en cache
+            except Exception as e:
+                logger.warning(f"⚠️ Compteur non lues user {user_id} non ajusté : {e}")
+    
+    @classmethod
+    def _adjust_unread_on_commit(cls, deltas: Dict[int, int]) -> None:
+        """Ajuste les compteurs une fois l'écriture validée (rien si rollback)"""
+        transaction.on_commit(lambda: cls.adjust_unread_counts(deltas))
+    
+    @classmethod
     def create_notification(
+        cls,
         user_id: int,
         title: str,
         message: str,
@@ -57,9 +160,9 @@ class NotificationService:
                     expires_at=expires_at or (timezone.now() + timezone.timedelta(days=30))
                 )
                 
-                # Mettre à jour le cache du nombre de notifications non lues
-                cache_key = f"unread_notifications_{user_id}"
-                cache.delete(cache_key)
+                # Compteur de non lues : +1 (INCR), sans recompter
+                cls._adjust_unread_on_commit({user_id: 1})
+                RealtimeService.notifications_created([notification])
                 
                 logger.info(f"📨 Notification créée pour user {user_id} : {title}")
                 return notification
@@ -68,26 +171,95 @@ class NotificationService:
             logger.error(f"❌ Erreur création notification user {user_id} : {e}")
             return None
     
-    @staticmethod
-    def get_unread_count(user_id: int) -> int:
+    @classmethod
+    def create_notifications_bulk(
+        cls,
+        specs: Iterable[Dict[str, Any]],
+        batch_size: int = BULK_BATCH_SIZE
+    ) -> int:
+        """
+        Crée des notifications en masse. `specs` : dicts aux mêmes clés que
+        create_notification, en liste ou en générateur (consommé lot par lot,
+        jamais chargé entièrement). Un bulk_create et un ajustement groupé des
+        compteurs par lot ; un lot en échec n'annule pas les précédents.
+        Retourne le nombre de notifications créées.
+        """
+        specs = iter(specs)
+        default_expires_at = timezone.now() + timezone.timedelta(days=30)
+        created = 0
+        
+        while True:
+            chunk = list(islice(specs, batch_size))
+            if not chunk:
+                break
+            
+            notifications = [
+                Notification(
+                    user_id=spec['user_id'],
+                    title=spec['title'],
+                    message=spec['message'],
+                    type=spec.get('notification_type', 'INFO'),
+                    priority=spec.get('priority', 1),
+                    related_order_id=spec.get('related_order_id'),
+                    related_product_id=spec.get('related_product_id'),
+                    expires_at=spec.get('expires_at') or default_expires_at
+                )
+                for spec in chunk
+            ]
+            with transaction.atomic():
+                Notification.objects.bulk_create(notifications)
+                cls._adjust_unread_on_commit(Counter(n.user_id for n in notifications))
+                RealtimeService.notifications_created(notifications)
+            created += len(notifications)
+        
+        if created:
+            logger.info(f"📨 {created} notifications créées en masse")
+        return created
+    
+    @classmethod
+    def notify_users(
+        cls,
+        users,
+        title: str,
+        message: str,
+        batch_size: int = BULK_BATCH_SIZE,
+        **fields
+    ) -> int:
+        """
+        Même notification pour toute une audience : queryset d'utilisateurs
+        (ids lus en flux par un curseur serveur) ou itérable d'utilisateurs / d'ids.
+        `fields` : notification_type, priority, related_order_id, ...
+        """
+        if isinstance(users, QuerySet):
+            user_ids = users.values_list('id', flat=True).iterator(chunk_size=batch_size)
+        else:
+            user_ids = (getattr(user, 'id', user) for user in users)
+        
+        return cls.create_notifications_bulk(
+            ({'user_id': user_id, 'title': title, 'message': message, **fields} for user_id in user_ids),
+            batch_size=batch_size
+        )
+    
+    @classmethod
+    def get_unread_count(cls, user_id: int) -> int:
         """
-        Récupère le nombre de notifications non lues (avec cache)
+        Récupère le nombre de notifications non lues (compteur en cache)
         """
-        cache_key = f"unread_notifications_{user_id}"
+        cache_key = cls.unread_cache_key(user_id)
         count = cache.get(cache_key)
         
         if count is None:
             count = Notification.objects.filter(
                 user_id=user_id,
-                is_read=False,
-                expires_at__gte=timezone.now()
+                is_read=False
             ).count()
-            cache.set(cache_key, count, timeout=300)  # Cache 5 minutes
+            # add : n'écrase pas un compteur créé entre-temps
+            cache.add(cache_key, count, timeout=UNREAD_COUNT_TIMEOUT)
         
-        return count
+        return max(count, 0)
     
-    @staticmethod
-    def mark_as_read(notification_id: int, user_id: int) -> bool:
+    @classmethod
+    def mark_as_read(cls, notification_id: int, user_id: int) -> bool:
         """
         Marque une notification comme lue
         """
@@ -102,9 +274,7 @@ class NotificationService:
             )
             
             if updated:
-                # Mettre à jour le cache
-                cache_key = f"unread_notifications_{user_id}"
-                cache.delete(cache_key)
+                cls._adjust_unread_on_commit({user_id: -updated})
                 logger.debug(f"Notification {notification_id} marquée comme lue")
                 return True
             return False
@@ -113,24 +283,44 @@ class NotificationService:
             logger.error(f"Erreur marquer notification lue {notification_id} : {e}")
             return False
     
-    @staticmethod
-    def mark_all_as_read(user_id: int) -> int:
+    @classmethod
+    def mark_many_as_read(cls, user_id: int, notification_ids: Iterable[int]) -> int:
+        """
+        Marque comme lues les notifications `notification_ids` (celles affichées)
+        de l'utilisateur : un seul UPDATE limité à ces ids, via l'index des non lues
+        """
+        notification_ids = [int(notification_id) for notification_id in notification_ids]
+        if not notification_ids:
+            return 0
+        
+        updated = Notification.objects.filter(
+            user_id=user_id,
+            is_read=False,
+            id__in=notification_ids
+        ).update(
+            is_read=True,
+            read_at=timezone.now()
+        )
+        cls._adjust_unread_on_commit({user_id: -updated})
+        return updated
+    
+    @classmethod
+    def mark_all_as_read(cls, user_id: int) -> int:
         """
         Marque toutes les notifications comme lues
         """
         try:
             count = Notification.objects.filter(
                 user_id=user_id,
-                is_read=False,
-                expires_at__gte=timezone.now()
+                is_read=False
             ).update(
                 is_read=True,
                 read_at=timezone.now()
             )
             
-            # Mettre à jour le cache
-            cache_key = f"unread_notifications_{user_id}"
-            cache.delete(cache_key)
+            # DECR du nombre réellement passé à lu : une notification créée
+            # pendant ce temps reste comptée
+            cls._adjust_unread_on_commit({user_id: -count})
             
             logger.info(f"📭 {count} notifications marquées comme lues pour user {user_id}")
             return count
@@ -139,17 +329,25 @@ class NotificationService:
             logger.error(f"Erreur marquer toutes notifications lues user {user_id} : {e}")
             return 0
     
-    @staticmethod
-    def clean_old_notifications(days_old: int = 90) -> int:
+    @classmethod
+    def clean_old_notifications(cls, days_old: int = 90) -> int:
         """
-        Nettoie les notifications expirées
+        Nettoie les notifications anciennes ou expirées. Table partitionnée
+        (PostgreSQL) : suppression des partitions mensuelles échues, sans DELETE
+        ligne à ligne ; les notifications expirées partent avec leur mois.
         """
         try:
-            cutoff_date = timezone.now() - timezone.timedelta(days=days_old)
-            deleted_count, _ = Notification.objects.filter(
-                created_at__lt=cutoff_date
-            ).delete()
+            now = timezone.now()
+            cutoff_date = now - timezone.timedelta(days=days_old)
+            
+            if is_partitioned():
+                deleted_count = NotificationPartitions.drop_expired(days_old, now=now)
+            else:
+                deleted_count = cls._delete_old_rows(cutoff_date, now)
             
+            deleted_count += BroadcastNotification.objects.filter(
+                Q(created_at__lt=cutoff_date) | Q(expires_at__lt=now)
+            ).delete()[0]
             logger.info(f"🧹 {deleted_count} anciennes notifications nettoyées")
             return deleted_count
             
@@ -157,53 +355,253 @@ class NotificationService:
             logger.error(f"Erreur nettoyage notifications : {e}")
             return 0
     
+    @classmethod
+    def _delete_old_rows(cls, cutoff_date, now) -> int:
+        """Table non partitionnée : DELETE ... RETURNING et ajustement des compteurs"""
+        table = Notification._meta.db_table
+        # Les non lues supprimées, par utilisateur, dans la même instruction que la suppression
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH deleted AS ("
+                f"  DELETE FROM {table} WHERE created_at < %s OR expires_at < %s"
+                f"  RETURNING user_id, is_read"
+                f") "
+                f"SELECT user_id, COUNT(*), COUNT(*) FILTER (WHERE NOT is_read) "
+                f"FROM deleted GROUP BY user_id",
+                [cutoff_date, now],
+            )
+            rows = cursor.fetchall()
+            cls._adjust_unread_on_commit({user_id: -unread for user_id, _, unread in rows})
+        return sum(n for _, n, _ in rows)
+    
+    @staticmethod
+    def reconcile_unread_counts(batch_size: int = 1000) -> int:
+        """
+        Recale les compteurs de tous les utilisateurs actifs : un seul GROUP BY
+        user_id puis écriture groupée (pipeline Redis). Retourne le nombre de compteurs écrits.
+        """
+        counts = (
+            User.objects.filter(is_active=True)
+            .annotate(unread=Count('notifications', filter=Q(notifications__is_read=False)))
+            .values_list('id', 'unread')
+            .iterator(chunk_size=batch_size)
+        )
+        written = 0
+        batch = {}
+        for user_id, unread in counts:
+            batch[NotificationService.unread_cache_key(user_id)] = unread
+            if len(batch) >= batch_size:
+                cache.set_many(batch, timeout=UNREAD_COUNT_TIMEOUT)
+                written += len(batch)
+                batch = {}
+        if batch:
+            cache.set_many(batch, timeout=UNREAD_COUNT_TIMEOUT)
+            written += len(batch)
+        return written
+    
+    # Annonces (fan-out à la lecture)
+    @staticmethod
+    def broadcast(
+        title: str,
+        message: str,
+        roles: Optional[List[str]] = None,
+        user_ids: Optional[List[int]] = None,
+        notification_type: str = 'INFO',
+        priority: int = 3,
+        expires_at: Optional[timezone.datetime] = None
+    ) -> BroadcastNotification:
+        """
+        Publie une annonce pour une audience (rôles et / ou ids, vide : tout le
+        monde) : une seule ligne quel que soit le nombre de destinataires
+        """
+        broadcast = BroadcastNotification.objects.create(
+            title=title,
+            message=message,
+            roles=list(roles or []),
+            user_ids=[int(user_id) for user_id in user_ids or []],
+            type=notification_type,
+            priority=priority,
+            expires_at=expires_at
+        )
+        RealtimeService.broadcast_created(broadcast)
+        logger.info(f"📢 Annonce publiée : {title}")
+        return broadcast
+    
+    @staticmethod
+    def active_broadcasts() -> List[BroadcastNotification]:
+        """
+        Annonces non expirées, plus récentes d'abord (en cache, invalidé par
+        la version 'broadcast' à chaque écriture)
+        """
+        cache_key = f"broadcasts:active:{get_version('broadcast')}"
+        broadcasts = cache.get(cache_key)
+        now = timezone.now()
+        
+        if broadcasts is None:
+            broadcasts = list(
+                BroadcastNotification.objects.filter(
+                    Q(expires_at__isnull=True) | Q(expires_at__gt=now)
+                )
+            )
+            cache.set(cache_key, broadcasts, timeout=BROADCAST_CACHE_TIMEOUT)
+        
+        return [b for b in broadcasts if b.expires_at is None or b.expires_at > now]
+    
+    @classmethod
+    def broadcasts_for(cls, user) -> List[BroadcastNotification]:
+        """
+        Annonces applicables à `user`, avec `is_read` : lue si publiée avant son
+        filigrane de lecture (à défaut, sa date d'inscription)
+        """
+        watermark = user.broadcasts_read_at or user.date_joined
+        broadcasts = []
+        for broadcast in cls.active_broadcasts():
+            if broadcast.targets(user):
+                broadcast.is_read = broadcast.created_at <= watermark
+                broadcasts.append(broadcast)
+        return broadcasts
+    
+    @classmethod
+    def get_total_unread_count(cls, user) -> int:
+        """
+        Non lues affichées : compteur des notifications personnelles + annonces
+        applicables non lues (calculées en mémoire, sans requête)
+        """
+        unread_broadcasts = sum(1 for b in cls.broadcasts_for(user) if not b.is_read)
+        return cls.get_unread_count(user.id) + unread_broadcasts
+    
+    @classmethod
+    def get_feed_page(cls, user, cursor: Optional[str] = None, limit: int = FEED_PAGE_SIZE) -> FeedPage:
+        """
+        Une page du fil de `user` : notifications personnelles en keyset
+        (created_at, id) < curseur, lues sur l'index (user, -created_at, -id) sans
+        OFFSET, et annonces applicables de la même tranche de dates fusionnées.
+        Coût indépendant de la profondeur de la page.
+        """
+        notifications = Notification.objects.filter(user=user).select_related(
+            'related_order', 'related_product'
+        ).order_by('-created_at', '-id')
+        
+        position = decode_feed_cursor(cursor)
+        if position is not None:
+            created_at, notification_id = position
+            # created_at <= borne : condition d'index ; les ex aequo sont départagés par id
+            notifications = notifications.filter(created_at__lte=created_at).exclude(
+                created_at=created_at, id__gte=notification_id
+            )
+        
+        rows = list(notifications[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        upper = position[0] if position else None
+        lower = rows[-1].created_at if has_more else None
+        broadcasts = [
+            b for b in cls.broadcasts_for(user)
+            if (upper is None or b.created_at <= upper) and (lower is None or b.created_at > lower)
+        ]
+        items = list(heapq.merge(rows, broadcasts, key=lambda n: n.created_at, reverse=True))
+        
+        return FeedPage(items, encode_feed_cursor(rows[-1]) if has_more else None)
+    
+    @classmethod
+    def mark_broadcasts_as_read(cls, user, until: Optional[timezone.datetime] = None) -> int:
+        """
+        Avance le filigrane de lecture des annonces jusqu'à `until` (maintenant
+        par défaut) : toutes les annonces antérieures deviennent lues.
+        Retourne le nombre d'annonces passées à lues.
+        """
+        until = until or timezone.now()
+        newly_read = sum(
+            1 for b in cls.broadcasts_for(user)
+            if not b.is_read and b.created_at <= until
+        )
+        # Le filigrane ne recule jamais
+        User.objects.filter(pk=user.pk).filter(
+            Q(broadcasts_read_at__isnull=True) | Q(broadcasts_read_at__lt=until)
+        ).update(broadcasts_read_at=until)
+        if user.broadcasts_read_at is None or user.broadcasts_read_at < until:
+            user.broadcasts_read_at = until
+        return newly_read
+    
     # Méthodes métier
     @classmethod
     def notify_new_order(cls, order: Order) -> Dict[str, Any]:
         """
         Notifie les producteurs d'une nouvelle commande
+        (à l'unité, ou dans leur prochain résumé selon leur préférence)
         Retourne le nombre de notifications créées
         """
         if not order.items.exists():
             return {'notifications': 0, 'emails': 0}
         
-        notifications_created = 0
         emails_sent = 0
         
         # Grouper par producteur
         producers_dict = {}
-        for item in order.items.all():
+        for item in order.items.select_related('product__producer__user'):
             if hasattr(item.product, 'producer') and item.product.producer:
                 producer_user = item.product.producer.user
                 if producer_user.id not in producers_dict:
                     producers_dict[producer_user.id] = {
                         'user': producer_user,
+                        'producer_id': item.product.producer_id,
                         'products': [],
                         'total_amount': 0
                     }
                 producers_dict[producer_user.id]['products'].append(item.product)
                 producers_dict[producer_user.id]['total_amount'] += item.quantity * item.unit_price
         
-        # Créer les notifications et envoyer les emails
-        for producer_data in producers_dict.values():
-            producer_user = producer_data['user']
-            products = producer_data['products']
-            total = producer_data['total_amount']
-            
-            # Notification in-app
-            notification = cls.create_notification(
-                user_id=producer_user.id,
-                title=f"📦 Nouvelle commande #{order.order_number}",
-                message=f"Vous avez reçu une nouvelle commande pour {len(products)} produit(s). Montant : {total:.2f}€",
-                notification_type='ORDER',
-                related_order_id=order.id,
-                priority=2
+        # Producteurs en mode résumé : la commande attend le prochain envoi groupé
+        digested = DigestService.enqueue_many(
+            (
+                producer_data['user'],
+                'ORDER',
+                DigestService.order_event(order, len(producer_data['products']), producer_data['total_amount'])
             )
-            
-            if notification:
-                notifications_created += 1
-            
-            # Email au producteur
+            for producer_data in producers_dict.values()
+            if DigestService.defers(producer_data['user'])
+        )
+        immediate = [
+            producer_data for producer_data in producers_dict.values()
+            if not DigestService.defers(producer_data['user'])
+        ]
+        
+        # Notifications in-app : producteurs et client en un seul bulk_create
+        specs = [
+            {
+                'user_id': producer_data['user'].id,
+                'title': f"📦 Nouvelle commande #{order.order_number}",
+                'message': (
+                    f"Vous avez reçu une nouvelle commande pour {len(producer_data['products'])} produit(s). "
+                    f"Montant : {producer_data['total_amount']:.2f}€"
+                ),
+                'notification_type': 'ORDER',
+                'related_order_id': order.id,
+                'priority': 2
+            }
+            for producer_data in immediate
+        ]
+        specs.append({
+            'user_id': order.client_id,
+            'title': f"✅ Commande #{order.order_number} confirmée",
+            'message': f"Votre commande a été confirmée. Montant total : {order.total_amount:.2f}€",
+            'notification_type': 'ORDER',
+            'related_order_id': order.id,
+            'priority': 1
+        })
+        cls.create_notifications_bulk(specs)
+        notifications_created = len(immediate)
+        
+        # Dashboards producteurs ouverts : nouvelle commande en direct
+        RealtimeService.order_created(
+            order,
+            {producer_data['producer_id']: producer_data for producer_data in producers_dict.values()}
+        )
+        
+        # Emails aux producteurs
+        for producer_data in immediate:
+            producer_user = producer_data['user']
             email_sent = EmailService.send_template_email(
                 recipient_email=producer_user.email,
                 subject=f"📦 Nouvelle commande #{order.order_number}",
@@ -211,8 +609,8 @@ class NotificationService:
                 context={
                     'producer': producer_user,
                     'order': order,
-                    'products': products,
-                    'total_amount': total,
+                    'products': producer_data['products'],
+                    'total_amount': producer_data['total_amount'],
                     'order_date': order.created_at
                 }
             )
@@ -220,21 +618,15 @@ class NotificationService:
             if email_sent:
                 emails_sent += 1
         
-        # Notification au client
-        cls.create_notification(
-            user_id=order.client.id,
-            title=f"✅ Commande #{order.order_number} confirmée",
-            message=f"Votre commande a été confirmée. Montant total : {order.total_amount:.2f}€",
-            notification_type='ORDER',
-            related_order_id=order.id,
-            priority=1
+        logger.info(
+            f"📦 Commande #{order.order_number} : {notifications_created} notifications, "
+            f"{emails_sent} emails, {digested} en résumé"
         )
-        
-        logger.info(f"📦 Commande #{order.order_number} : {notifications_created} notifications, {emails_sent} emails")
         return {
             'notifications': notifications_created,
             'emails': emails_sent,
-            'producers': len(producers_dict)
+            'producers': len(producers_dict),
+            'digested': digested
         }
     
     @classmethod
@@ -253,6 +645,12 @@ class NotificationService:
         
         producer_user = product.producer.user
         
+        # Mode résumé : l'alerte attend le prochain envoi groupé du producteur
+        if DigestService.defers(producer_user):
+            DigestService.enqueue_many([(producer_user, 'STOCK', DigestService.stock_event(product, threshold))])
+            cache.set(cache_key, True, timeout=86400)
+            return True
+        
         # Notification in-app
         notification = cls.create_notification(
             user_id=producer_user.id,
@@ -277,47 +675,76 @@ class NotificationService:
         
         return False
     
+    ORDER_STATUS_MESSAGES = {
+        'PROCESSING': 'en cours de traitement',
+        'SHIPPED': 'expédiée',
+        'DELIVERED': 'livrée',
+        'CANCELLED': 'annulée'
+    }
+    
     @classmethod
     def notify_order_status_update(cls, order: Order, old_status: str, new_status: str) -> bool:
         """
-        Notifie le client d'un changement de statut
+        Notifie le client d'un changement de statut (et le pousse aux flux de suivi SSE)
         """
-        status_messages = {
-            'PROCESSING': 'en cours de traitement',
-            'SHIPPED': 'expédiée',
-            'DELIVERED': 'livrée',
-            'CANCELLED': 'annulée'
-        }
+        return cls.notify_order_status_updates([(order, old_status)], new_status) > 0
+    
+    @classmethod
+    def notify_order_status_updates(cls, changes: Iterable[Tuple[Order, str]], new_status: str) -> int:
+        """
+        Changements de statut en masse, [(commande, ancien statut)] : transitions
+        publiées aux flux de suivi SSE (un pipeline, après commit), notifications
+        in-app en un bulk_create, email après commit pour les statuts importants.
+        Retourne le nombre de notifications créées.
+        """
+        changes = [(order, old_status) for order, old_status in changes if old_status != new_status]
+        if not changes:
+            return 0
         
-        message = f"Votre commande est maintenant {status_messages.get(new_status, new_status.lower())}."
-        if old_status:
-            message = f"Statut changé de {old_status} à {new_status.lower()}. {message}"
+        OrderStatusFeed.transitions(
+            [(order.id, order.client_id, order.order_number, old_status) for order, old_status in changes],
+            new_status
+        )
         
-        # Notification in-app
-        notification = cls.create_notification(
-            user_id=order.client.id,
-            title=f"🔄 Commande #{order.order_number} mise à jour",
-            message=message,
-            notification_type='ORDER',
-            related_order_id=order.id,
-            priority=1
+        status_message = cls.ORDER_STATUS_MESSAGES.get(new_status, '')
+        
+        def message(old_status):
+            text = f"Votre commande est maintenant {status_message or new_status.lower()}."
+            if old_status:
+                text = f"Statut changé de {old_status} à {new_status.lower()}. {text}"
+            return text
+        
+        # Notifications in-app
+        created = cls.create_notifications_bulk(
+            {
+                'user_id': order.client_id,
+                'title': f"🔄 Commande #{order.order_number} mise à jour",
+                'message': message(old_status),
+                'notification_type': 'ORDER',
+                'related_order_id': order.id,
+                'priority': 1,
+            }
+            for order, old_status in changes
         )
         
-        # Email si statut important
+        # Email si statut important, une fois le changement validé
         if new_status in ['SHIPPED', 'DELIVERED', 'CANCELLED']:
-            EmailService.send_template_email(
-                recipient_email=order.client.email,
-                subject=f"🔄 Mise à jour commande #{order.order_number}",
-                template_name='order_status_update',
-                context={
-                    'order': order,
-                    'old_status': old_status,
-                    'new_status': new_status,
-                    'status_message': status_messages.get(new_status, '')
-                }
-            )
+            def send_emails():
+                for order, old_status in changes:
+                    EmailService.send_template_email(
+                        recipient_email=order.client.email,
+                        subject=f"🔄 Mise à jour commande #{order.order_number}",
+                        template_name='order_status_update',
+                        context={
+                            'order': order,
+                            'old_status': old_status,
+                            'new_status': new_status,
+                            'status_message': status_message
+                        }
+                    )
+            transaction.on_commit(send_emails, robust=True)
         
-        return notification is not None
+        return created
     
     @classmethod
     def notify_payment_success(cls, order: Order) -> bool:
@@ -337,25 +764,20 @@ class NotificationService:
         return notification is not None
     
     @classmethod
-    def notify_system_alert(cls, users: List[User], title: str, message: str) -> int:
+    def notify_system_alert(cls, users, title: str, message: str) -> int:
         """
         Notifie plusieurs utilisateurs d'une alerte système
+        (queryset lu en flux pour les grandes audiences)
         """
-        notifications_created = 0
-        
-        for user in users:
-            notification = cls.create_notification(
-                user_id=user.id,
-                title=f"🔔 {title}",
-                message=message,
-                notification_type='SYSTEM',
-                priority=3  # Haute priorité
-            )
-            
-            if notification:
-                notifications_created += 1
+        notifications_created = cls.notify_users(
+            users,
+            title=f"🔔 {title}",
+            message=message,
+            notification_type='SYSTEM',
+            priority=3  # Haute priorité
+        )
         
-        logger.info(f"🔔 Alerte système envoyée à {notifications_created}/{len(users)} utilisateurs")
+        logger.info(f"🔔 Alerte système envoyée à {notifications_created} utilisateurs")
         return notifications_created
 
 
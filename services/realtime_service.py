@@ -0,0 +1,172 @@
+"""
+Poussée temps réel vers les clients web et mobile (Django Channels).
+
+Chaque connexion WebSocket (apps.utilisateur.consumers.NotificationConsumer)
+rejoint les groupes de son utilisateur, de son rôle, des annonces et, pour un
+producteur, de son profil producteur. Ce service publie dans ces groupes via
+la couche de canaux (Redis en production, mémoire en développement) : le badge
+de notifications et le dashboard se mettent à jour sans rechargement ni polling.
+
+La publication est faite après commit et ne lève jamais : une couche de canaux
+indisponible ne doit pas faire échouer une commande ou une notification.
+"""
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Tuple
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Au-delà, une création en masse n'est pas poussée (vue au prochain chargement)
+REALTIME_FANOUT_LIMIT = getattr(settings, 'REALTIME_FANOUT_LIMIT', 500)
+
+BROADCAST_GROUP = 'broadcasts'
+
+
+def _get_channel_layer():
+    try:
+        from channels.layers import get_channel_layer
+        return get_channel_layer()
+    except Exception as e:
+        logger.warning(f"⚠️ Couche de canaux indisponible : {e}")
+        return None
+
+
+class RealtimeService:
+    """Publication d'événements dans les groupes WebSocket"""
+
+    @staticmethod
+    def user_group(user_id: int) -> str:
+        return f"user_{user_id}"
+
+    @staticmethod
+    def producer_group(producer_id: int) -> str:
+        return f"producer_{producer_id}"
+
+    @staticmethod
+    def role_group(role: str) -> str:
+        return f"role_{role}"
+
+    @classmethod
+    def publish_many(cls, messages: Iterable[Tuple[str, str, Dict[str, Any]]]) -> int:
+        """
+        Publie [(groupe, événement, données)] en une seule boucle d'événements.
+        Retourne le nombre de messages envoyés (0 sans couche de canaux).
+        """
+        messages = list(messages)
+        if not messages:
+            return 0
+        channel_layer = _get_channel_layer()
+        if channel_layer is None:
+            return 0
+
+        async def send_all():
+            for group, event, data in messages:
+                await channel_layer.group_send(group, {'type': 'push.event', 'event': event, 'data': data})
+
+        try:
+            async_to_sync(send_all)()
+        except Exception as e:
+            logger.warning(f"⚠️ {len(messages)} événement(s) temps réel non publié(s) : {e}")
+            return 0
+        return len(messages)
+
+    @classmethod
+    def publish(cls, group: str, event: str, data: Dict[str, Any]) -> int:
+        return cls.publish_many([(group, event, data)])
+
+    @classmethod
+    def publish_on_commit(cls, messages: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        """Publie une fois l'écriture validée (rien si rollback)"""
+        if messages:
+            transaction.on_commit(lambda: cls.publish_many(messages))
+
+    # Événements métier
+    @classmethod
+    def notifications_created(cls, notifications: List[Any]) -> None:
+        """
+        'notification.created' vers chaque destinataire : le badge avance du
+        nombre reçu, la dernière notification s'affiche en toast.
+        """
+        per_user = defaultdict(list)
+        for notification in notifications:
+            per_user[notification.user_id].append(notification)
+        if len(per_user) > REALTIME_FANOUT_LIMIT:
+            logger.info(f"📡 {len(per_user)} destinataires : notifications non poussées en temps réel")
+            return
+
+        cls.publish_on_commit([
+            (
+                cls.user_group(user_id),
+                'notification.created',
+                {
+                    'count': len(items),
+                    'id': items[-1].id,
+                    'title': items[-1].title,
+                    'type': items[-1].type,
+                    'priority': items[-1].priority,
+                },
+            )
+            for user_id, items in per_user.items()
+        ])
+
+    @classmethod
+    def broadcast_created(cls, broadcast) -> None:
+        """'notification.created' pour une annonce, vers les groupes qu'elle cible"""
+        data = {'count': 1, 'id': broadcast.id, 'title': broadcast.title, 'type': broadcast.type,
+                'priority': broadcast.priority, 'broadcast': True}
+        if broadcast.user_ids:
+            groups = [cls.user_group(user_id) for user_id in broadcast.user_ids]
+            if len(groups) > REALTIME_FANOUT_LIMIT:
+                return
+        elif broadcast.roles:
+            groups = [cls.role_group(role) for role in broadcast.roles]
+        else:
+            groups = [BROADCAST_GROUP]
+        cls.publish_on_commit([(group, 'notification.created', data) for group in groups])
+
+    @classmethod
+    def order_created(cls, order, producers: Dict[int, Dict[str, Any]]) -> None:
+        """'order.created' vers chaque producteur concerné ({producer_id: {'products', 'total_amount'}})"""
+        cls.publish_on_commit([
+            (
+                cls.producer_group(producer_id),
+                'order.created',
+                {
+                    'order_id': order.id,
+                    'order_number': order.order_number,
+                    'status': order.status,
+                    'products': len(producer_data['products']),
+                    'total_amount': str(producer_data['total_amount']),
+                },
+            )
+            for producer_id, producer_data in producers.items()
+        ])
+
+    @classmethod
+    def stock_changed(cls, product_ids: Iterable[int]) -> None:
+        """
+        'stock.changed' vers les producteurs des produits, après commit :
+        une requête pour les niveaux de stock, un message par producteur.
+        """
+        product_ids = sorted(set(product_ids))
+        if not product_ids:
+            return
+
+        def publish():
+            from apps.products.models import Product
+
+            per_producer = defaultdict(dict)
+            for product_id, producer_id, stock in Product.objects.filter(
+                pk__in=product_ids
+            ).values_list('pk', 'producer_id', 'stock'):
+                per_producer[producer_id][str(product_id)] = str(stock)
+            cls.publish_many(
+                (cls.producer_group(producer_id), 'stock.changed', {'stock': levels})
+                for producer_id, levels in per_producer.items()
+            )
+
+        transaction.on_commit(publish, robust=True)
@@ -0,0 +1,41 @@
+# tasks/cart_tasks.py
+
+from typing import Dict, Any
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = get_task_logger(__name__)
+
+
+@shared_task
+def flush_hot_carts(batch_size: int = 200) -> Dict[str, Any]:
+    """
+    Écrit en base les paniers chauds (Redis) modifiés depuis le dernier passage.
+    Sans effet si CART_STORAGE n'est pas 'redis'.
+    """
+    from apps.orders.cart_store import HotCartStore
+
+    lock_key = 'lock:flush_hot_carts'
+    if not cache.add(lock_key, True, timeout=300):
+        return {'status': 'skipped', 'reason': 'flush déjà en cours'}
+
+    try:
+        written = HotCartStore.flush(batch_size=batch_size)
+        if written:
+            logger.info(f"🛒 {written} panier(s) chaud(s) écrit(s) en base")
+
+        return {
+            'carts_written': written,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Erreur écriture des paniers chauds : {e}")
+        return {
+            'error': str(e),
+            'status': 'failed'
+        }
+    finally:
+        cache.delete(lock_key)
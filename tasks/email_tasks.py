@@ -193,6 +193,7 @@ def send_daily_sales_report() -> Dict[str, Any]:
     
     reports_sent = 0
     reports_failed = 0
+    notified_producers = []
     
     for producer in producers:
         try:
@@ -238,13 +239,7 @@ def send_daily_sales_report() -> Dict[str, Any]:
             
             if success:
                 reports_sent += 1
-                # Notification in-app
-                NotificationService.create_notification(
-                    user_id=producer.id,
-                    title="📊 Rapport quotidien disponible",
-                    message=f"Votre rapport de ventes du {yesterday.strftime('%d/%m/%Y')} a été envoyé par email.",
-                    notification_type='INFO'
-                )
+                notified_producers.append(producer.id)
             else:
                 reports_failed += 1
                 
@@ -252,6 +247,14 @@ def send_daily_sales_report() -> Dict[str, Any]:
             logger.error(f"❌ Erreur rapport producteur {producer.id} : {e}")
             reports_failed += 1
     
+    # Notifications in-app des rapports envoyés, en un seul passage
+    NotificationService.notify_users(
+        notified_producers,
+        title="📊 Rapport quotidien disponible",
+        message=f"Votre rapport de ventes du {yesterday.strftime('%d/%m/%Y')} a été envoyé par email.",
+        notification_type='INFO'
+    )
+    
     logger.info(f"📊 Rapports quotidiens : {reports_sent} envoyés, {reports_failed} échecs")
     
     return {
@@ -278,6 +281,7 @@ def send_welcome_emails_to_new_users() -> Dict[str, Any]:
     ).exclude(email='')
     
     emails_sent = 0
+    welcomed_users = []
     
     for user in new_users:
         try:
@@ -286,17 +290,19 @@ def send_welcome_emails_to_new_users() -> Dict[str, Any]:
             
             if success:
                 emails_sent += 1
-                # Notification in-app
-                NotificationService.create_notification(
-                    user_id=user.id,
-                    title="🎉 Bienvenue sur AgriBusiness !",
-                    message="Merci de nous avoir rejoint. Découvrez toutes nos fonctionnalités.",
-                    notification_type='INFO'
-                )
+                welcomed_users.append(user.id)
                 
         except Exception as e:
             logger.error(f"❌ Erreur email bienvenue user {user.id} : {e}")
     
+    # Notifications in-app de bienvenue, en un seul passage
+    NotificationService.notify_users(
+        welcomed_users,
+        title="🎉 Bienvenue sur AgriBusiness !",
+        message="Merci de nous avoir rejoint. Découvrez toutes nos fonctionnalités.",
+        notification_type='INFO'
+    )
+    
     logger.info(f"👋 Emails bienvenue : {emails_sent}/{new_users.count()} envoyés")
     
     return {
@@ -2,13 +2,12 @@
 
 import logging
 from typing import List, Dict, Any
-from config.celery_app import shared_task
+from celery import shared_task
 from celery.utils.log import get_task_logger
 from django.utils import timezone
 from django.db.models import Q, Count, Sum
 from django.core.cache import cache
 
-from apps.utilisateur.models import Utilisateur, Notification
 from apps.orders.models import Order
 from apps.products.models import Product
 from services.notification_service import NotificationService
@@ -49,20 +48,23 @@ def process_low_stock_alerts(threshold: int = 10) -> Dict[str, Any]:
             if product.producer:
                 producer_products[product.producer.user].append(product)
         
-        # Envoyer les alertes
+        # Notifications groupées : un seul bulk_create pour tous les producteurs
+        NotificationService.create_notifications_bulk(
+            {
+                'user_id': producer_user.id,
+                'title': f"⚠️ Stock faible sur {len(products)} produit(s)",
+                'message': f"{len(products)} de vos produits ont un stock inférieur à {threshold} unités.",
+                'notification_type': 'STOCK',
+                'priority': 2
+            }
+            for producer_user, products in producer_products.items()
+        )
+        
+        # Envoyer les emails
+        from services.email_service import EmailService
         for producer_user, products in producer_products.items():
             try:
-                # Notification groupée
-                NotificationService.create_notification(
-                    user_id=producer_user.id,
-                    title=f"⚠️ Stock faible sur {len(products)} produit(s)",
-                    message=f"{len(products)} de vos produits ont un stock inférieur à {threshold} unités.",
-                    notification_type='STOCK',
-                    priority=2
-                )
-                
                 # Email groupé
-                from services.email_service import EmailService
                 EmailService.send_low_stock_alert(
                     producer=producer_user.producer_profile,
                     products=products
@@ -94,6 +96,104 @@ def process_low_stock_alerts(threshold: int = 10) -> Dict[str, Any]:
         }
 
 
+@shared_task
+def notify_low_stock_transitions(product_ids: List[int], threshold: int = 10) -> Dict[str, Any]:
+    """
+    Alerte les producteurs des produits qui viennent de passer sous le seuil
+    (émis en lot par apps.products.stock.StockService après un checkout).
+    Une notification et un email par producteur, pas par produit ; les
+    producteurs en mode résumé reçoivent les alertes au prochain envoi groupé.
+    """
+    try:
+        from collections import defaultdict
+        from services.digest_service import DigestService
+        from services.email_service import EmailService
+
+        today = timezone.now().date()
+        products = Product.objects.filter(
+            id__in=product_ids,
+            producer__isnull=False,
+            producer__user__is_active=True
+        ).select_related('producer__user')
+
+        producer_products = defaultdict(list)
+        for product in products:
+            # Déjà signalé aujourd'hui (tâche périodique ou checkout précédent)
+            if cache.get(f"low_stock_processed_{product.id}_{today}"):
+                continue
+            producer_products[product.producer].append(product)
+
+        digested = [producer for producer in producer_products if DigestService.defers(producer.user)]
+        DigestService.enqueue_many(
+            (producer.user, 'STOCK', DigestService.stock_event(product, threshold))
+            for producer in digested
+            for product in producer_products[producer]
+        )
+        for producer in digested:
+            for product in producer_products.pop(producer):
+                cache.set(f"low_stock_processed_{product.id}_{today}", True, timeout=86400)
+
+        NotificationService.create_notifications_bulk(
+            {
+                'user_id': producer.user_id,
+                'title': f"⚠️ Stock faible sur {len(items)} produit(s)",
+                'message': f"Sous le seuil de {threshold} unités : {', '.join(product.name for product in items[:5])}",
+                'notification_type': 'STOCK',
+                'priority': 2
+            }
+            for producer, items in producer_products.items()
+        )
+
+        alerts_sent = 0
+        for producer, items in producer_products.items():
+            try:
+                EmailService.send_low_stock_alert(producer=producer, products=items)
+                alerts_sent += 1
+
+                for product in items:
+                    cache.set(f"low_stock_processed_{product.id}_{today}", True, timeout=86400)
+
+            except Exception as e:
+                logger.error(f"❌ Erreur alerte producteur {producer.id} : {e}")
+
+        return {
+            'alerts_sent': alerts_sent,
+            'digested_producers': len(digested),
+            'total_products': len(product_ids),
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Erreur alertes passage stock bas : {e}")
+        return {
+            'error': str(e),
+            'alerts_sent': 0
+        }
+
+
+@shared_task
+def flush_notification_digests() -> Dict[str, Any]:
+    """
+    Envoie les résumés échus : une notification et un email par
+    (utilisateur, type) pour tous les événements de la fenêtre
+    """
+    try:
+        from services.digest_service import DigestService
+
+        result = DigestService.flush()
+        return {
+            **result,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Erreur envoi des résumés : {e}")
+        return {
+            'error': str(e),
+            'digests': 0
+        }
+
+
 @shared_task
 def cleanup_old_notifications(days_to_keep: int = 90) -> Dict[str, Any]:
     """
@@ -118,6 +218,40 @@ def cleanup_old_notifications(days_to_keep: int = 90) -> Dict[str, Any]:
         }
 
 
+@shared_task
+def maintain_notification_partitions(days_to_keep: int = 90, months_ahead: int = 3) -> Dict[str, Any]:
+    """
+    Partitions mensuelles des notifications : crée celles des mois à venir et
+    supprime celles entièrement antérieures à la rétention (via le nettoyage)
+    """
+    try:
+        from apps.utilisateur.partitions import NotificationPartitions, is_partitioned
+        
+        if not is_partitioned():
+            return {
+                'partitions_created': [],
+                'message': 'Table non partitionnée',
+                'timestamp': timezone.now().isoformat()
+            }
+        
+        created = NotificationPartitions.ensure_future(months_ahead=months_ahead)
+        deleted_count = NotificationService.clean_old_notifications(days_to_keep)
+        
+        return {
+            'partitions_created': created,
+            'deleted_count': deleted_count,
+            'days_to_keep': days_to_keep,
+            'timestamp': timezone.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur maintenance partitions notifications : {e}")
+        return {
+            'error': str(e),
+            'status': 'failed'
+        }
+
+
 @shared_task
 def send_system_maintenance_notification(
     title: str,
@@ -126,40 +260,25 @@ def send_system_maintenance_notification(
     user_ids: List[int] = None
 ) -> Dict[str, Any]:
     """
-    Envoie une notification système à des utilisateurs spécifiques
+    Publie une annonce système pour une audience (rôles / ids, vide : tout le
+    monde) : une seule ligne BroadcastNotification, lue par chaque destinataire
+    avec ses notifications personnelles, au lieu d'une ligne par utilisateur
     """
     try:
-        # Construire la queryset
-        users_query = Utilisateur.objects.filter(is_active=True)
-        
-        if user_ids:
-            users_query = users_query.filter(id__in=user_ids)
-        
-        if user_roles:
-            users_query = users_query.filter(role__in=user_roles)
-        
-        users = list(users_query.only('id', 'username'))
-        total_users = len(users)
-        
-        if total_users == 0:
-            return {
-                'notifications_sent': 0,
-                'total_users': 0,
-                'message': 'Aucun utilisateur ciblé'
-            }
-        
-        # Envoyer les notifications
-        notifications_sent = NotificationService.notify_system_alert(
-            users=users,
-            title=title,
-            message=message
+        broadcast = NotificationService.broadcast(
+            title=f"🔔 {title}",
+            message=message,
+            roles=user_roles,
+            user_ids=user_ids,
+            priority=3  # Haute priorité
         )
         
-        logger.info(f"🔔 Notification système envoyée à {notifications_sent}/{total_users} utilisateurs")
+        logger.info(f"🔔 Annonce système #{broadcast.id} publiée : {title}")
         
         return {
-            'notifications_sent': notifications_sent,
-            'total_users': total_users,
+            'broadcast_id': broadcast.id,
+            'user_roles': user_roles or [],
+            'user_ids_count': len(user_ids or []),
             'title': title,
             'sent_at': timezone.now().isoformat()
         }
@@ -175,34 +294,16 @@ def send_system_maintenance_notification(
 @shared_task
 def sync_unread_notifications_cache() -> Dict[str, Any]:
     """
-    Synchronise le cache des notifications non lues
+    Recale les compteurs de notifications non lues (dérive des INCR / DECR)
+    en un seul GROUP BY user_id et une écriture groupée dans le cache
     """
     try:
-        # Récupérer tous les utilisateurs actifs
-        active_users = Utilisateur.objects.filter(
-            is_active=True
-        ).values_list('id', flat=True)
-        
-        cache_updates = 0
-        
-        for user_id in active_users:
-            # Calculer le vrai nombre
-            real_count = Notification.objects.filter(
-                user_id=user_id,
-                is_read=False,
-                expires_at__gte=timezone.now()
-            ).count()
-            
-            # Mettre à jour le cache
-            cache_key = f"unread_notifications_{user_id}"
-            cache.set(cache_key, real_count, timeout=86400)  # 24h
-            cache_updates += 1
+        cache_updates = NotificationService.reconcile_unread_counts()
         
         logger.info(f"🔄 Cache notifications mis à jour pour {cache_updates} utilisateurs")
         
         return {
             'cache_updates': cache_updates,
-            'total_users': len(active_users),
             'synced_at': timezone.now().isoformat()
         }
         
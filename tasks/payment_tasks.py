@@ -0,0 +1,34 @@
+# tasks/payment_tasks.py
+
+from typing import Dict, Any
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from django.utils import timezone
+
+logger = get_task_logger(__name__)
+
+
+@shared_task
+def drain_payment_webhooks(batch_size: int = 100) -> Dict[str, Any]:
+    """
+    Vide la boîte de réception des webhooks de paiement (file 'payments').
+    Déclenchée par l'endpoint après chaque insertion, et toutes les 30 secondes
+    par Celery Beat pour rattraper un déclenchement perdu ou un événement à réessayer.
+    """
+    try:
+        from apps.marketplace.services import PaymentInboxService
+
+        metrics = PaymentInboxService.drain(batch_size=batch_size)
+
+        return {
+            'status': 'completed',
+            **metrics,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Erreur traitement des webhooks de paiement : {e}")
+        return {
+            'error': str(e),
+            'status': 'failed'
+        }
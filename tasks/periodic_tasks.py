@@ -36,6 +36,29 @@ def cleanup_old_tasks():
         return {'error': str(e)}
 
 
+@shared_task
+def warm_marketplace_sections():
+    """
+    Pré-calcule les sections de la page d'accueil (et les fragments "populaires")
+    pour qu'un déploiement à froid ne fasse pas déferler les requêtes sur la base
+    """
+    try:
+        from apps.marketplace.sections import SectionCache
+
+        warmed = SectionCache.warm()
+        if warmed:
+            logger.info(f"🔥 Sections marketplace pré-calculées : {', '.join(warmed)}")
+
+        return {
+            'warmed': warmed,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Erreur pré-calcul des sections : {e}")
+        return {'error': str(e)}
+
+
 @shared_task
 def monitor_system_health():
     """
@@ -6,6 +6,7 @@ from typing import Dict, Any, Optional
 from celery import shared_task
 from celery.utils.log import get_task_logger
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from django.db.models import Sum, Count, F, Q
 from django.core.cache import cache
@@ -89,6 +90,52 @@ def check_and_update_product_statistics() -> Dict[str, Any]:
         }
 
 
+@shared_task
+def flush_product_view_counts() -> Dict[str, Any]:
+    """
+    Écrit en base les vues accumulées dans Redis (write-behind).
+    Un UPDATE groupé par lot au lieu d'un UPDATE par vue.
+    """
+    from apps.products.view_counter import ProductViewCounter, apply_view_counts
+
+    lock_key = 'lock:flush_product_view_counts'
+    if not cache.add(lock_key, True, timeout=300):
+        return {'status': 'skipped', 'reason': 'flush déjà en cours'}
+
+    try:
+        counts, processing_key, local_counts = ProductViewCounter.drain_pending()
+        if not counts:
+            ProductViewCounter.acknowledge(processing_key)
+            return {'products_updated': 0, 'views': 0, 'timestamp': timezone.now().isoformat()}
+
+        try:
+            with transaction.atomic():
+                updated = apply_view_counts(counts)
+                # Lot retiré de Redis avant le commit : jamais compté deux fois
+                ProductViewCounter.acknowledge(processing_key)
+        except Exception:
+            ProductViewCounter.requeue_local(local_counts)
+            raise
+
+        total_views = sum(counts.values())
+        logger.info(f"👁️ {total_views} vues écrites sur {updated} produits")
+
+        return {
+            'products_updated': updated,
+            'views': total_views,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Erreur écriture des vues produits : {e}")
+        return {
+            'error': str(e),
+            'products_updated': 0
+        }
+    finally:
+        cache.delete(lock_key)
+
+
 @shared_task(bind=True, max_retries=3)
 def generate_product_catalog_pdf(self, producer_id: int) -> Dict[str, Any]:
     """
@@ -355,25 +402,25 @@ def check_and_deactivate_out_of_stock_products() -> Dict[str, Any]:
         deactivated_count = out_of_stock_products.count()
         
         if deactivated_count > 0:
+            # Producteurs concernés, lus avant la désactivation (le filtre
+            # is_active=True ne les retrouverait plus ensuite)
+            producers_to_notify = set(
+                out_of_stock_products.filter(producer__isnull=False)
+                .values_list('producer__user_id', flat=True)
+            )
+            
             # Désactiver les produits
             out_of_stock_products.update(is_active=False)
             
             # Notifier les producteurs concernés
-            producers_to_notify = set(
-                product.producer.user 
-                for product in out_of_stock_products 
-                if product.producer
+            NotificationService.notify_users(
+                producers_to_notify,
+                title="⚠️ Produits désactivés",
+                message=f"Certains de vos produits ont été désactivés automatiquement car en rupture de stock depuis plus de 30 jours.",
+                notification_type='WARNING',
+                priority=2
             )
             
-            for producer_user in producers_to_notify:
-                NotificationService.create_notification(
-                    user_id=producer_user.id,
-                    title="⚠️ Produits désactivés",
-                    message=f"Certains de vos produits ont été désactivés automatiquement car en rupture de stock depuis plus de 30 jours.",
-                    notification_type='WARNING',
-                    priority=2
-                )
-            
             logger.warning(f"⚠️ {deactivated_count} produits désactivés (rupture de stock > 30 jours)")
         
         return {
@@ -391,25 +438,67 @@ def check_and_deactivate_out_of_stock_products() -> Dict[str, Any]:
 
 
 @shared_task
-def update_product_recommendations() -> Dict[str, Any]:
+def expire_stock_reservations(batch_size: int = 1000) -> Dict[str, Any]:
     """
-    Met à jour les recommandations de produits basées sur l'historique des achats
+    Libère par lots les réservations de stock échues (paniers abandonnés au
+    paiement) et décrémente Product.reserved_stock en conséquence.
     """
     try:
-        # Logique simple de recommandation
-        # En production, vous pourriez utiliser un algorithme plus sophistiqué
-        
-        # Récupérer les produits fréquemment achetés ensemble
-        # (simplifié pour l'exemple)
-        
+        from apps.orders.reservations import ReservationService
+
+        expired = ReservationService.expire(batch_size=batch_size)
+        if expired:
+            logger.info(f"🔓 {expired} réservation(s) de stock expirée(s)")
+
+        return {
+            'status': 'completed',
+            'expired': expired,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Erreur expiration des réservations : {e}")
+        return {
+            'error': str(e),
+            'status': 'failed'
+        }
+
+
+@shared_task
+def update_product_recommendations(top_k: int = 10, measure: str = 'cosine',
+                                   chunk_size: int = 5000, min_support: int = 2) -> Dict[str, Any]:
+    """
+    Met à jour les recommandations "achetés ensemble" à partir de l'historique des achats.
+    Matrice de co-occurrence creuse construite par blocs de commandes, normalisée
+    (cosinus ou lift), puis les top-K voisins de chaque produit sont enregistrés.
+    """
+    try:
+        from apps.products.models import ProductRecommendation
+        from apps.products.recommendations import (
+            copurchase_matrix, normalize_cooccurrence, store_neighbours, top_k_neighbours
+        )
+
+        started = timezone.now()
         logger.info("🔄 Mise à jour des recommandations de produits")
-        
-        # Ici, vous implémenteriez votre logique de recommandation
-        # Par exemple, calculer les associations de produits
-        
+
+        product_ids, cooc, n_orders = copurchase_matrix(chunk_size=chunk_size)
+        scores = normalize_cooccurrence(cooc, n_orders, measure=measure, min_support=min_support)
+        stored = store_neighbours(
+            ProductRecommendation.Source.COPURCHASE,
+            top_k_neighbours(product_ids, scores, top_k=top_k),
+        )
+
+        duration = (timezone.now() - started).total_seconds()
+        logger.info(f"✅ Recommandations : {stored} paires sur {n_orders} commandes ({duration:.1f}s)")
+
         return {
             'status': 'completed',
-            'message': 'Recommandations mises à jour',
+            'orders': n_orders,
+            'products': len(product_ids),
+            'pairs': int(scores.nnz),
+            'stored': stored,
+            'measure': measure,
+            'duration_seconds': duration,
             'timestamp': timezone.now().isoformat()
         }
         
@@ -421,6 +510,85 @@ def update_product_recommendations() -> Dict[str, Any]:
         }
 
 
+@shared_task
+def update_similar_products(top_k: int = 10, chunk_size: int = 1000) -> Dict[str, Any]:
+    """
+    Recalcule les "produits similaires" (TF-IDF nom + description + catégorie).
+    Les similarités sont calculées par blocs de lignes puis les top-K voisins
+    de chaque produit remplacent la source CONTENT.
+    """
+    try:
+        from apps.products.models import ProductRecommendation
+        from apps.products.recommendations import content_neighbours, store_neighbours, tfidf_matrix
+
+        started = timezone.now()
+        logger.info("🔄 Calcul des produits similaires (TF-IDF)")
+
+        product_ids, matrix = tfidf_matrix()
+        stored = store_neighbours(
+            ProductRecommendation.Source.CONTENT,
+            content_neighbours(product_ids, matrix, top_k=top_k, chunk_size=chunk_size),
+        )
+
+        duration = (timezone.now() - started).total_seconds()
+        logger.info(f"✅ Produits similaires : {stored} paires pour {len(product_ids)} produits ({duration:.1f}s)")
+
+        return {
+            'status': 'completed',
+            'products': len(product_ids),
+            'vocabulary': matrix.shape[1],
+            'stored': stored,
+            'duration_seconds': duration,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Erreur calcul produits similaires : {e}")
+        return {
+            'error': str(e),
+            'status': 'failed'
+        }
+
+
+@shared_task
+def refresh_similar_products(product_ids: Optional[list] = None, top_k: int = 10) -> Dict[str, Any]:
+    """
+    Mise à jour incrémentale des produits similaires après l'ajout ou la
+    modification de produits (tableau de bord producteur). Sans `product_ids`,
+    traite la file des produits modifiés pendant la fenêtre : la matrice TF-IDF
+    n'est construite qu'une fois pour tous.
+    """
+    try:
+        from apps.products.recommendations import (
+            REFRESH_SCHEDULED_KEY, pop_content_refresh, refresh_content_neighbours, tfidf_matrix
+        )
+
+        if product_ids is None:
+            # Avant la lecture de la file : une modification arrivée ensuite planifie une autre tâche
+            cache.delete(REFRESH_SCHEDULED_KEY)
+            product_ids = pop_content_refresh()
+        product_ids = sorted(set(product_ids))
+        if not product_ids:
+            return {'status': 'skipped', 'reason': 'aucun produit en attente'}
+
+        tfidf = tfidf_matrix()
+        updated = sum(refresh_content_neighbours(pid, top_k=top_k, tfidf=tfidf) for pid in product_ids)
+        logger.info(f"✅ Produits similaires mis à jour pour {len(product_ids)} produit(s) ({updated} listes)")
+
+        return {
+            'status': 'completed',
+            'product_ids': product_ids,
+            'lists_updated': updated,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Erreur produits similaires (produits {product_ids}) : {e}")
+        return {
+            'error': str(e),
+            'status': 'failed'
+        }
+
 
 
 # from django.template.loader import render_to_string
@@ -0,0 +1,46 @@
+"""
+Versions de cache par espace de noms (catalogue, catégories, producteurs...).
+
+Plutôt que de supprimer des clés par motif, les clés dépendantes embarquent la
+version courante : incrémenter la version rend toutes les anciennes clés
+inaccessibles d'un coup, et elles expirent d'elles-mêmes.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _initial_version():
+    # Horodatage : une version recréée après éviction ne retombe jamais sur
+    # une ancienne valeur dont les clés seraient encore en cache
+    return int(time.time() * 1000)
+
+
+def _version_key(namespace):
+    return f"cache_version:{namespace}"
+
+
+def get_version(namespace):
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        cache.add(_version_key(namespace), _initial_version(), timeout=None)
+        version = cache.get(_version_key(namespace)) or _initial_version()
+    return version
+
+
+def get_versions(*namespaces):
+    """Versions de plusieurs espaces en un seul aller-retour"""
+    keys = {_version_key(ns): ns for ns in namespaces}
+    found = cache.get_many(list(keys))
+    return tuple(found.get(key) or get_version(ns) for key, ns in keys.items())
+
+
+def bump_version(namespace):
+    key = _version_key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Clé absente (premier usage ou éviction)
+        version = _initial_version()
+        cache.set(key, version, timeout=None)
+        return version
@@ -1,7 +1,16 @@
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.response import Response
+import base64
+import datetime
+import json
 from functools import partial
 
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import BooleanField, Expression, F, Q, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
@@ -31,6 +40,317 @@ create_paginator = partial(
 )
 
 
+# ========================
+# Pagination par curseur (keyset)
+# ========================
+# Au lieu de OFFSET (qui relit toutes les lignes précédentes), la page suivante
+# est demandée avec "WHERE (tri, id) > (valeurs de la dernière ligne)" : le coût
+# d'une page est constant quelle que soit sa profondeur, et l'id en départage
+# garantit un ordre total (pas de doublons ni de trous entre deux pages).
+
+class InvalidCursor(ValueError):
+    """Curseur illisible ou généré pour un autre tri"""
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    """Garde les microsecondes (DjangoJSONEncoder tronque à la milliseconde)"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(payload):
+    raw = json.dumps(payload, cls=CursorJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def approximate_count(queryset, exact_threshold=1000):
+    """
+    Nombre de lignes estimé par le planificateur PostgreSQL (EXPLAIN), sans
+    parcourir la table. En dessous de `exact_threshold`, un COUNT exact est
+    bon marché et plus juste : on le fait. Retourne (nombre, exact).
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count(), True
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    estimate = int(plan[0]['Plan']['Plan Rows'])
+
+    if estimate < exact_threshold:
+        return queryset.count(), True
+    return estimate, False
+
+
+class RowComparison(Expression):
+    """
+    Comparaison de lignes SQL `(a, b, ...) > (x, y, ...)` : PostgreSQL s'en sert
+    comme borne de parcours d'un index composite (a, b, ...), là où la forme
+    développée `a > x OR (a = x AND b > y)` l'oblige à filtrer ligne à ligne.
+    """
+
+    output_field = BooleanField()
+
+    def __init__(self, lhs, operator, rhs):
+        super().__init__()
+        self.lhs = list(lhs)
+        self.rhs = list(rhs)
+        self.operator = operator
+
+    def get_source_expressions(self):
+        return self.lhs + self.rhs
+
+    def set_source_expressions(self, exprs):
+        self.lhs, self.rhs = exprs[:len(self.lhs)], exprs[len(self.lhs):]
+
+    def as_sql(self, compiler, connection):
+        sides, params = [], []
+        for expressions in (self.lhs, self.rhs):
+            sqls = []
+            for expression in expressions:
+                sql, sql_params = compiler.compile(expression)
+                sqls.append(sql)
+                params.extend(sql_params)
+            sides.append(', '.join(sqls))
+        return f'({sides[0]}) {self.operator} ({sides[1]})', params
+
+
+class KeysetPage:
+    """Page de résultats keyset (compatible avec le contexte `page_obj` des templates)"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.cursor_for(self.object_list[-1], 'next')
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.cursor_for(self.object_list[0], 'prev')
+
+
+class KeysetPaginator:
+    """
+    Paginateur keyset générique.
+
+    `ordering` est une liste de noms de champs (ou d'annotations) au format
+    order_by ; l'id est ajouté en départage s'il est absent. Le comptage total
+    n'est fait que sur demande (`count_mode='approx'`).
+    """
+
+    def __init__(self, queryset, ordering=None, per_page=20, count_mode=None, exact_threshold=1000):
+        ordering = list(ordering or queryset.query.order_by or ['-pk'])
+        ordering = ['-pk' if f == '-id' else 'pk' if f == 'id' else f for f in ordering]
+        if ordering[-1].lstrip('-') != 'pk':
+            ordering.append('-pk' if ordering[-1].startswith('-') else 'pk')
+
+        self.ordering = ordering
+        self.queryset = queryset.order_by(*ordering)
+        self.per_page = per_page
+        self.count_mode = count_mode
+        self.exact_threshold = exact_threshold
+        self._count = None
+
+    @property
+    def signature(self):
+        return ','.join(self.ordering)
+
+    # --- Comptage optionnel ---
+
+    def _compute_count(self):
+        if self._count is None:
+            self._count = approximate_count(self.queryset, self.exact_threshold)
+        return self._count
+
+    @property
+    def count(self):
+        """Total (estimé au-delà du seuil) ou None si non demandé"""
+        if self.count_mode != 'approx':
+            return None
+        return self._compute_count()[0]
+
+    @property
+    def count_is_exact(self):
+        if self.count_mode != 'approx':
+            return False
+        return self._compute_count()[1]
+
+    # --- Curseurs ---
+
+    def _field_value(self, obj, field):
+        name = field.lstrip('-')
+        return obj.pk if name == 'pk' else getattr(obj, name)
+
+    def cursor_for(self, obj, direction):
+        return encode_cursor({
+            'o': self.signature,
+            'd': direction,
+            'v': [self._field_value(obj, f) for f in self.ordering],
+        })
+
+    def _keyset_filter(self, values, reverse):
+        """(f1, f2, ..., id) strictement après (ou avant si reverse) les valeurs données"""
+        directions = {field.startswith('-') != reverse for field in self.ordering}
+        if len(directions) == 1:
+            # Tous les champs dans le même sens que l'id : comparaison de lignes,
+            # borne de parcours des index (tri, id)
+            query = self.queryset.query.clone()
+            names = [field.lstrip('-') for field in self.ordering]
+            operator = '<' if directions.pop() else '>'
+            return RowComparison(
+                [F(name) for name in names],
+                operator,
+                [Value(value, output_field=query.resolve_ref(name).output_field)
+                 for name, value in zip(names, values)],
+            )
+
+        # Sens mixtes : forme développée, bornée par le premier champ pour que
+        # le parcours d'index démarre au curseur
+        first = self.ordering[0]
+        descending = first.startswith('-') != reverse
+        condition = Q(**{f'{first.lstrip("-")}__{"lte" if descending else "gte"}': values[0]})
+        expanded = Q()
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            step = Q(**{f'{name}__{"lt" if descending else "gt"}': values[i]})
+            for prev_field, prev_value in zip(self.ordering[:i], values[:i]):
+                step &= Q(**{prev_field.lstrip('-'): prev_value})
+            expanded |= step
+        return condition & expanded
+
+    def page(self, cursor=None):
+        direction, values = 'next', None
+        if cursor:
+            payload = decode_cursor(cursor)
+            if not isinstance(payload, dict) or payload.get('o') != self.signature:
+                raise InvalidCursor("Curseur généré pour un autre tri")
+            direction = payload.get('d', 'next')
+            values = payload.get('v')
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise InvalidCursor("Curseur incomplet")
+
+        reverse = direction == 'prev'
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(values, reverse))
+        if reverse:
+            queryset = queryset.reverse()
+
+        # Une ligne de plus pour savoir s'il existe une page au-delà
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if reverse:
+            rows.reverse()
+            return KeysetPage(rows, self, has_next=True, has_previous=has_more)
+        return KeysetPage(rows, self, has_next=has_more, has_previous=values is not None)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination DRF par curseur keyset.
+    Paramètres : ?cursor=..., ?page_size=..., ?count=approx (total estimé, opt-in)
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.paginator = KeysetPaginator(
+            queryset,
+            per_page=self.get_page_size(request),
+            count_mode=request.query_params.get(self.count_query_param),
+        )
+        try:
+            self.page = self.paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound("Curseur invalide")
+        return list(self.page)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        if not self.page.has_previous():
+            return None
+        cursor = self.page.previous_cursor
+        if cursor is None:
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+        return self._link(cursor)
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.paginator.count_mode == 'approx':
+            payload['count'] = self.paginator.count
+            payload['count_is_exact'] = self.paginator.count_is_exact
+        return Response(payload)
+
+
 # from rest_framework.pagination import PageNumberPagination
 # from functools import partial
 
@@ -0,0 +1,59 @@
+"""
+Accès direct à Redis (compteurs, hashes, pipelines) au-delà de l'API de cache Django.
+
+La connexion est celle du cache "default" : django-redis (settings de base et de
+production) ou le backend Redis intégré à Django. En développement le cache est
+un LocMemCache : `get_redis()` retourne alors None et chaque appelant bascule
+sur son mode dégradé.
+"""
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    from redis.exceptions import RedisError
+except ImportError:  # pragma: no cover - redis est dans requirements.txt
+    class RedisError(Exception):
+        pass
+
+
+def get_redis(alias='default'):
+    """Client redis-py du cache `alias` (django-redis ou RedisCache intégré), ou None"""
+    from django.core.cache import caches
+    from django.core.cache.backends.redis import RedisCache
+
+    try:
+        backend = caches[alias]
+        if hasattr(backend, 'client') and hasattr(backend.client, 'get_client'):
+            # django-redis
+            return backend.client.get_client(write=True)
+        if isinstance(backend, RedisCache):
+            return backend._cache.get_client(write=True)
+    except Exception as e:
+        logger.warning(f"⚠️ Connexion Redis indisponible : {e}")
+    return None
+
+
+def get_async_redis(alias='default', **kwargs):
+    """
+    Client redis.asyncio vers le serveur du cache (vues async, pub/sub), ou None
+    si le cache n'est pas Redis. Un client par boucle d'événements.
+    """
+    if get_redis(alias) is None:
+        return None
+    location = settings.CACHES[alias]['LOCATION']
+    if isinstance(location, (list, tuple)):
+        location = location[0]
+    from redis import asyncio as aioredis
+    return aioredis.from_url(location.split(',')[0], **kwargs)
+
+
+def redis_key(*parts, alias='default'):
+    """
+    Clé Redis brute au format des clés du cache (`préfixe:version:clé`, cf.
+    make_key) : même espace de noms que les clés posées par cache.set.
+    """
+    from django.core.cache import caches
+    return caches[alias].make_key(':'.join(str(p) for p in parts))